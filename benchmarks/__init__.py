@@ -0,0 +1,8 @@
+"""
+Offline benchmarks for calendar-cli. Run from the top directory, e.g.
+
+    PYTHONPATH=src python -m benchmarks                     # run the suite and compare with the baseline
+    PYTHONPATH=src python -m benchmarks --save-baseline     # update the baseline
+    PYTHONPATH=src python -m benchmarks --sizes 1000 sort   # run a part of the suite
+    PYTHONPATH=src python -m benchmarks.bench_time_parser   # compare the time parser with dateutil
+"""
@@ -0,0 +1,109 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+import io
+import os
+import sys
+import gc
+import json
+import time
+from optparse import OptionParser
+from benchmarks.suite import BENCHMARKS
+
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+DEFAULT_SIZES = '1000,10000,100000'
+
+
+def _get_parser():
+    p = OptionParser(usage='PYTHONPATH=src python -m benchmarks [options] [benchmark ...]')
+    p.add_option('--sizes', dest='sizes', default=DEFAULT_SIZES, metavar='N,N,...',
+                 help='set the numbers of events (default:%s)' % DEFAULT_SIZES)
+    p.add_option('--repeat', dest='repeat', default=3, type=int, metavar='N',
+                 help='take the best time of N runs (default:3)')
+    p.add_option('--baseline', dest='baseline', default=DEFAULT_BASELINE_PATH, metavar='PATH',
+                 help='set the baseline file to PATH (default:%s)' % DEFAULT_BASELINE_PATH)
+    p.add_option('--save-baseline', dest='save_baseline', action='store_true', default=False,
+                 help='save the results as the new baseline (default: False)')
+    p.add_option('--threshold', dest='threshold', default=0.2, type=float, metavar='RATIO',
+                 help='report a regression if ops/sec drops more than RATIO from the baseline (default:0.2)')
+    return p
+
+
+def _peak_memory(run):
+    """
+    :return: float: peak memory allocated while running in MB, or None if tracemalloc is not available
+    """
+    try:
+        import tracemalloc
+    except ImportError:
+        return None
+
+    tracemalloc.start()
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def measure(bench, size, repeat):
+    """
+    :return: dict: ops/sec of the best run and peak memory in MB
+    """
+    run, ops = bench(size)
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        t = time.time()
+        run()
+        elapsed = time.time() - t
+        best = elapsed if best is None else min(best, elapsed)
+    return {'ops_per_sec': ops / max(best, 1e-9), 'peak_mb': _peak_memory(run)}
+
+
+def _load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with io.open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main(argv):
+    option, args = _get_parser().parse_args(argv[1:])
+    sizes = [int(x) for x in option.sizes.split(',')]
+    baseline = _load_baseline(option.baseline)
+
+    print('%-12s %8s %14s %10s %14s %8s' % ('benchmark', 'size', 'ops/sec', 'peak MB', 'baseline', 'change'))
+    results, regressions = {}, []
+    for name, bench in BENCHMARKS:
+        if args and name not in args:
+            continue
+        for size in sizes:
+            key = '%s/%d' % (name, size)
+            r = results[key] = measure(bench, size, option.repeat)
+
+            base = baseline.get(key, {}).get('ops_per_sec')
+            change = None if base is None else r['ops_per_sec'] / base - 1
+            if change is not None and change < -option.threshold:
+                regressions.append(key)
+
+            print('%-12s %8d %14.0f %10s %14s %8s' % (
+                name, size, r['ops_per_sec'],
+                '-' if r['peak_mb'] is None else '%.1f' % r['peak_mb'],
+                '-' if base is None else '%.0f' % base,
+                '-' if change is None else '%+.1f%%' % (change * 100)))
+            sys.stdout.flush()
+
+    if option.save_baseline:
+        baseline.update(results)
+        with io.open(option.baseline, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(baseline, indent=2, sort_keys=True))
+        print('Saved baseline: %s' % option.baseline)
+
+    if regressions:
+        print('Regressions: %s' % ', '.join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,45 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+import sys
+import time
+import pytz
+from dateutil import parser
+from calendar_cli.model import EventTime
+from benchmarks.payload import make_items
+
+
+def parse_dict_dateutil(d, default_timezone):
+    """EventTime.parse_dict before the fast-path parser"""
+    tz = pytz.timezone(default_timezone)
+    if 'dateTime' in d:
+        dt = parser.parse(d['dateTime'])
+        if dt.tzinfo is None and 'timeZone' in d:
+            dt = pytz.timezone(d['timeZone']).localize(dt)
+        return EventTime(True, dt.astimezone(tz))
+    else:
+        dt = parser.parse(d['date'])
+        dt = tz.localize(dt)
+        return EventTime(False, dt)
+
+
+def bench(f, times):
+    t = time.time()
+    results = [f(d, 'Asia/Tokyo') for d in times]
+    return time.time() - t, results
+
+
+def main(n=100000):
+    times = [t for d in make_items(n // 2) for t in (d['start'], d['end'])]
+
+    t_old, r_old = bench(parse_dict_dateutil, times)
+    t_new, r_new = bench(EventTime.parse_dict, times)
+    assert r_old == r_new, 'results differ'
+
+    print('EventTime.parse_dict x %d' % len(times))
+    print('  dateutil : %8.3f sec (%10.0f ops/sec)' % (t_old, len(times) / t_old))
+    print('  fast-path: %8.3f sec (%10.0f ops/sec)' % (t_new, len(times) / t_new))
+    print('  speed-up : %8.1fx' % (t_old / t_new))
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:]])
@@ -0,0 +1,37 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+import random
+from datetime import datetime, timedelta
+
+TIME_ZONES = ['UTC', 'Asia/Tokyo', 'America/Los_Angeles', 'Europe/London']
+OFFSETS = ['Z', '+09:00', '-07:00', '+00:00', '+05:30']
+
+
+def make_items(n, seed=0):
+    """
+    Generate synthetic event resources like the items of an events().list response.
+
+    :param n: int: number of events
+    :return: list of dict
+    """
+    rnd = random.Random(seed)
+    t0 = datetime(2015, 1, 1)
+    items = []
+    for i in range(n):
+        start = t0 + timedelta(minutes=15 * rnd.randint(0, 4 * 24 * 365))
+        if rnd.random() < 0.2:
+            # all-day event
+            s = {'date': start.date().isoformat()}
+            e = {'date': (start.date() + timedelta(days=rnd.randint(1, 3))).isoformat()}
+        else:
+            end = start + timedelta(minutes=15 * rnd.randint(1, 16))
+            offset = rnd.choice(OFFSETS)
+            s = {'dateTime': start.isoformat() + offset, 'timeZone': rnd.choice(TIME_ZONES)}
+            e = {'dateTime': end.isoformat() + offset, 'timeZone': s['timeZone']}
+        item = {'id': 'ev%08d' % i, 'status': 'confirmed', 'summary': 'Event %d' % i, 'start': s, 'end': e}
+        if rnd.random() < 0.5:
+            item['creator'] = {'displayName': 'User %d' % rnd.randint(0, 99), 'email': 'user@example.com'}
+        if rnd.random() < 0.3:
+            item['location'] = 'Room %d' % rnd.randint(0, 9)
+        items.append(item)
+    return items
@@ -0,0 +1,90 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+from datetime import datetime, timedelta
+import pytz
+from calendar_cli.model import Event, EventTime
+from calendar_cli.operation import SummaryOperation
+from calendar_cli.setting import arg_parser
+from calendar_cli.setting.setting import Setting
+from benchmarks.payload import make_items
+
+TIME_ZONE = 'Asia/Tokyo'
+
+
+def _parsed_events(size):
+    events = [Event.parse_dict(d, TIME_ZONE) for d in make_items(size)]
+    for e in events:
+        e.start_time, e.end_time  # decode the fields used for sorting
+    return events
+
+
+def bench_parse_dict(size):
+    """Event.parse_dict with all the fields decoded"""
+    items = make_items(size)
+
+    def run():
+        events = [Event.parse_dict(d, TIME_ZONE) for d in items]
+        for e in events:
+            e.start_time, e.end_time, e.summary, e.creator_name, e.creator_email, e.location
+        return events
+
+    return run, size
+
+
+def bench_sort(size):
+    """sorted() in GoogleCalendarService.list_events"""
+    events = _parsed_events(size)
+
+    def run():
+        sorted(events)
+
+    return run, size
+
+
+def bench_make_output(size):
+    """SummaryOperation._make_output"""
+    events = sorted(_parsed_events(size), key=lambda e: e.start_time.datetime_tz)
+    for e in events:
+        e.creator_name, e.creator_email, e.location
+    op = SummaryOperation('primary', datetime(2015, 1, 1, tzinfo=pytz.utc), timedelta(days=365), 'dummy_path',
+                          arg_parser.DEFAULT_FORMAT_DAYS, '')
+
+    def run():
+        op._make_output(events)
+
+    return run, size
+
+
+def bench_mark_conflicts(size):
+    """Event.mark_conflicts on dense days of back-to-back events"""
+    t0 = datetime(2015, 1, 1, tzinfo=pytz.utc)
+    events = [Event(EventTime(True, t0 + timedelta(days=i // 2000, seconds=30 * (i % 2000))),
+                    EventTime(True, t0 + timedelta(days=i // 2000, seconds=30 * (i % 2000 + 1))), 'x')
+              for i in range(size)]
+
+    def run():
+        for _ in Event.mark_conflicts(events):
+            pass
+
+    return run, size
+
+
+def bench_parse_args(size):
+    """Setting.parse_args"""
+    argv = ['calendar-cli', '--date', '20151018', '--days', '7', '--calendar', 'primary,foo@example.com',
+            '--format', '%D [%T] %S%L%C']
+
+    def run():
+        for _ in range(size):
+            Setting().parse_args(argv)
+
+    return run, size
+
+
+BENCHMARKS = [
+    ('parse_dict', bench_parse_dict),
+    ('sort', bench_sort),
+    ('make_output', bench_make_output),
+    ('conflicts', bench_mark_conflicts),
+    ('parse_args', bench_parse_args),
+]
@@ -3,17 +3,39 @@ from __future__ import division, print_function, absolute_import, unicode_litera
 import sys
 
 from calendar_cli.setting.setting import Setting
+from calendar_cli.setting import arg_parser
+from calendar_cli.util.profiler import profiler
+from calendar_cli.util import daemon
 from mog_commons.io import print_safe
+from mog_commons.string import to_unicode
 
+# commands which always run in this process
+LOCAL_COMMANDS = ['daemon', 'setup']
 
-def main():
+
+def _enable_debug_logging():
+    """Print debug messages of this package, e.g. API call retries, to stderr."""
+    import logging
+
+    logging.basicConfig(format='%(name)s: %(message)s')
+    logging.getLogger('calendar_cli').setLevel(logging.DEBUG)
+
+
+def execute(argv):
     """
-    Main function
+    Run the command in this process.
+
+    :param argv: list of string: command line arguments
+    :return: return code
     """
 
     setting = None
     try:
-        setting = Setting().parse_args(sys.argv)
+        setting = Setting().parse_args(argv)
+        if setting.debug:
+            _enable_debug_logging()
+        if setting.profile:
+            profiler.enable()
         return_code = setting.operation.run()
     except KeyboardInterrupt:
         return_code = 3
@@ -24,4 +46,43 @@ def main():
         else:
             print_safe('%s: %s' % (e.__class__.__name__, e))
         return_code = 2
+
+    if profiler.enabled:
+        profiler.report()
+        if setting.profile_output:
+            profiler.write_trace(setting.profile_output)
+    return return_code
+
+
+def forward(argv):
+    """
+    Run the command on the daemon if it is running.
+
+    :param argv: list of string: command line arguments
+    :return: return code, or None if the command should run in this process
+    """
+    args = [to_unicode(a, errors='ignore') for a in argv]
+    option, positional = arg_parser.parser.parse_args(args[1:])
+    if option.no_daemon or (positional and positional[0] in LOCAL_COMMANDS):
+        return None
+
+    # the output is written to stdout and stderr as the daemon sends it
+    return daemon.send_request(option.socket, args)
+
+
+def main():
+    """
+    Main function
+    """
+
+    try:
+        return_code = forward(sys.argv)
+    except KeyboardInterrupt:
+        return 3
+    except Exception as e:
+        print_safe('%s: %s' % (e.__class__.__name__, e))
+        return 2
+
+    if return_code is None:
+        return_code = execute(sys.argv)
     return return_code
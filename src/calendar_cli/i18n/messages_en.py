@@ -2,4 +2,12 @@ from __future__ import division, print_function, absolute_import, unicode_litera
 
 MSG_ALL_DAY = 'ALLDAY'
 MSG_WEEK_DAY = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+MSG_CONFLICT = ' [CONFLICT]'
 MSG_EVENT_CREATED = 'Event created: %(event)s'
+MSG_EVENT_CREATE_FAILED = 'Failed to create event (line %(line)d): %(error)s'
+MSG_BULK_CREATE_SUMMARY = 'Created %(created)d of %(total)d events in %(elapsed).1f seconds (%(rate).1f events/sec)'
+MSG_DAEMON_STARTED = 'Listening on %(path)s'
+MSG_EXPORT_RESUMED = 'Resuming the export after %(count)d events'
+MSG_EXPORT_SUMMARY = 'Exported %(count)d events to %(path)s'
+MSG_IMPORT_SUMMARY = ('Imported %(created)d of %(total)d events (%(existing)d already existed) '
+                      'in %(elapsed).1f seconds (%(rate).1f events/sec)')
@@ -3,4 +3,12 @@ from __future__ import division, print_function, absolute_import, unicode_litera
 
 MSG_ALL_DAY = '終日'
 MSG_WEEK_DAY = ['月', '火', '水', '木', '金', '土', '日']
+MSG_CONFLICT = ' [重複]'
 MSG_EVENT_CREATED = 'イベントを作成しました: %(event)s'
+MSG_EVENT_CREATE_FAILED = 'イベントの作成に失敗しました (%(line)d 行目): %(error)s'
+MSG_BULK_CREATE_SUMMARY = '%(total)d 件中 %(created)d 件のイベントを %(elapsed).1f 秒で作成しました (%(rate).1f 件/秒)'
+MSG_DAEMON_STARTED = '%(path)s で待ち受けています'
+MSG_EXPORT_RESUMED = '%(count)d 件のイベントの後からエクスポートを再開します'
+MSG_EXPORT_SUMMARY = '%(count)d 件のイベントを %(path)s にエクスポートしました'
+MSG_IMPORT_SUMMARY = ('%(total)d 件中 %(created)d 件のイベントを %(elapsed).1f 秒でインポートしました '
+                      '(%(existing)d 件は登録済み, %(rate).1f 件/秒)')
@@ -1 +1,2 @@
 from .event import EventTime, Event
+from .event_formatter import EventFormatter
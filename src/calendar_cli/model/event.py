@@ -1,20 +1,52 @@
 from __future__ import division, print_function, absolute_import, unicode_literals
 
-from dateutil import parser
+import heapq
+from collections import deque
+from itertools import chain
+from datetime import datetime, time, timedelta
 import pytz
-from mog_commons.case_class import CaseClass
 from mog_commons.functional import oget, omap, ozip
 from calendar_cli.i18n import MSG_ALL_DAY, MSG_WEEK_DAY
+from calendar_cli.model.event_formatter import EventFormatter
+from calendar_cli.model.time_parser import get_timezone, parse_date, parse_datetime
+from calendar_cli.model.record import Record, LazyField
 
+# the earliest local time zone (Pacific/Kiritimati) begins each date this long before UTC
+MAX_UTC_OFFSET = timedelta(hours=14)
+
+
+class EventTime(Record):
+    __slots__ = _fields = ('has_time', 'datetime_tz')
 
-class EventTime(CaseClass):
     def __init__(self, has_time, datetime_tz):
         """
         :param has_time: bool: False if the all-day event
         :param datetime_tz: datetime: timezone-aware datetime
         """
         assert datetime_tz.tzinfo is not None, 'datetime_tz must be timezone-aware'
-        CaseClass.__init__(self, ('has_time', has_time), ('datetime_tz', datetime_tz))
+        self.has_time = has_time
+        self.datetime_tz = datetime_tz
+
+    def __cmp__(self, other):
+        if not isinstance(other, EventTime):
+            raise TypeError('unorderable types: %s() < %s()' % (self.__class__.__name__, other.__class__.__name__))
+        a, b = (self.has_time, self.datetime_tz), (other.has_time, other.datetime_tz)
+        return (a > b) - (a < b)
+
+    # fields are never None, so compare them as tuples for speed
+    def __lt__(self, other):
+        return self.__cmp__(other) < 0
+
+    def __gt__(self, other):
+        return self.__cmp__(other) > 0
+
+    @classmethod
+    def _make(cls, has_time, datetime_tz):
+        """Create an instance without validation."""
+        t = cls.__new__(cls)
+        t.has_time = has_time
+        t.datetime_tz = datetime_tz
+        return t
 
     def to_short_summary(self):
         return self.datetime_tz.strftime('%H:%M') if self.has_time else None
@@ -35,26 +67,51 @@ class EventTime(CaseClass):
 
     @staticmethod
     def parse_dict(d, default_timezone):
-        tz = pytz.timezone(default_timezone)  # always read as default timezone
+        tz = get_timezone(default_timezone)  # always read as default timezone
         if 'dateTime' in d:
-            dt = parser.parse(d['dateTime'])  # parse as tz-aware datetime
+            dt = parse_datetime(d['dateTime'])  # parse as tz-aware datetime
             if dt.tzinfo is None and 'timeZone' in d:
-                dt = pytz.timezone(d['timeZone']).localize(dt)
-            return EventTime(True, dt.astimezone(tz))
+                dt = get_timezone(d['timeZone']).localize(dt)
+            return EventTime._make(True, dt.astimezone(tz))
         else:
-            dt = parser.parse(d['date'])
+            dt = parse_date(d['date'])
             dt = tz.localize(dt)
-            return EventTime(False, dt)
+            return EventTime._make(False, dt)
+
+
+class Event(Record):
+    """
+    Calendar event.
+
+    Events created by parse_dict() keep the raw event resource and decode each field on first access.
+    """
+
+    _fields = ('start_time', 'end_time', 'summary', 'creator_name', 'creator_email', 'location', 'calendar_id',
+               'event_id', 'description', 'recurrence')
+    __slots__ = ('_raw', '_context', '_start_time', '_end_time', '_summary', '_creator_name', '_creator_email',
+                 '_location', 'calendar_id', '_event_id', '_description', '_recurrence', 'conflict')
 
+    start_time = LazyField('_start_time', lambda d, tz: EventTime.parse_dict(d['start'], tz))
+    end_time = LazyField('_end_time', lambda d, tz: EventTime.parse_dict(d['end'], tz))
+    summary = LazyField('_summary', lambda d, tz: d['summary'])
+    creator_name = LazyField('_creator_name', lambda d, tz: omap(lambda x: x.get('displayName'), d.get('creator')))
+    creator_email = LazyField('_creator_email', lambda d, tz: omap(lambda x: x.get('email'), d.get('creator')))
+    location = LazyField('_location', lambda d, tz: d.get('location'))
+    event_id = LazyField('_event_id', lambda d, tz: d.get('id'))
+    description = LazyField('_description', lambda d, tz: d.get('description'))
+    recurrence = LazyField('_recurrence', lambda d, tz: d.get('recurrence'))
 
-class Event(CaseClass):
     def __init__(self,
                  start_time,
                  end_time,
                  summary,
                  creator_name=None,
                  creator_email=None,
-                 location=None):
+                 location=None,
+                 calendar_id=None,
+                 event_id=None,
+                 description=None,
+                 recurrence=None):
         """
         :param start_time: EventTime:
         :param end_time: EventTime:
@@ -62,20 +119,29 @@ class Event(CaseClass):
         :param creator_name: unicode:
         :param creator_email: unicode:
         :param location: unicode:
+        :param calendar_id: unicode: calendar which the event belongs to
+        :param event_id: unicode: event id (None: assigned by the server on creation)
+        :param description: unicode:
+        :param recurrence: list of unicode: RRULE, EXDATE and RDATE lines of a recurring event
         """
         assert isinstance(start_time, EventTime)
         assert isinstance(end_time, EventTime)
         assert start_time.has_time == end_time.has_time
         assert start_time <= end_time
 
-        CaseClass.__init__(self,
-                           ('start_time', start_time),
-                           ('end_time', end_time),
-                           ('summary', summary),
-                           ('creator_name', creator_name),
-                           ('creator_email', creator_email),
-                           ('location', location)
-                           )
+        self._raw = None
+        self._context = None
+        self._start_time = start_time
+        self._end_time = end_time
+        self._summary = summary
+        self._creator_name = creator_name
+        self._creator_email = creator_email
+        self._location = location
+        self.calendar_id = calendar_id
+        self._event_id = event_id
+        self._description = description
+        self._recurrence = recurrence
+        self.conflict = False  # set by mark_conflicts()
 
     def str_time_range(self):
         s = ozip(self.start_time.to_short_summary(), self.end_time.to_short_summary())
@@ -91,18 +157,33 @@ class Event(CaseClass):
         """
         return self.to_format('%D [%T] %S')
 
+    def str_end_date(self):
+        """
+        :return: the last date of the event, e.g. '2015-05-28 Wed'
+        """
+        if self.start_time.has_time:
+            return self.end_time.to_long_summary()
+        # the end date of an all-day event is exclusive
+        t = max(self.start_time, EventTime(False, self.end_time.datetime_tz - timedelta(days=1)))
+        return t.to_long_summary()
+
+    def str_duration(self):
+        """
+        :return: e.g. '1:30' for timed events, '2d' for all-day events
+        """
+        if self.start_time.has_time:
+            minutes = int((self.end_time.datetime_tz - self.start_time.datetime_tz).total_seconds()) // 60
+            return '%d:%02d' % (minutes // 60, minutes % 60)
+        return '%dd' % (self.end_time.to_date() - self.start_time.to_date()).days
+
     def to_format(self, format_):
-        return (
-            format_
-            .replace('%D', self.start_time.to_long_summary())
-            .replace('%T', self.str_time_range())
-            .replace('%S', self.summary)
-            .replace('%C', oget(omap(lambda s: ' (%s)' % s, self.str_creator()), ''))
-            .replace('%L', oget(omap(lambda s: ' @%s' % s, self.location), ''))
-        )
+        return EventFormatter.compile(format_).format(self)
 
     def to_dict(self):
         r = {'summary': self.summary, 'start': self.start_time.to_dict(), 'end': self.end_time.to_dict()}
+        omap(lambda x: r.update({'id': x}), self.event_id)
+        omap(lambda x: r.update({'description': x}), self.description)
+        omap(lambda x: r.update({'recurrence': x}), self.recurrence)
 
         d = {}
         omap(lambda x: d.update({'displayName': x}), self.creator_name)
@@ -114,10 +195,84 @@ class Event(CaseClass):
         return r
 
     @staticmethod
-    def parse_dict(d, default_timezone):
-        return Event(EventTime.parse_dict(d['start'], default_timezone),
-                     EventTime.parse_dict(d['end'], default_timezone),
-                     d['summary'],
-                     omap(lambda x: x.get('displayName'), (d.get('creator'))),
-                     omap(lambda x: x.get('email'), (d.get('creator'))),
-                     d.get('location'))
+    def parse_dict(d, default_timezone, calendar_id=None):
+        """
+        :param d: dict: event resource of the API
+        :param default_timezone: string: time zone to convert the event times to
+        :return: Event: event which decodes the fields lazily
+        """
+        ev = Event.__new__(Event)
+        ev._raw = d
+        ev._context = default_timezone
+        ev._start_time = ev._end_time = ev._summary = LazyField.UNDEFINED
+        ev._creator_name = ev._creator_email = ev._location = LazyField.UNDEFINED
+        ev._event_id = ev._description = ev._recurrence = LazyField.UNDEFINED
+        ev.calendar_id = calendar_id
+        ev.conflict = False
+        return ev
+
+    @staticmethod
+    def merge(iterables):
+        """
+        Merge event streams into one stream with a heap.
+
+        :param iterables: list of iterable of Event: each ordered by the start time
+        :return: generator of Event: events ordered by the start date and the start time
+        """
+
+        def decorate(i, events):
+            # the stream index and the position keep the merge stable without comparing events
+            for n, e in enumerate(events):
+                yield (e.start_time.to_date(), e.start_time.datetime_tz, i, n), e
+
+        for _, e in heapq.merge(*[decorate(i, it) for i, it in enumerate(iterables)]):
+            yield e
+
+    @staticmethod
+    def mark_conflicts(events):
+        """
+        Set the conflict flag of every timed event which overlaps another timed event. All-day events never conflict.
+
+        Events from calendars in different time zones are not ordered by the absolute start time, but no later event
+        starts before the watermark, the current date in the earliest time zone or the current start time.
+        Timed events starting before the watermark are released in the order of the absolute start time and swept
+        with the latest end time among the released events, so the events are checked in O(n log n) time.
+        Events are yielded in the same order as soon as no later event can overlap them.
+
+        :param events: iterable of Event: ordered by the start date and the start time, e.g. by merge()
+        :return: generator of Event: the same events with the conflict flags
+        """
+        pending = deque()  # (int, Event): position and event not yielded yet
+        unfinished = set()  # positions of the timed events which a later event may overlap
+        staged = []  # heap of (start, end, position, event) not released to the sweep yet
+        active = []  # heap of (end, position) released to the sweep
+        watermark = None
+        max_end, latest = None, None  # the latest end time among the released events, and the event
+
+        for n, ev in enumerate(chain(events, [None])):
+            if ev is not None:
+                pending.append((n, ev))
+                if ev.start_time.has_time:
+                    heapq.heappush(staged, (ev.start_time.datetime_tz, ev.end_time.datetime_tz, n, ev))
+                    unfinished.add(n)
+
+                # lower bound of the start time of the later events
+                next_date = pytz.utc.localize(datetime.combine(ev.start_time.to_date() + timedelta(days=1), time()))
+                w = min(ev.start_time.datetime_tz, next_date - MAX_UTC_OFFSET)
+                watermark = w if watermark is None else max(watermark, w)
+
+            # an event overlaps a released event iff it starts before the latest end time, which covers the pair
+            # with the released event ending last
+            while staged and (ev is None or staged[0][0] < watermark):
+                start, end, i, e = heapq.heappop(staged)
+                if max_end is not None and start < max_end:
+                    e.conflict = latest.conflict = True
+                if max_end is None or end > max_end:
+                    max_end, latest = end, e
+                heapq.heappush(active, (end, i))
+
+            while active and (ev is None or active[0][0] <= watermark):
+                unfinished.discard(heapq.heappop(active)[1])
+
+            while pending and pending[0][0] not in unfinished:
+                yield pending.popleft()[1]
@@ -0,0 +1,76 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+import re
+from mog_commons.functional import oget, omap
+from calendar_cli.i18n import MSG_CONFLICT
+
+
+class EventFormatter(object):
+    """
+    Format string compiled into a template.
+
+    Symbols are replaced with event fields. Only the fields which appear in the format string are evaluated.
+    """
+
+    FIELDS = {
+        'D': lambda e: e.start_time.to_long_summary(),
+        'T': lambda e: e.str_time_range(),
+        'S': lambda e: e.summary,
+        'C': lambda e: oget(omap(lambda s: ' (%s)' % s, e.str_creator()), ''),
+        'L': lambda e: oget(omap(lambda s: ' @%s' % s, e.location), ''),
+        'I': lambda e: oget(e.calendar_id, ''),
+        'E': lambda e: e.str_end_date(),
+        'U': lambda e: e.str_duration(),
+        'X': lambda e: MSG_CONFLICT if e.conflict else '',
+    }
+
+    # fields of the event resource needed by each symbol, in the syntax of partial responses
+    RESOURCE_FIELDS = {
+        'C': ('creator(displayName,email)',),
+        'L': ('location',),
+    }
+
+    # fields needed for every event to decode and order events
+    BASE_RESOURCE_FIELDS = ('start', 'end', 'summary')
+
+    _SYMBOL = re.compile('%([' + ''.join(sorted(FIELDS)) + '])')
+
+    _cache = {}
+
+    def __init__(self, format_):
+        """
+        :param format_: string: format string
+        """
+        template, getters, symbols = [], [], []
+        pos = 0
+        for m in self._SYMBOL.finditer(format_):
+            template.append(format_[pos:m.start()].replace('%', '%%'))
+            template.append('%s')
+            getters.append(self.FIELDS[m.group(1)])
+            symbols.append(m.group(1))
+            pos = m.end()
+        template.append(format_[pos:].replace('%', '%%'))
+
+        self.format_ = format_
+        self.symbols = frozenset(symbols)
+        self.resource_fields = self.BASE_RESOURCE_FIELDS + tuple(
+            f for k in sorted(self.symbols) for f in self.RESOURCE_FIELDS.get(k, ()))
+        self._template = ''.join(template)
+        self._getters = tuple(getters)
+
+    @classmethod
+    def compile(cls, format_):
+        """
+        :return: EventFormatter: compiled formatter, which is reused for the same format string
+        """
+        f = cls._cache.get(format_)
+        if f is None:
+            f = cls._cache[format_] = cls(format_)
+        return f
+
+    def format(self, event):
+        """
+        :param event: Event:
+        :return: unicode: formatted string
+        """
+        return self._template % tuple(g(event) for g in self._getters)
@@ -0,0 +1,280 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+#
+# iCalendar (RFC 5545) serialization of event resources, and a streaming parser of VEVENT components
+#
+
+import re
+import base64
+import hashlib
+from datetime import datetime, timedelta
+import pytz
+from calendar_cli.model.event import EventTime, Event
+from calendar_cli.model.time_parser import get_timezone, parse_date, parse_datetime
+
+PRODUCT_ID = '-//calendar-cli//calendar-cli %s//EN' % __import__('calendar_cli').__version__
+LINE_LIMIT = 75  # octets per line excluding CRLF
+CRLF = '\r\n'
+
+_STATUSES = {'confirmed': 'CONFIRMED', 'tentative': 'TENTATIVE', 'cancelled': 'CANCELLED'}
+RECURRENCE_PROPERTIES = ('RRULE', 'RDATE', 'EXDATE')
+
+# event ids of the API consist of base32hex characters
+_BASE32HEX = dict(zip([ord(c) for c in 'ABCDEFGHIJKLMNOPQRSTUVWXYZ234567'], '0123456789abcdefghijklmnopqrstuv'))
+_DURATION = re.compile(r'^([+-])?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$')
+_UNESCAPE = re.compile(r'\\([\\;,nN])')
+_DATE_TIME = re.compile(r'^(\d{4})(\d{2})(\d{2})(?:T(\d{2})(\d{2})(\d{2})(Z)?)?$')
+
+
+def escape_text(s):
+    """Escape a TEXT value."""
+    return s.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n')
+
+
+def fold_line(line):
+    """
+    Split a content line longer than LINE_LIMIT octets in UTF-8 without splitting characters.
+
+    :return: unicode: folded line terminated by CRLF
+    """
+    if len(line) * 4 <= LINE_LIMIT:
+        return line + CRLF  # cannot exceed the limit even if every character takes 4 bytes
+
+    chunks, start, size = [], 0, 0
+    limit = LINE_LIMIT
+    for i, c in enumerate(line):
+        n = len(c.encode('utf-8'))
+        if size + n > limit:
+            chunks.append(line[start:i])
+            start, size = i, 0
+            limit = LINE_LIMIT - 1  # continuation lines begin with a space
+        size += n
+    chunks.append(line[start:])
+    return (CRLF + ' ').join(chunks) + CRLF
+
+
+def _format_time(d, default_timezone):
+    """
+    :param d: dict: start, end or originalStartTime of an event resource
+    :return: (string, string): parameter and value, e.g. (';VALUE=DATE', '20151017') or ('', '20151017T013000Z')
+    """
+    if 'date' in d:
+        return ';VALUE=DATE', parse_date(d['date']).strftime('%Y%m%d')
+    dt = parse_datetime(d['dateTime'])
+    if dt.tzinfo is None:
+        dt = get_timezone(d.get('timeZone', default_timezone)).localize(dt)
+    return '', dt.astimezone(pytz.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _format_timestamp(s):
+    return parse_datetime(s).astimezone(pytz.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def header():
+    return ''.join(fold_line(s) for s in ['BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:' + PRODUCT_ID])
+
+
+def footer():
+    return fold_line('END:VCALENDAR')
+
+
+def format_event(d, default_timezone):
+    """
+    Instances of recurring events, e.g. expanded by singleEvents, are written as standalone events identified by
+    their instance ids without RECURRENCE-ID, since the instances are restorable without the recurring event.
+
+    :param d: dict: event resource of the API
+    :param default_timezone: string: time zone of the calendar, used for times without offsets
+    :return: unicode: VEVENT component with CRLF line endings
+    """
+    uid = d['id'] if 'recurringEventId' in d else d.get('iCalUID', d['id'])
+    lines = ['BEGIN:VEVENT', 'UID:' + uid]
+    if 'updated' in d:
+        lines.append('DTSTAMP:' + _format_timestamp(d['updated']))
+    if 'created' in d:
+        lines.append('CREATED:' + _format_timestamp(d['created']))
+    for name, key in [('DTSTART', 'start'), ('DTEND', 'end')]:
+        if key in d:
+            lines.append('%s%s:%s' % ((name,) + _format_time(d[key], default_timezone)))
+    lines.extend(d.get('recurrence', []))
+    for name, key in [('SUMMARY', 'summary'), ('LOCATION', 'location'), ('DESCRIPTION', 'description')]:
+        if d.get(key):
+            lines.append('%s:%s' % (name, escape_text(d[key])))
+    organizer = d.get('organizer') or d.get('creator')
+    if organizer and organizer.get('email'):
+        cn = ';CN="%s"' % organizer['displayName'].replace('"', "'") if organizer.get('displayName') else ''
+        lines.append('ORGANIZER%s:mailto:%s' % (cn, organizer['email']))
+    if d.get('status') in _STATUSES:
+        lines.append('STATUS:' + _STATUSES[d['status']])
+    lines.append('END:VEVENT')
+    return ''.join(fold_line(s) for s in lines)
+
+
+#
+# Parser
+#
+
+def unescape_text(s):
+    """Unescape a TEXT value."""
+    return _UNESCAPE.sub(lambda m: '\n' if m.group(1) in 'nN' else m.group(1), s)
+
+
+def event_id(uid):
+    """
+    Derive an event id from the UID, so that importing the same event again never creates a duplicate.
+
+    :param uid: unicode: UID of the event
+    :return: string: 32 base32hex characters
+    """
+    return base64.b32encode(hashlib.sha1(uid.encode('utf-8')).digest()).decode('ascii').translate(_BASE32HEX)
+
+
+def _unfold(lines):
+    """
+    :param lines: iterable of unicode: lines of an iCalendar stream
+    :return: generator of (int, unicode): line number and each content line
+    """
+    buf, start = None, 0
+    for i, line in enumerate(lines):
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and buf is not None:
+            buf += line[1:]
+            continue
+        if buf:
+            yield start, buf
+        buf, start = line, i + 1
+    if buf:
+        yield start, buf
+
+
+def parse_content_line(line):
+    """
+    :param line: unicode: unfolded content line, e.g. 'DTSTART;TZID=Asia/Tokyo:20151017T103000'
+    :return: (string, dict, unicode): upper-case name, parameters and the value
+    """
+    if '"' not in line:
+        # fast path without quoted parameter values
+        head, sep, value = line.partition(':')
+        if sep:
+            fields = head.split(';')
+            params = dict((k.upper(), v) for k, _, v in (p.partition('=') for p in fields[1:]))
+            return fields[0].upper(), params, value
+
+    fields, start, quoted = [], 0, False
+    for i, c in enumerate(line):
+        if c == '"':
+            quoted = not quoted
+        elif not quoted and c in ';:':
+            fields.append(line[start:i])
+            start = i + 1
+            if c == ':':
+                params = dict((k.upper(), v.strip('"')) for k, _, v in (p.partition('=') for p in fields[1:]))
+                return fields[0].upper(), params, line[start:]
+    raise ValueError('Invalid content line: %s' % line)
+
+
+def _parse_duration(s):
+    m = _DURATION.match(s)
+    if m is None:
+        raise ValueError('Invalid duration: %s' % s)
+    weeks, days, hours, minutes, seconds = [int(x or 0) for x in m.groups()[1:]]
+    d = timedelta(weeks=weeks, days=days, hours=hours, minutes=minutes, seconds=seconds)
+    return -d if m.group(1) == '-' else d
+
+
+def _parse_time(value, params, default_timezone):
+    """
+    :return: EventTime: time in UTC, in the time zone of TZID, or in the default time zone for floating times
+    """
+    m = _DATE_TIME.match(value)
+    if m is None:
+        raise ValueError('Invalid date or time: %s' % value)
+    year, month, day, hour, minute, second, utc = m.groups()
+
+    if hour is None or params.get('VALUE') == 'DATE':
+        return EventTime(False, get_timezone(default_timezone).localize(datetime(int(year), int(month), int(day))))
+
+    dt = datetime(int(year), int(month), int(day), int(hour), int(minute), int(second))
+    if utc:
+        return EventTime(True, pytz.utc.localize(dt))
+    try:
+        # time zones not in the tz database, e.g. custom VTIMEZONE components, fall back to the default
+        tz = get_timezone(params.get('TZID', default_timezone))
+    except pytz.UnknownTimeZoneError:
+        tz = get_timezone(default_timezone)
+    return EventTime(True, tz.localize(dt))
+
+
+def parse_event(props, default_timezone):
+    """
+    :param props: list of (string, dict, unicode, unicode): name, parameters, value and the raw content line
+                  of each property in a VEVENT component
+    :param default_timezone: string: time zone for dates and floating times
+    :return: (Event, EventTime, bool): event with the id derived from the UID, the original start time if the
+             component modifies an instance of a recurring event (otherwise None), and whether it is cancelled
+    """
+    d, recurrence = {}, []
+    for name, params, value, line in props:
+        if name in RECURRENCE_PROPERTIES:
+            recurrence.append(line)
+        elif name not in d:
+            d[name] = (params, value)
+
+    assert 'DTSTART' in d, 'DTSTART is missing'
+    start = _parse_time(d['DTSTART'][1], d['DTSTART'][0], default_timezone)
+    if 'DTEND' in d:
+        end = _parse_time(d['DTEND'][1], d['DTEND'][0], default_timezone)
+    elif 'DURATION' in d:
+        end = EventTime(start.has_time, start.datetime_tz + _parse_duration(d['DURATION'][1]))
+    else:
+        end = EventTime(start.has_time, start.datetime_tz + timedelta(days=0 if start.has_time else 1))
+
+    # events without UID are identified by their contents
+    uid = d['UID'][1] if 'UID' in d else '\n'.join(line for _, _, _, line in props)
+    organizer_params, organizer = d.get('ORGANIZER', ({}, ''))
+    text = lambda k: unescape_text(d[k][1]) if k in d else None
+
+    ev = Event(start, end, text('SUMMARY') or '', organizer_params.get('CN'),
+               organizer[7:] if organizer.lower().startswith('mailto:') else None, text('LOCATION'),
+               event_id=event_id(uid), description=text('DESCRIPTION'), recurrence=recurrence or None)
+    original_start = _parse_time(d['RECURRENCE-ID'][1], d['RECURRENCE-ID'][0], default_timezone) \
+        if 'RECURRENCE-ID' in d else None
+    return ev, original_start, text('STATUS') == 'CANCELLED'
+
+
+def iter_events(lines, default_timezone):
+    """
+    Parse VEVENT components one by one without reading the whole stream.
+
+    :param lines: iterable of unicode: lines of an iCalendar stream
+    :param default_timezone: string: time zone for dates and floating times, unless the calendar has X-WR-TIMEZONE
+    :return: generator of (int, (Event, EventTime, bool) or Exception): line number of each VEVENT, and the result
+             of parse_event() or the parse error
+    """
+    props, start, depth = None, 0, 0
+    for line_num, line in _unfold(lines):
+        try:
+            name, params, value = parse_content_line(line)
+        except ValueError as e:
+            if props is not None:
+                props, depth = None, 0
+                yield start, e
+            continue
+
+        if props is None:
+            if name == 'BEGIN' and value.upper() == 'VEVENT':
+                props, start, depth = [], line_num, 0
+            elif name == 'X-WR-TIMEZONE':
+                default_timezone = value
+        elif name == 'BEGIN':
+            depth += 1  # nested components, e.g. VALARM, are skipped
+        elif name == 'END' and depth:
+            depth -= 1
+        elif name == 'END':
+            try:
+                yield start, parse_event(props, default_timezone)
+            except Exception as e:
+                yield start, e
+            props = None
+        elif not depth:
+            props.append((name, params, value, line))
@@ -0,0 +1,68 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+#
+# Functions on half-open intervals (start, end) of comparable values such as datetime
+#
+
+from datetime import datetime, timedelta
+
+
+def merge_intervals(intervals):
+    """
+    Merge overlapping or adjacent intervals by sorting them and sweeping once.
+
+    :param intervals: iterable of (start, end)
+    :return: list of (start, end): disjoint intervals ordered by the start
+    """
+    result = []
+    for start, end in sorted(intervals):
+        if result and start <= result[-1][1]:
+            if end > result[-1][1]:
+                result[-1] = (result[-1][0], end)
+        else:
+            result.append((start, end))
+    return result
+
+
+def subtract_intervals(intervals, others):
+    """
+    Remove the parts covered by others from each interval.
+
+    :param intervals: list of (start, end): disjoint intervals ordered by the start
+    :param others: list of (start, end): disjoint intervals ordered by the start, e.g. the result of merge_intervals
+    :return: generator of (start, end): remaining intervals ordered by the start
+    """
+    j = 0
+    for start, end in intervals:
+        # skip the intervals which end before this interval starts
+        while j < len(others) and others[j][1] <= start:
+            j += 1
+
+        cursor = start
+        k = j
+        while k < len(others) and others[k][0] < end:
+            if others[k][0] > cursor:
+                yield cursor, others[k][0]
+            cursor = max(cursor, others[k][1])
+            k += 1
+        if cursor < end:
+            yield cursor, end
+
+
+def daily_intervals(start_date, end_date, start_time, end_time, tz, weekdays=None):
+    """
+    :param start_date: date: the first date
+    :param end_date: date: the last date (inclusive)
+    :param start_time: time: start time of each day
+    :param end_time: time: end time of each day (must be after start_time)
+    :param tz: pytz timezone: timezone of the times
+    :param weekdays: set of int: days of the week to include, Monday is 0 (None: every day)
+    :return: generator of (start, end): timezone-aware datetimes on each day
+    """
+    assert start_time < end_time, 'start time must be before end time: %s-%s' % (start_time, end_time)
+
+    d = start_date
+    while d <= end_date:
+        if weekdays is None or d.weekday() in weekdays:
+            yield tz.localize(datetime.combine(d, start_time)), tz.localize(datetime.combine(d, end_time))
+        d += timedelta(days=1)
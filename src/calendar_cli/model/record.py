@@ -0,0 +1,96 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+
+class Record(object):
+    """
+    Compact alternative to mog_commons.case_class.CaseClass using __slots__.
+
+    Subclasses list their fields in _fields. Equality, ordering, repr and copy() behave like CaseClass.
+    """
+
+    __slots__ = ()
+    _fields = ()
+
+    def __cmp__(self, other):
+        if not isinstance(other, self.__class__):
+            raise TypeError('unorderable types: %s() < %s()' % (self.__class__.__name__, other.__class__.__name__))
+
+        for k in self._fields:
+            a, b = getattr(self, k), getattr(other, k)
+            if a is not None or b is not None:
+                if a < b:
+                    return -1
+                if a > b:
+                    return 1
+        return 0
+
+    def __lt__(self, other):
+        return self.__cmp__(other) < 0
+
+    def __le__(self, other):
+        return self.__cmp__(other) <= 0
+
+    def __eq__(self, other):
+        if not isinstance(other, self.__class__):
+            return False
+
+        for k in self._fields:
+            a, b = getattr(self, k), getattr(other, k)
+            if a is not None or b is not None:
+                if a != b:
+                    return False
+        return True
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '%s(%s)' % (self.__class__.__name__, ', '.join('%s=%r' % (k, getattr(self, k)) for k in self._fields))
+
+    def copy(self, **kwargs):
+        """
+        :param kwargs:
+        :return: copy of this object modifying the kwargs
+        """
+        for k in kwargs:
+            assert k in self._fields, 'Invalid key: %s' % k
+
+        d = self.values()
+        d.update(kwargs)
+        return self.__class__(**d)
+
+    def values(self):
+        """
+        :return: key-value dict : { string: any }
+        """
+        return dict((k, getattr(self, k)) for k in self._fields)
+
+
+_UNDEFINED = object()
+
+
+class LazyField(object):
+    """
+    Descriptor which decodes a field from the raw data on first access and keeps the result in a slot.
+    """
+
+    UNDEFINED = _UNDEFINED
+
+    def __init__(self, slot, decode):
+        """
+        :param slot: string: name of the slot to keep the value
+        :param decode: function: raw data, context -> value
+        """
+        self.slot = slot
+        self.decode = decode
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        value = getattr(obj, self.slot)
+        if value is _UNDEFINED:
+            value = self.decode(obj._raw, obj._context)
+            setattr(obj, self.slot, value)
+        return value
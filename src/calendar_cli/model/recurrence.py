@@ -0,0 +1,176 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+#
+# Local expansion of recurring events fetched with singleEvents=False
+#
+
+import re
+import json
+import threading
+from datetime import datetime, timedelta
+import pytz
+from calendar_cli.model.time_parser import get_timezone, parse_date, parse_datetime
+
+_UNTIL_UTC = re.compile(r'UNTIL=(\d{8}T\d{6})Z', re.IGNORECASE)
+
+
+def _local_start(d, tz):
+    """
+    :param d: dict: start or originalStartTime of an event resource
+    :return: datetime: naive wall-clock time in tz (midnight for all-day events)
+    """
+    if 'date' in d:
+        return parse_date(d['date'])
+    dt = parse_datetime(d['dateTime'])
+    if dt.tzinfo is None:
+        return dt
+    return dt.astimezone(tz).replace(tzinfo=None)
+
+
+def _localize_line(line, tz):
+    """
+    Convert the times in UTC or with TZID in a recurrence line to the wall-clock time in tz,
+    since rules are evaluated without time zones.
+    """
+    def convert(value, source_tz):
+        if 'T' not in value:
+            return value  # date
+        if value.endswith('Z'):
+            t = pytz.utc.localize(datetime.strptime(value[:-1], '%Y%m%dT%H%M%S'))
+        elif source_tz is not None:
+            t = source_tz.localize(datetime.strptime(value, '%Y%m%dT%H%M%S'))
+        else:
+            return value
+        return t.astimezone(tz).strftime('%Y%m%dT%H%M%S')
+
+    name, sep, value = line.partition(':')
+    params = name.split(';')
+    if params[0].upper() == 'RRULE':
+        return _UNTIL_UTC.sub(lambda m: 'UNTIL=' + convert(m.group(1) + 'Z', None), line)
+    if params[0].upper() in ('EXDATE', 'RDATE'):
+        tzids = [p[5:] for p in params[1:] if p.upper().startswith('TZID=')]
+        source_tz = get_timezone(tzids[0]) if tzids else None
+        name = ';'.join(p for p in params if not p.upper().startswith('TZID='))
+        return name + sep + ','.join(convert(v, source_tz) for v in value.split(','))
+    return line
+
+
+def instance_key(d, tz):
+    """
+    :param d: dict: start or originalStartTime of an event resource
+    :param tz: tzinfo: time zone of the recurring event
+    :return: string: suffix of the instance id, e.g. '20151017T013000Z' or '20151017' for all-day events
+    """
+    if 'date' in d:
+        return parse_date(d['date']).strftime('%Y%m%d')
+    dt = parse_datetime(d['dateTime'])
+    if dt.tzinfo is None:
+        dt = tz.localize(dt)
+    return dt.astimezone(pytz.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+class RecurrenceExpander(object):
+    """
+    Expand recurring events into their instances with dateutil.rrule.
+
+    Rules are evaluated on the naive wall-clock time of the event's time zone so that instances keep their local time
+    across daylight saving time changes, as the server does. Parsed rules are memoized per revision of each recurring
+    event, and rrule caches the generated occurrences, so expanding the same events again is cheap.
+    """
+
+    MAX_CACHE_SIZE = 1000
+
+    def __init__(self):
+        self._rules = {}
+        self._lock = threading.Lock()
+
+    def _get_rule(self, master, tz, dtstart):
+        key = (master['id'], master.get('etag'), tuple(master['recurrence']),
+               json.dumps(master['start'], sort_keys=True))
+        with self._lock:
+            rule = self._rules.get(key)
+        if rule is None:
+            from dateutil.rrule import rrulestr
+
+            lines = [_localize_line(s, tz) for s in master['recurrence']]
+            rule = rrulestr('\n'.join(lines), dtstart=dtstart, forceset=True, ignoretz=True, cache=True)
+            with self._lock:
+                if len(self._rules) >= self.MAX_CACHE_SIZE:
+                    self._rules.clear()
+                self._rules[key] = rule
+        return rule
+
+    def expand(self, master, time_zone, time_min, time_max):
+        """
+        :param master: dict: recurring event resource with the recurrence field
+        :param time_zone: string: time zone of the calendar, used if the event has no time zone
+        :param time_min: datetime: timezone-aware start of the range
+        :param time_max: datetime: timezone-aware end of the range
+        :return: generator of dict: resources of the instances overlapping the range ordered by the start time
+        """
+        all_day = 'date' in master['start']
+        tz = get_timezone(time_zone if all_day else master['start'].get('timeZone', time_zone))
+        dtstart = _local_start(master['start'], tz)
+        duration = _local_start(master['end'], tz) - dtstart if all_day else \
+            parse_datetime(master['end']['dateTime']) - parse_datetime(master['start']['dateTime'])
+
+        # search the wall-clock range with a margin of one day for the difference of UTC offsets
+        lo = (time_min - duration).astimezone(tz).replace(tzinfo=None) - timedelta(days=1)
+        hi = time_max.astimezone(tz).replace(tzinfo=None) + timedelta(days=1)
+
+        for dt in self._get_rule(master, tz, dtstart).between(lo, hi, inc=True):
+            if all_day:
+                start = {'date': dt.date().isoformat()}
+                end = {'date': (dt + duration).date().isoformat()}
+                t = tz.localize(dt)
+                if not (t < time_max and tz.localize(dt + duration) > time_min):
+                    continue
+            else:
+                t = tz.localize(dt)
+                if not (t < time_max and t + duration > time_min):
+                    continue
+                start = {'dateTime': t.isoformat(), 'timeZone': tz.zone}
+                end = {'dateTime': tz.normalize(t + duration).isoformat(), 'timeZone': tz.zone}
+
+            d = dict(master)
+            del d['recurrence']
+            d['id'] = '%s_%s' % (master['id'], instance_key(start, tz))
+            d['recurringEventId'] = master['id']
+            d['originalStartTime'] = start
+            d['start'] = start
+            d['end'] = end
+            yield d
+
+    def expand_all(self, items, time_zone, time_min, time_max):
+        """
+        Replace recurring events in a list response by their instances. Modified instances (exceptions) replace the
+        generated ones, and cancelled instances are removed.
+
+        :param items: list of dict: event resources fetched with singleEvents=False and showDeleted=True
+        :param time_zone: string: time zone of the calendar
+        :return: list of dict: single events and instances overlapping the range (not sorted)
+        """
+        masters = dict((d['id'], d) for d in items if d.get('recurrence') and d.get('status') != 'cancelled')
+
+        def tz_of(master_id):
+            m = masters.get(master_id)
+            name = time_zone if m is None else m['start'].get('timeZone', time_zone)
+            return get_timezone(name)
+
+        overridden = set()
+        result = []
+        for d in items:
+            if 'recurringEventId' in d and 'originalStartTime' in d:
+                key = d['recurringEventId'], instance_key(d['originalStartTime'], tz_of(d['recurringEventId']))
+                overridden.add(key)
+                if d.get('status') != 'cancelled':
+                    result.append(d)
+            elif d.get('status') != 'cancelled' and not d.get('recurrence'):
+                result.append(d)
+
+        for master_id, m in masters.items():
+            tz = tz_of(master_id)
+            for d in self.expand(m, time_zone, time_min, time_max):
+                if (master_id, instance_key(d['originalStartTime'], tz)) not in overridden:
+                    result.append(d)
+        return result
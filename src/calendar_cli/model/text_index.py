@@ -0,0 +1,54 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+import re
+
+#
+# Tokenizer for the inverted index of events
+#
+# Words are lower-cased. Scripts without spaces between words (Chinese, Japanese) are indexed by single characters
+# and bigrams, so that a query term matches any substring in the text.
+#
+_CJK = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff66-\uff9f'
+_TOKEN = re.compile('([%s]+)|[^\\W%s]+' % (_CJK, _CJK), re.UNICODE)
+
+PREFIX_MARK = '*'
+
+
+def _ngrams(s):
+    return set(s) | set(s[i:i + 2] for i in range(len(s) - 1))
+
+
+def tokenize(text):
+    """
+    :param text: unicode: text to index
+    :return: set of unicode: index terms
+    """
+    terms = set()
+    for m in _TOKEN.finditer(text or ''):
+        if m.group(1):
+            terms.update(_ngrams(m.group(1)))
+        else:
+            terms.add(m.group(0).lower())
+    return terms
+
+
+def parse_query(words):
+    """
+    A word ending with '*' matches every term starting with the word. All the words must match.
+
+    :param words: list of unicode: query words
+    :return: list of (unicode, bool): index terms to look up and whether each is a prefix
+    """
+    result = []
+    for word in words:
+        prefix = word.endswith(PREFIX_MARK)
+        for m in _TOKEN.finditer(word.rstrip(PREFIX_MARK)):
+            s = m.group(1)
+            if s and len(s) == 1:
+                result.append((s, False))
+            elif s:
+                # single characters are also indexed, but bigrams are more selective
+                result.extend((s[i:i + 2], False) for i in range(len(s) - 1))
+            else:
+                result.append((m.group(0).lower(), prefix))
+    return result
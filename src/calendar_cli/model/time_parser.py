@@ -0,0 +1,69 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+import re
+import calendar
+from datetime import datetime
+import pytz
+
+#
+# Fast-path parser for the RFC 3339 strings returned by the Calendar API
+#
+_DATE = re.compile(r'^(\d{4})-(\d{2})-(\d{2})$')
+_DATE_TIME = re.compile(
+    r'^(\d{4})-(\d{2})-(\d{2})[Tt ](\d{2}):(\d{2}):(\d{2})(?:\.(\d{1,6})\d*)?(?:([Zz])|([+-])(\d{2}):(\d{2}))?$')
+
+_timezones = {}
+
+
+def get_timezone(name):
+    """Memoized pytz.timezone()"""
+    tz = _timezones.get(name)
+    if tz is None:
+        tz = _timezones[name] = pytz.timezone(name)
+    return tz
+
+
+def _parse_fallback(s):
+    from dateutil import parser
+
+    return parser.parse(s)
+
+
+def parse_date(s):
+    """
+    :param s: string: e.g. '2015-10-17'
+    :return: datetime: naive datetime at midnight
+    """
+    m = _DATE.match(s)
+    if m is None:
+        return _parse_fallback(s)
+    return datetime(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+
+
+def parse_datetime(s):
+    """
+    :param s: string: e.g. '2015-10-17T10:30:00+09:00', '2015-10-17T01:30:00.000Z', '2015-10-17T10:30:00'
+    :return: datetime: timezone-aware datetime if the offset is given, otherwise naive datetime
+    """
+    m = _DATE_TIME.match(s)
+    if m is None:
+        return _parse_fallback(s)
+
+    year, month, day, hour, minute, second, fraction, utc, sign, offset_hour, offset_minute = m.groups()
+    if utc:
+        tz = pytz.utc
+    elif sign:
+        offset = int(offset_hour) * 60 + int(offset_minute)
+        tz = pytz.FixedOffset(-offset if sign == '-' else offset) if offset else pytz.utc
+    else:
+        tz = None
+    microsecond = int(fraction.ljust(6, '0')) if fraction else 0
+    return datetime(int(year), int(month), int(day), int(hour), int(minute), int(second), microsecond, tz)
+
+
+def to_epoch(dt):
+    """
+    :param dt: datetime: timezone-aware datetime
+    :return: int: epoch seconds
+    """
+    return calendar.timegm(dt.utctimetuple())
@@ -0,0 +1,77 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+from array import array
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from six.moves import zip
+from calendar_cli.model.time_parser import to_epoch
+
+#
+# Time accounting over compact arrays of epoch seconds
+#
+PERIODS = ('day', 'week', 'month')
+
+
+def _period_start(d, period):
+    if period == 'day':
+        return d
+    if period == 'week':
+        return d - timedelta(days=d.weekday())  # weeks start on Monday
+    return d.replace(day=1)
+
+
+def _next_period(d, period):
+    if period == 'day':
+        return d + timedelta(days=1)
+    if period == 'week':
+        return d + timedelta(days=7)
+    return (d.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def period_boundaries(start_time, end_time, period, tz):
+    """
+    :param start_time: datetime: timezone-aware start of the range
+    :param end_time: datetime: timezone-aware end of the range
+    :param period: string: 'day', 'week' or 'month'
+    :param tz: pytz timezone: timezone where periods start at midnight
+    :return: (list of date, array of float): the first date of each period, and the boundaries in epoch seconds,
+             that is, the start time, the start of each following period and the end time
+    """
+    assert period in PERIODS, 'Unknown period: %s' % period
+
+    t_min, t_max = to_epoch(start_time), to_epoch(end_time)
+    labels, bounds = [], array('d', [t_min])
+    d = _period_start(start_time.astimezone(tz).date(), period)
+    while bounds[-1] < t_max:
+        labels.append(d)
+        d = _next_period(d, period)
+        bounds.append(min(t_max, to_epoch(tz.localize(datetime(d.year, d.month, d.day)))))
+    return labels, bounds
+
+
+def aggregate(bounds, starts, ends, groups, num_groups):
+    """
+    Sum the durations of intervals per period and group.
+    An interval is clipped to the range and split at the period boundaries found by binary search.
+
+    :param bounds: array of float: increasing boundaries of the periods
+    :param starts: array of float: start of each interval
+    :param ends: array of float: end of each interval
+    :param groups: array of int: group index of each interval
+    :param num_groups: int: number of groups
+    :return: (list of array of float, list of array of int): total seconds and the number of intervals
+             indexed by [group][period]
+    """
+    n = len(bounds) - 1
+    seconds = [array('d', [0.0]) * n for _ in range(num_groups)]
+    counts = [array('l', [0]) * n for _ in range(num_groups)]
+    lo, hi = bounds[0], bounds[-1]
+
+    for start, end, g in zip(starts, ends, groups):
+        start, end = max(start, lo), min(end, hi)
+        i = bisect_right(bounds, start) - 1
+        while start < end and i < n and bounds[i] < end:
+            seconds[g][i] += min(end, bounds[i + 1]) - max(start, bounds[i])
+            counts[g][i] += 1
+            i += 1
+    return seconds, counts
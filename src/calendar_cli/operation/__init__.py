@@ -1,4 +1,33 @@
-from .help_operation import HelpOperation
-from .setup_operation import SetupOperation
-from .summary_operation import SummaryOperation
-from .create_operation import CreateOperation
+"""
+Operations are loaded lazily so that the command line parser does not import the dependencies of every subcommand.
+"""
+import sys
+import importlib
+
+_REGISTRY = {
+    'HelpOperation': 'help_operation',
+    'SetupOperation': 'setup_operation',
+    'SummaryOperation': 'summary_operation',
+    'CreateOperation': 'create_operation',
+    'BulkCreateOperation': 'bulk_create_operation',
+    'DaemonOperation': 'daemon_operation',
+    'FreeOperation': 'free_operation',
+    'ReportOperation': 'report_operation',
+    'SearchOperation': 'search_operation',
+    'ExportOperation': 'export_operation',
+    'ImportOperation': 'import_operation',
+}
+
+__all__ = sorted(_REGISTRY)
+
+
+def __getattr__(name):
+    if name not in _REGISTRY:
+        raise AttributeError('module %r has no attribute %r' % (__name__, name))
+    return getattr(importlib.import_module('.' + _REGISTRY[name], __name__), name)
+
+
+if sys.version_info < (3, 7):
+    # module-level __getattr__ is not supported (PEP 562)
+    for _name in __all__:
+        globals()[_name] = __getattr__(_name)
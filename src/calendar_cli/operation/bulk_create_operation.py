@@ -0,0 +1,111 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+import io
+import csv
+import itertools
+import json
+import time
+import six
+from calendar_cli.operation.operation import Operation
+from calendar_cli.model import Event
+from calendar_cli.i18n import MSG_EVENT_CREATED, MSG_EVENT_CREATE_FAILED, MSG_BULK_CREATE_SUMMARY
+from mog_commons.functional import omap
+from mog_commons.io import print_safe
+
+
+class BulkCreateOperation(Operation):
+    """Create events listed in a CSV or JSON Lines file to Google Calendar"""
+
+    def __init__(self, calendar_id, path, credential_path, now, cache_dir=None):
+        """
+        :param calendar_id: string: calendar id
+        :param path: string: path to the CSV (*.csv) or JSON Lines file
+                     Each row has 'summary', 'date', 'start', 'end' and 'location' fields in the same format as the
+                     options of the create command. A JSON object can also have the event resource of the API.
+        :param credential_path: string: path to the credential file
+        :param now: datetime: current time to complete the date of the events
+        :param cache_dir: string: directory for the discovery document cache (None: disable the cache)
+        """
+        Operation.__init__(
+            self,
+            ('calendar_id', calendar_id),
+            ('path', path),
+            ('credential_path', credential_path),
+            ('now', now),
+            ('cache_dir', cache_dir)
+        )
+
+    def _iter_records(self):
+        """
+        :return: generator of (int, dict or unicode): line number and the record, or the raw line of a JSON Lines file
+                 which is decoded for each row so that a malformed line is reported as a failed row
+        """
+        if self.path.lower().endswith('.csv'):
+            if six.PY2:
+                with open(self.path, 'rb') as f:
+                    reader = csv.DictReader(f)
+                    for d in reader:
+                        yield reader.line_num, dict((k.decode('utf-8'), omap(lambda x: x.decode('utf-8'), v))
+                                                    for k, v in d.items())
+            else:
+                with io.open(self.path, encoding='utf-8', newline='') as f:
+                    reader = csv.DictReader(f)
+                    for d in reader:
+                        yield reader.line_num, d
+        else:
+            with io.open(self.path, encoding='utf-8') as f:
+                for i, line in enumerate(f):
+                    if line.strip():
+                        yield i + 1, line
+
+    def _parse_record(self, d):
+        from calendar_cli.setting.setting import Setting
+
+        if isinstance(d.get('start'), dict):
+            # event resource of the API; ids of instances on another calendar are not valid for a new event
+            return Event.parse_dict(d, str(self.now.tzinfo)).copy(event_id=None)
+
+        assert d.get('summary'), 'summary is missing'
+        start, end = Setting._parse_time_range(d.get('date') or None, d.get('start') or None, d.get('end') or None,
+                                               self.now)
+        return Event(start, end, d['summary'], location=d.get('location') or None)
+
+    def _iter_rows(self):
+        """
+        :return: generator of (int, Event or Exception): line number and the parsed event or the parse error
+        """
+        for line_num, d in self._iter_records():
+            try:
+                yield line_num, self._parse_record(d if isinstance(d, dict) else json.loads(d))
+            except Exception as e:
+                yield line_num, e
+
+    def run(self):
+        from calendar_cli.service import GoogleCalendarService
+        from calendar_cli.service.google_calendar_service import BATCH_SIZE
+
+        service = GoogleCalendarService.shared(self.credential_path, self.cache_dir, event_cache=False)
+
+        t = time.time()
+        num_rows, num_created = 0, 0
+        rows = self._iter_rows()
+        while True:
+            chunk = list(itertools.islice(rows, BATCH_SIZE))
+            if not chunk:
+                break
+
+            results = service.insert_events(self.calendar_id, [x for _, x in chunk if isinstance(x, Event)])
+            for line_num, x in chunk:
+                e = next(results)[2] if isinstance(x, Event) else x
+                if e is None:
+                    print_safe(MSG_EVENT_CREATED % {'event': x.to_long_summary()})
+                    num_created += 1
+                else:
+                    print_safe(MSG_EVENT_CREATE_FAILED % {'line': line_num, 'error': '%s: %s' % (
+                        e.__class__.__name__, e)})
+            num_rows += len(chunk)
+
+        elapsed = time.time() - t
+        print_safe(MSG_BULK_CREATE_SUMMARY % {
+            'created': num_created, 'total': num_rows, 'elapsed': elapsed, 'rate': num_created / max(elapsed, 1e-6)})
+        return 0 if num_created == num_rows else 1
@@ -0,0 +1,54 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+import sys
+import signal
+import logging
+from calendar_cli.operation.operation import Operation
+from calendar_cli.i18n import MSG_DAEMON_STARTED
+from mog_commons.io import print_safe
+
+
+class DaemonOperation(Operation):
+    """Serve commands over a Unix domain socket keeping the API clients in memory"""
+
+    def __init__(self, socket_path):
+        """
+        :param socket_path: string: path to the socket file
+        """
+        Operation.__init__(self, ('socket_path', socket_path))
+
+    @staticmethod
+    def _handle(argv):
+        import tzlocal
+        from calendar_cli.calendar_cli import execute
+        from calendar_cli.service import GoogleCalendarService
+        from calendar_cli.setting import arg_parser
+        from calendar_cli.util.profiler import profiler
+
+        # the environment of the client is applied by the server; pick up its time zone and default options
+        tzlocal.reload_localzone()
+        arg_parser.reload()
+
+        profiler.reset(argv)
+        logging.getLogger('calendar_cli').setLevel(logging.WARNING)  # enabled by --debug for each command
+        try:
+            return_code = execute(argv)
+        except SystemExit as e:
+            # the option parser exits on invalid options
+            return_code = e.code
+
+        if return_code == 2:
+            # reload the credentials and the API client on the next request, e.g. after the credentials are renewed
+            GoogleCalendarService.clear_shared()
+        return return_code
+
+    def run(self):
+        from calendar_cli.util.daemon import DaemonServer
+        from calendar_cli.service import GoogleCalendarService  # import the API client stack only once
+
+        server = DaemonServer(self.socket_path, self._handle)
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+        print_safe(MSG_DAEMON_STARTED % {'path': self.socket_path})
+        server.serve_forever()
+        return 0
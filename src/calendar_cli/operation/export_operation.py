@@ -0,0 +1,171 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+import os
+import io
+import sys
+import json
+from calendar_cli.operation.operation import Operation
+from calendar_cli.operation.summary_operation import split_calendar_ids
+from calendar_cli.model import ical
+from calendar_cli.i18n import MSG_EXPORT_RESUMED, MSG_EXPORT_SUMMARY
+from mog_commons.io import print_safe
+
+EXPORT_FORMATS = ('ics', 'jsonl')
+CHECKPOINT_SUFFIX = '.checkpoint'
+
+
+class ExportOperation(Operation):
+    """Write events to an iCalendar or JSON Lines file"""
+
+    def __init__(self, calendar_id, start_time, duration, credential_path, output_path, export_format=None,
+                 page_size=None, cache_dir=None):
+        """
+        :param calendar_id: string: calendar id, comma-separated calendar ids or 'all'
+        :param start_time: datetime in tzinfo-aware
+        :param duration: timedelta
+        :param credential_path: string: path to the credential file
+        :param output_path: string: path to the output file (None: stdout)
+                            A checkpoint is saved next to the file after each page, and an interrupted export
+                            with the same arguments resumes from it.
+        :param export_format: string: 'ics' or 'jsonl' (event resources of the API)
+                              (None: 'jsonl' for *.jsonl and *.json files, otherwise 'ics')
+        :param page_size: int: number of events fetched per request (None: service default)
+        :param cache_dir: string: directory for the discovery document cache (None: disable the cache)
+        """
+        assert start_time.tzinfo is not None, 'start_time must be tzinfo-aware'
+        if export_format is None:
+            is_jsonl = output_path and os.path.splitext(output_path)[1].lower() in ('.jsonl', '.json')
+            export_format = 'jsonl' if is_jsonl else 'ics'
+        assert export_format in EXPORT_FORMATS, 'Unknown export format: %s' % export_format
+
+        Operation.__init__(
+            self,
+            ('calendar_id', calendar_id),
+            ('start_time', start_time),
+            ('duration', duration),
+            ('credential_path', credential_path),
+            ('output_path', output_path),
+            ('export_format', export_format),
+            ('page_size', page_size),
+            ('cache_dir', cache_dir)
+        )
+
+    def _checkpoint_key(self):
+        """Identify the export so that a checkpoint of different arguments is never resumed."""
+        return {
+            'calendar_id': self.calendar_id,
+            'time_min': self.start_time.isoformat(),
+            'time_max': (self.start_time + self.duration).isoformat(),
+            'format': self.export_format,
+        }
+
+    def _checkpoint_path(self):
+        return self.output_path + CHECKPOINT_SUFFIX
+
+    def _load_checkpoint(self):
+        """
+        :return: dict: saved state, or None if the export should start from the beginning
+        """
+        try:
+            with io.open(self._checkpoint_path(), encoding='utf-8') as f:
+                state = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+        if state.get('key') != self._checkpoint_key() or not os.path.exists(self.output_path) or \
+                os.path.getsize(self.output_path) < state['offset']:
+            return None
+        return state
+
+    def _save_checkpoint(self, state):
+        # write to a temporary file and rename it so that a crash never leaves a partial checkpoint
+        path = self._checkpoint_path()
+        tmp_path = '%s.%d.tmp' % (path, os.getpid())
+        with io.open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(state, ensure_ascii=False))
+        os.rename(tmp_path, path)
+
+    def _format_page(self, items, time_zone):
+        """
+        :return: bytes: encoded events in the page
+        """
+        if self.export_format == 'ics':
+            s = ''.join(ical.format_event(d, time_zone) for d in items)
+        else:
+            s = ''.join(json.dumps(d, ensure_ascii=False) + '\n' for d in items)
+        return s.encode('utf-8')
+
+    def _export(self, service, calendar_ids, output, state, on_page):
+        """
+        Write the events page by page from the position of the state.
+
+        :param output: binary file object
+        :param state: dict: calendar_index, page_token and count
+        :param on_page: function called after each page is written
+        """
+        time_max = self.start_time + self.duration
+        for i in range(state['calendar_index'], len(calendar_ids)):
+            page_token = state['page_token'] if i == state['calendar_index'] else None
+            pages = service.iter_event_pages(calendar_ids[i], self.start_time, time_max, self.page_size, page_token)
+            for time_zone, items, next_page_token in pages:
+                output.write(self._format_page(items, time_zone))
+                state['calendar_index'] = i if next_page_token else i + 1
+                state['page_token'] = next_page_token
+                state['count'] += len(items)
+                on_page()
+
+    def _write_stdout(self, service):
+        calendar_ids = split_calendar_ids(self.calendar_id) or service.list_calendar_ids()
+        state = {'calendar_ids': calendar_ids, 'calendar_index': 0, 'page_token': None, 'count': 0}
+        output = getattr(sys.stdout, 'buffer', sys.stdout)
+        if self.export_format == 'ics':
+            output.write(ical.header().encode('utf-8'))
+        self._export(service, calendar_ids, output, state, output.flush)
+        if self.export_format == 'ics':
+            output.write(ical.footer().encode('utf-8'))
+        output.flush()
+
+    def _write_file(self, service):
+        """
+        :return: int: number of exported events
+        """
+        state = self._load_checkpoint()
+        if state is None:
+            calendar_ids = split_calendar_ids(self.calendar_id) or service.list_calendar_ids()
+            output = io.open(self.output_path, 'wb')
+            if self.export_format == 'ics':
+                output.write(ical.header().encode('utf-8'))
+            state = {'key': self._checkpoint_key(), 'calendar_ids': calendar_ids, 'calendar_index': 0,
+                     'page_token': None, 'offset': output.tell(), 'count': 0}
+        else:
+            # discard the output written after the checkpoint
+            print_safe(MSG_EXPORT_RESUMED % {'count': state['count']}, output=sys.stderr)
+            output = io.open(self.output_path, 'r+b')
+            output.seek(state['offset'])
+            output.truncate()
+
+        def on_page():
+            # the checkpoint must not point beyond the data on the disk
+            output.flush()
+            os.fsync(output.fileno())
+            state['offset'] = output.tell()
+            self._save_checkpoint(state)
+
+        with output:
+            on_page()
+            self._export(service, state['calendar_ids'], output, state, on_page)
+            if self.export_format == 'ics':
+                output.write(ical.footer().encode('utf-8'))
+
+        os.remove(self._checkpoint_path())
+        return state['count']
+
+    def run(self):
+        from calendar_cli.service import GoogleCalendarService
+
+        service = GoogleCalendarService.shared(self.credential_path, self.cache_dir, event_cache=False)
+        if self.output_path is None:
+            self._write_stdout(service)
+        else:
+            count = self._write_file(service)
+            print_safe(MSG_EXPORT_SUMMARY % {'count': count, 'path': self.output_path}, output=sys.stderr)
+        return 0
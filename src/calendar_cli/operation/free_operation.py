@@ -0,0 +1,86 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+from datetime import timedelta
+from tzlocal import get_localzone
+from calendar_cli.operation.operation import Operation
+from calendar_cli.operation.summary_operation import split_calendar_ids
+from calendar_cli.model import EventTime
+from calendar_cli.model.interval import merge_intervals, subtract_intervals, daily_intervals
+from calendar_cli.util.output_writer import OutputWriter
+
+WEEKDAYS = frozenset(range(5))
+
+
+class FreeOperation(Operation):
+    """Print free time slots common to Google Calendars"""
+
+    def __init__(self, calendar_id, start_time, duration, credential_path, work_start, work_end, min_length,
+                 weekends=False, cache_dir=None):
+        """
+        :param calendar_id: string: calendar id, comma-separated calendar ids or 'all'
+        :param start_time: datetime in tzinfo-aware: start of the first date
+        :param duration: timedelta: whole days to search
+        :param credential_path: string: path to the credential file
+        :param work_start: time: start of working hours
+        :param work_end: time: end of working hours
+        :param min_length: timedelta: minimum length of free slots
+        :param weekends: bool: True if Saturdays and Sundays are included
+        :param cache_dir: string: directory for the discovery document cache (None: disable the cache)
+        """
+        assert start_time.tzinfo is not None, 'start_time must be tzinfo-aware'
+        assert work_start < work_end, 'working hours must end after they start: %s-%s' % (work_start, work_end)
+
+        Operation.__init__(
+            self,
+            ('calendar_id', calendar_id),
+            ('start_time', start_time),
+            ('duration', duration),
+            ('credential_path', credential_path),
+            ('work_start', work_start),
+            ('work_end', work_end),
+            ('min_length', min_length),
+            ('weekends', weekends),
+            ('cache_dir', cache_dir)
+        )
+
+    def _find_free(self, busy):
+        """
+        :param busy: list of (datetime, datetime): busy intervals in any order
+        :return: generator of (datetime, datetime): free slots in working hours ordered by the start
+        """
+        first_date = self.start_time.date()
+        last_date = (self.start_time + self.duration - timedelta(days=1)).date()
+        windows = daily_intervals(first_date, last_date, self.work_start, self.work_end, get_localzone(),
+                                  None if self.weekends else WEEKDAYS)
+
+        for start, end in subtract_intervals(list(windows), merge_intervals(busy)):
+            if end - start >= self.min_length:
+                yield start, end
+
+    @staticmethod
+    def _format_slot(start, end):
+        """
+        :return: e.g. '2015-10-14 Wed [10:00-11:30] 1:30'
+        """
+        minutes = int((end - start).total_seconds()) // 60
+        return '%s [%s-%s] %d:%02d' % (EventTime(True, start).to_long_summary(), start.strftime('%H:%M'),
+                                       end.strftime('%H:%M'), minutes // 60, minutes % 60)
+
+    def run(self):
+        from calendar_cli.service import GoogleCalendarService
+
+        service = GoogleCalendarService.shared(self.credential_path, self.cache_dir, event_cache=False)
+        calendar_ids = split_calendar_ids(self.calendar_id)
+        if calendar_ids is None:
+            calendar_ids = service.list_calendar_ids()
+
+        busy = service.list_busy(calendar_ids, self.start_time, self.start_time + self.duration)
+
+        with OutputWriter() as writer:
+            empty = True
+            for start, end in self._find_free(busy):
+                writer.write_line(self._format_slot(start, end))
+                empty = False
+            if empty:
+                writer.write_line('')
+        return 0
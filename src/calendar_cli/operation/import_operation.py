@@ -0,0 +1,142 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+import io
+import time
+from calendar_cli.operation.operation import Operation
+from calendar_cli.model import ical
+from calendar_cli.model.recurrence import instance_key
+from calendar_cli.i18n import MSG_EVENT_CREATE_FAILED, MSG_IMPORT_SUMMARY
+from mog_commons.io import print_safe
+
+DEFAULT_MAX_WORKERS = 4
+
+
+def _status(e):
+    from apiclient.errors import HttpError
+
+    return e.resp.status if isinstance(e, HttpError) else None
+
+
+class ImportOperation(Operation):
+    """Import events in an iCalendar file to Google Calendar"""
+
+    def __init__(self, calendar_id, path, credential_path, default_timezone, cache_dir=None,
+                 max_workers=DEFAULT_MAX_WORKERS):
+        """
+        :param calendar_id: string: calendar id
+        :param path: string: path to the iCalendar file
+        :param credential_path: string: path to the credential file
+        :param default_timezone: string: time zone for dates and floating times unless the file has X-WR-TIMEZONE
+        :param cache_dir: string: directory for the discovery document cache (None: disable the cache)
+        :param max_workers: int: maximum number of batch requests sent at the same time
+        """
+        assert max_workers > 0, 'max_workers must be positive: %d' % max_workers
+
+        Operation.__init__(
+            self,
+            ('calendar_id', calendar_id),
+            ('path', path),
+            ('credential_path', credential_path),
+            ('default_timezone', default_timezone),
+            ('cache_dir', cache_dir),
+            ('max_workers', max_workers)
+        )
+
+    def _iter_rows(self, masters, modifications):
+        """
+        Parse the file lazily. Modified or cancelled instances of recurring events are kept in modifications
+        so that they are applied after the recurring events are created.
+
+        :param masters: set to add the ids of the events to insert to
+        :param modifications: list to append (int, string, string, Event) to: line number, id of the recurring event,
+                              instance id and the new event (None for a cancelled instance)
+        :return: generator of (int, Event or Exception): line number and the event to insert or the parse error
+        """
+        with io.open(self.path, encoding='utf-8', errors='replace') as f:
+            for line_num, x in ical.iter_events(f, self.default_timezone):
+                if isinstance(x, Exception):
+                    yield line_num, x
+                    continue
+
+                ev, original_start, cancelled = x
+                if original_start is not None:
+                    key = instance_key(original_start.to_dict(), original_start.datetime_tz.tzinfo)
+                    instance_id = '%s_%s' % (ev.event_id, key)
+                    modifications.append(
+                        (line_num, ev.event_id, instance_id, None if cancelled else ev.copy(event_id=None)))
+                elif not cancelled:
+                    masters.add(ev.event_id)
+                    yield line_num, ev
+
+    def _report_error(self, line_num, e):
+        print_safe(MSG_EVENT_CREATE_FAILED % {'line': line_num, 'error': '%s: %s' % (e.__class__.__name__, e)})
+
+    def _import(self, service):
+        """
+        :return: (int, int, int): numbers of the created, already existing and all the events
+        """
+        counts = [0, 0, 0]  # created, existing and all the events
+        line_nums = {}
+        masters = set()
+        modifications = []
+
+        def events():
+            for line_num, x in self._iter_rows(masters, modifications):
+                if isinstance(x, Exception):
+                    self._report_error(line_num, x)
+                    counts[2] += 1
+                else:
+                    line_nums[x.event_id] = line_num
+                    yield x
+
+        def insert(events):
+            for ev, _, e in service.insert_events(self.calendar_id, events, max_workers=self.max_workers):
+                line_num = line_nums.pop(ev.event_id, 0)
+                if e is None:
+                    counts[0] += 1
+                elif _status(e) == 409:
+                    counts[1] += 1  # imported before
+                else:
+                    self._report_error(line_num, e)
+                counts[2] += 1
+
+        # parse errors are reported while the events are consumed
+        insert(events())
+
+        # modified instances of recurring events are usually few, so they are kept in memory until the end
+        updates = [(line_num, i, ev) for line_num, master_id, i, ev in modifications if master_id in masters]
+        lines = dict((instance_id, line_num) for line_num, instance_id, _ in updates)
+        for instance_id, ev, e in service.update_events(self.calendar_id, [(i, ev) for _, i, ev in updates]):
+            if e is None or (ev is None and _status(e) in (404, 410)):
+                counts[0] += 1
+            else:
+                self._report_error(lines[instance_id], e)
+            counts[2] += 1
+
+        # instances without the recurring event in the file, e.g. exported by other clients, are inserted as
+        # standalone events with the ids derived from the UID and RECURRENCE-ID; cancelled ones have nothing to do
+        orphans = []
+        for line_num, master_id, instance_id, ev in modifications:
+            if master_id in masters:
+                continue
+            if ev is None:
+                counts[0] += 1
+                counts[2] += 1
+            else:
+                orphans.append(ev.copy(event_id=ical.event_id(instance_id)))
+                line_nums[orphans[-1].event_id] = line_num
+        insert(orphans)
+        return tuple(counts)
+
+    def run(self):
+        from calendar_cli.service import GoogleCalendarService
+
+        service = GoogleCalendarService.shared(self.credential_path, self.cache_dir, event_cache=False)
+
+        t = time.time()
+        num_created, num_existing, num_rows = self._import(service)
+        elapsed = time.time() - t
+        print_safe(MSG_IMPORT_SUMMARY % {
+            'created': num_created, 'existing': num_existing, 'total': num_rows, 'elapsed': elapsed,
+            'rate': num_created / max(elapsed, 1e-6)})
+        return 0 if num_created + num_existing == num_rows else 1
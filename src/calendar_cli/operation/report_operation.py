@@ -0,0 +1,138 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+import json
+from array import array
+from tzlocal import get_localzone
+from calendar_cli.operation.operation import Operation
+from calendar_cli.operation.summary_operation import split_calendar_ids
+from calendar_cli.model.time_report import PERIODS, period_boundaries, aggregate
+from calendar_cli.util.output_writer import OutputWriter
+
+GROUP_BY_CALENDAR = 'calendar'
+GROUP_BY_KEYWORD = 'keyword'
+OTHER_GROUP = '(other)'
+REPORT_FORMATS = ('csv', 'json')
+CSV_HEADER = ('period', 'group', 'hours', 'events')
+
+
+def _csv_field(s):
+    return '"%s"' % s.replace('"', '""') if any(c in s for c in ',"\r\n') else s
+
+
+class ReportOperation(Operation):
+    """Print hours of timed events per period and group"""
+
+    def __init__(self, calendar_id, start_time, duration, credential_path, period, group_by, keywords,
+                 report_format, page_size=None, cache_dir=None, offline=False, event_cache=True):
+        """
+        :param calendar_id: string: calendar id, comma-separated calendar ids or 'all'
+        :param start_time: datetime in tzinfo-aware
+        :param duration: timedelta
+        :param credential_path: string: path to the credential file
+        :param period: string: 'day', 'week' or 'month'
+        :param group_by: string: 'calendar' or 'keyword'
+        :param keywords: list of string: events are grouped by the first keyword contained in the summary
+                         (empty: group by the whole summary)
+        :param report_format: string: 'csv' or 'json'
+        :param page_size: int: number of events fetched per request (None: service default)
+        :param cache_dir: string: directory for the local caches (None: disable the caches)
+        :param offline: bool: read events only from the local event cache
+        :param event_cache: bool: False if events should be fetched from the server with the response cache only
+        """
+        assert start_time.tzinfo is not None, 'start_time must be tzinfo-aware'
+        assert period in PERIODS, 'Unknown period: %s' % period
+        assert group_by in (GROUP_BY_CALENDAR, GROUP_BY_KEYWORD), 'Unknown group: %s' % group_by
+        assert report_format in REPORT_FORMATS, 'Unknown report format: %s' % report_format
+        assert (cache_dir is not None and event_cache) or not offline, 'event cache must be enabled'
+
+        Operation.__init__(
+            self,
+            ('calendar_id', calendar_id),
+            ('start_time', start_time),
+            ('duration', duration),
+            ('credential_path', credential_path),
+            ('period', period),
+            ('group_by', group_by),
+            ('keywords', keywords),
+            ('report_format', report_format),
+            ('page_size', page_size),
+            ('cache_dir', cache_dir),
+            ('offline', offline),
+            ('event_cache', event_cache)
+        )
+
+    def _group_name(self, calendar_id, summary):
+        if self.group_by == GROUP_BY_CALENDAR:
+            return calendar_id
+        if not self.keywords:
+            return summary or ''
+        s = (summary or '').lower()
+        for k in self.keywords:
+            if k.lower() in s:
+                return k
+        return OTHER_GROUP
+
+    def _make_rows(self, intervals):
+        """
+        :param intervals: iterable of (calendar_id, (start_epoch, end_epoch, all_day, summary))
+        :return: generator of (date, string, float, int): period, group, hours and the number of events
+        """
+        starts, ends, groups = array('d'), array('d'), array('l')
+        names, index = [], {}
+        for calendar_id, (start, end, all_day, summary) in intervals:
+            if all_day:
+                continue
+            name = self._group_name(calendar_id, summary)
+            g = index.get(name)
+            if g is None:
+                g = index[name] = len(names)
+                names.append(name)
+            starts.append(start)
+            ends.append(end)
+            groups.append(g)
+
+        labels, bounds = period_boundaries(self.start_time, self.start_time + self.duration, self.period,
+                                           get_localzone())
+        seconds, counts = aggregate(bounds, starts, ends, groups, len(names))
+
+        order = sorted(range(len(names)), key=lambda g: names[g])
+        for i, label in enumerate(labels):
+            for g in order:
+                if counts[g][i]:
+                    yield label, names[g], seconds[g][i] / 3600, counts[g][i]
+
+    def _iter_output(self, rows):
+        if self.report_format == 'json':
+            yield json.dumps([{'period': p.isoformat(), 'group': g, 'hours': round(h, 2), 'events': n}
+                              for p, g, h, n in rows], ensure_ascii=False, indent=2)
+        else:
+            yield ','.join(CSV_HEADER)
+            for p, g, h, n in rows:
+                yield '%s,%s,%.2f,%d' % (p.isoformat(), _csv_field(g), h, n)
+
+    def _iter_intervals(self):
+        time_max = self.start_time + self.duration
+        calendar_ids = split_calendar_ids(self.calendar_id)
+
+        if self.offline:
+            from calendar_cli.service import EventCache
+
+            cache = EventCache(EventCache.get_path(self.cache_dir, self.credential_path))
+            for c in (cache.list_calendar_ids() if calendar_ids is None else calendar_ids):
+                for x in cache.iter_intervals(c, self.start_time, time_max):
+                    yield c, x
+            return
+
+        from calendar_cli.service import GoogleCalendarService
+
+        service = GoogleCalendarService.shared(self.credential_path, self.cache_dir, self.event_cache)
+        for c in (service.list_calendar_ids() if calendar_ids is None else calendar_ids):
+            for x in service.iter_intervals(c, self.start_time, time_max, self.page_size):
+                yield c, x
+
+    def run(self):
+        rows = self._make_rows(self._iter_intervals())
+        with OutputWriter() as writer:
+            for s in self._iter_output(rows):
+                writer.write_line(s)
+        return 0
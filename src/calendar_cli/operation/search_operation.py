@@ -0,0 +1,80 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+from calendar_cli.operation.operation import Operation
+from calendar_cli.operation.summary_operation import split_calendar_ids
+from calendar_cli.model import EventFormatter
+from calendar_cli.model.text_index import parse_query
+from calendar_cli.util.output_writer import OutputWriter
+
+
+class SearchOperation(Operation):
+    """Print events matching the query from the local event cache"""
+
+    def __init__(self, calendar_id, query, start_time, duration, credential_path, format, cache_dir,
+                 offline=False, max_age=None):
+        """
+        :param calendar_id: string: calendar id, comma-separated calendar ids or 'all'
+        :param query: list of string: query words. A word ending with '*' is a prefix.
+        :param start_time: datetime in tzinfo-aware: start of the range (None: no limit)
+        :param duration: timedelta: length of the range (None: no limit)
+        :param credential_path: string: path to the credential file
+        :param format: string: format string
+        :param cache_dir: string: directory for the local event cache
+        :param offline: bool: search the local event cache without synchronization
+        :param max_age: int: skip synchronization if the cache is newer than max_age seconds
+        """
+        assert query, 'Search query is empty.'
+        assert cache_dir is not None, 'event cache must be enabled'
+
+        Operation.__init__(
+            self,
+            ('calendar_id', calendar_id),
+            ('query', query),
+            ('start_time', start_time),
+            ('duration', duration),
+            ('credential_path', credential_path),
+            ('format', format),
+            ('cache_dir', cache_dir),
+            ('offline', offline),
+            ('max_age', max_age)
+        )
+
+    def _sync(self, cache, calendar_ids):
+        """
+        Bring the cache up to date unless it is fresh enough.
+
+        :return: list of string: calendar ids to search (None: all the synchronized calendars)
+        """
+        if self.offline:
+            return calendar_ids
+        if self.max_age is not None and calendar_ids and all(cache.is_fresh(c, self.max_age) for c in calendar_ids):
+            return calendar_ids
+
+        from calendar_cli.service import GoogleCalendarService
+
+        service = GoogleCalendarService.shared(self.credential_path, self.cache_dir)
+        if calendar_ids is None:
+            calendar_ids = service.list_calendar_ids()
+        for c in calendar_ids:
+            if self.max_age is None or not cache.is_fresh(c, self.max_age):
+                service.sync_events(c)
+        return calendar_ids
+
+    def run(self):
+        from calendar_cli.service import EventCache
+
+        cache = EventCache(EventCache.get_path(self.cache_dir, self.credential_path))
+        calendar_ids = self._sync(cache, split_calendar_ids(self.calendar_id))
+
+        time_max = None if self.start_time is None else self.start_time + self.duration
+        events = cache.search(parse_query(self.query), calendar_ids, self.start_time, time_max)
+
+        formatter = EventFormatter.compile(self.format)
+        with OutputWriter() as writer:
+            empty = True
+            for ev in events:
+                writer.write_line(formatter.format(ev))
+                empty = False
+            if empty:
+                writer.write_line('')
+        return 0
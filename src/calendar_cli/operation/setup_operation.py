@@ -1,8 +1,6 @@
 from __future__ import division, print_function, absolute_import, unicode_literals
 
 import os
-import argparse
-import oauth2client.tools
 from calendar_cli.operation.operation import Operation
 from mog_commons.io import print_safe
 
@@ -24,11 +22,16 @@ class SetupOperation(Operation):
                            ('no_browser', no_browser))
 
     def run(self):
+        import argparse
+        import oauth2client.client
+        import oauth2client.tools
+        from calendar_cli.service import CredentialStore
+
         assert not os.path.exists(self.credential_path), 'Credential file already exists: %s' % self.credential_path
 
         scopes = [SCOPE_READ_ONLY if self.read_only else SCOPE_READ_WRITE]
         flow = oauth2client.client.flow_from_clientsecrets(self.secret_path, scopes)
-        store = oauth2client.file.Storage(self.credential_path)
+        store = CredentialStore(self.credential_path)
         args = ['--noauth_local_webserver'] if self.no_browser else []
         flags = argparse.ArgumentParser(parents=[oauth2client.tools.argparser]).parse_args(args)
 
@@ -2,24 +2,48 @@ from __future__ import division, print_function, absolute_import, unicode_litera
 
 import itertools
 from calendar_cli.operation.operation import Operation
-from calendar_cli.service import GoogleCalendarService
-from mog_commons.functional import omap
-from mog_commons.io import print_safe
+from calendar_cli.model import Event, EventFormatter
+from calendar_cli.util.output_writer import OutputWriter
+from calendar_cli.util.profiler import profiler
+
+ALL_CALENDARS = 'all'
+
+
+def split_calendar_ids(calendar_id):
+    """
+    :param calendar_id: string: calendar id, comma-separated calendar ids or 'all'
+    :return: list of string: calendar ids, or None for all the calendars
+    """
+    if calendar_id == ALL_CALENDARS:
+        return None
+    return [x.strip() for x in calendar_id.split(',') if x.strip()]
 
 
 class SummaryOperation(Operation):
     """Print summary of Google Calender"""
 
-    def __init__(self, calendar_id, start_time, duration, credential_path, format, separator):
+    def __init__(self, calendar_id, start_time, duration, credential_path, format, separator,
+                 page_size=None, cache_dir=None, offline=False, max_age=None, conflicts_only=False,
+                 expand_locally=False, event_cache=True):
         """
-        :param calendar_id: string: calendar id
+        :param calendar_id: string: calendar id, comma-separated calendar ids or 'all'
         :param start_time: datetime in tzinfo-aware
         :param duration: timedelta
         :param credential_path: string: path to the credential file
         :param format: string: format string
         :param separator: string: date separator string
+        :param page_size: int: number of events fetched per request (None: service default)
+        :param cache_dir: string: directory for the local caches (None: disable the caches)
+        :param offline: bool: read events only from the local event cache
+        :param max_age: int: use the local event cache without synchronization if it is newer than max_age seconds
+        :param conflicts_only: bool: print only timed events overlapping another timed event
+        :param expand_locally: bool: expand recurring events locally instead of using the event cache
+        :param event_cache: bool: False if events should be fetched from the server with the response cache only
         """
         assert start_time.tzinfo is not None, 'start_time must be tzinfo-aware'
+        assert (cache_dir is not None and event_cache) or not (offline or max_age is not None), \
+            'event cache must be enabled'
+        assert not (expand_locally and (offline or max_age is not None)), 'event cache must be used'
 
         Operation.__init__(
             self,
@@ -28,25 +52,124 @@ class SummaryOperation(Operation):
             ('duration', duration),
             ('credential_path', credential_path),
             ('format', format),
-            ('separator', separator)
+            ('separator', separator),
+            ('page_size', page_size),
+            ('cache_dir', cache_dir),
+            ('offline', offline),
+            ('max_age', max_age),
+            ('conflicts_only', conflicts_only),
+            ('expand_locally', expand_locally),
+            ('event_cache', event_cache)
         )
 
+    def _iter_output(self, events):
+        """
+        Generate the output string for each event date.
+
+        :param events: iterable of Event ordered by the start date
+        """
+
+        formatter = EventFormatter.compile(self.format)
+
+        # detecting conflicts holds back each cluster of overlapping events, so skip it unless it is needed
+        if self.conflicts_only or 'X' in formatter.symbols:
+            events = Event.mark_conflicts(events)
+        if self.conflicts_only:
+            events = (e for e in events if e.conflict)
+
+        # group by event date, and sort events in each group (all-day events come first)
+        f = lambda e: e.start_time.to_date()
+        for i, (k, g) in enumerate(itertools.groupby(events, f)):
+            s = '\n'.join(formatter.format(e) for e in sorted(g))
+            yield s if i == 0 or self.separator is None else self.separator + '\n' + s
+
     def _make_output(self, events):
         """Make the output string from an event list."""
+        return '\n'.join(self._iter_output(events))
 
-        # group by event date
-        f = lambda e: e.start_time.to_date()
-        evs = ['\n'.join(e.to_format(self.format) for e in g) for k, g in itertools.groupby(events, f)]
-        sep = (omap(lambda s: '\n' + s, self.separator) or '') + '\n'
+    def _write_output(self, events, writer):
+        """
+        Write the output for each event date without keeping the whole output in memory.
+
+        :param writer: OutputWriter:
+        """
+        empty = True
+        for s in self._iter_output(events):
+            writer.write_line(s)
+            writer.flush_lines()
+            empty = False
 
-        # make the result string
-        return sep.join(evs)
+        if empty:
+            writer.write_line('')
+
+    @staticmethod
+    def _profile_events(events):
+        """
+        Decode each event in the 'parse' phase so that the 'render' phase only measures formatting and writing.
+        Waiting for the next event is measured in the 'fetch' phase.
+        """
+        it = iter(events)
+        while True:
+            with profiler.phase('fetch'):
+                try:
+                    ev = next(it)
+                except StopIteration:
+                    return
+            with profiler.phase('parse'):
+                ev.values()
+            yield ev
+
+    def _calendar_ids(self):
+        """
+        :return: list of string: calendar ids, or None for all the calendars
+        """
+        return split_calendar_ids(self.calendar_id)
+
+    def _iter_cached_events(self):
+        """
+        :return: generator of Event from the local event cache, or None if the cache needs synchronization
+        """
+        if not (self.offline or self.max_age is not None):
+            return None
+
+        from calendar_cli.service import EventCache
+
+        cache = EventCache(EventCache.get_path(self.cache_dir, self.credential_path))
+        calendar_ids = self._calendar_ids()
+        if calendar_ids is None:
+            calendar_ids = cache.list_calendar_ids()
+
+        if self.offline or (calendar_ids and all(cache.is_fresh(c, self.max_age) for c in calendar_ids)):
+            time_max = self.start_time + self.duration
+            return Event.merge([cache.iter_events(c, self.start_time, time_max) for c in calendar_ids])
+        return None
 
     def run(self):
-        # fetch events
-        service = GoogleCalendarService(self.credential_path)
-        events = service.list_events(self.calendar_id, self.start_time, self.start_time + self.duration)
+        # skip loading credentials and accessing the server if the cache is fresh enough
+        events = self._iter_cached_events()
+
+        if events is None:
+            from calendar_cli.service import GoogleCalendarService
+
+            service = GoogleCalendarService.shared(self.credential_path, self.cache_dir, self.event_cache)
+            calendar_ids = self._calendar_ids()
+            if calendar_ids is None:
+                calendar_ids = service.list_calendar_ids()
+
+            # fetch events lazily, downloading only the fields used in the format
+            time_max = self.start_time + self.duration
+            fields = EventFormatter.compile(self.format).resource_fields
+            if len(calendar_ids) == 1:
+                events = service.iter_events(calendar_ids[0], self.start_time, time_max, self.page_size, fields,
+                                             self.expand_locally)
+            else:
+                events = Event.merge(service.iter_events_concurrently(
+                    calendar_ids, self.start_time, time_max, self.page_size, fields,
+                    expand_locally=self.expand_locally))
 
-        # print the result
-        print_safe(self._make_output(events))
+        # print the result as soon as each date is complete
+        if profiler.enabled:
+            events = self._profile_events(events)
+        with OutputWriter() as writer, profiler.phase('render'):
+            self._write_output(events, writer)
         return 0
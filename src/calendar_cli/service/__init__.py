@@ -1 +1,28 @@
-from .google_calendar_service import GoogleCalendarService
+"""
+Services are loaded lazily since the Google API client takes a long time to import.
+"""
+import sys
+import importlib
+
+_REGISTRY = {
+    'CredentialStore': 'credential_store',
+    'EventCache': 'event_cache',
+    'DiscoveryCache': 'discovery_cache',
+    'GoogleCalendarService': 'google_calendar_service',
+    'ResponseCache': 'response_cache',
+    'Retry': 'retry',
+}
+
+__all__ = sorted(_REGISTRY)
+
+
+def __getattr__(name):
+    if name not in _REGISTRY:
+        raise AttributeError('module %r has no attribute %r' % (__name__, name))
+    return getattr(importlib.import_module('.' + _REGISTRY[name], __name__), name)
+
+
+if sys.version_info < (3, 7):
+    # module-level __getattr__ is not supported (PEP 562)
+    for _name in __all__:
+        globals()[_name] = __getattr__(_name)
@@ -0,0 +1,156 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+import os
+import io
+import socket
+import logging
+import threading
+from datetime import datetime, timedelta
+import httplib2
+import oauth2client.client
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # not available on Windows
+
+LOCK_SUFFIX = '.lock'
+REFRESH_MARGIN = 300  # seconds
+
+logger = logging.getLogger(__name__)
+
+
+class _FileLock(object):
+    """
+    Lock held by one thread of one process at a time, using flock(2) on a separate lock file.
+
+    Only threads are serialized where flock is not available or the lock file cannot be created.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._fd = None
+
+    def acquire(self):
+        self._lock.acquire()
+        if fcntl is None:
+            return
+        try:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        except (IOError, OSError) as e:
+            logger.debug('failed to open the lock file: %s', e)
+            return
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        except Exception:
+            os.close(fd)
+            self._lock.release()
+            raise
+        self._fd = fd
+
+    def release(self):
+        fd, self._fd = self._fd, None
+        try:
+            if fd is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+        finally:
+            self._lock.release()
+
+
+class CredentialStore(oauth2client.client.Storage):
+    """
+    Credential file shared by concurrent processes.
+
+    Unlike oauth2client.file.Storage, the lock is held across processes and the file is replaced atomically,
+    so processes refreshing an expired access token at the same time never corrupt the file. oauth2client reloads
+    the file under the lock before refreshing, so only the first process sends the refresh request
+    and the others reuse the token it saved.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: string: path to the credential file
+        """
+        oauth2client.client.Storage.__init__(self, lock=_FileLock(path + LOCK_SUFFIX))
+        self.path = path
+
+    def locked_get(self):
+        try:
+            with io.open(self.path, 'rb') as f:
+                content = f.read()
+        except (IOError, OSError):
+            return None
+
+        try:
+            credentials = oauth2client.client.Credentials.new_from_json(content)
+        except ValueError:
+            return None
+        credentials.set_store(self)
+        return credentials
+
+    def locked_put(self, credentials):
+        parent_dir = os.path.dirname(self.path)
+        if parent_dir and not os.path.exists(parent_dir):
+            os.makedirs(parent_dir)
+
+        # write to a temporary file and rename it so that concurrent processes never read a partial file
+        tmp_path = '%s.%d.tmp' % (self.path, os.getpid())
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with io.open(fd, 'w', encoding='utf-8') as f:
+            f.write(credentials.to_json())
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(tmp_path, self.path)
+
+    def locked_delete(self):
+        os.unlink(self.path)
+
+    @staticmethod
+    def _expiring(credentials, margin, now=None):
+        """
+        :return: bool: True if the access token is missing or expires within margin seconds
+        """
+        if not credentials.access_token:
+            return True
+        if credentials.token_expiry is None:
+            return False
+        # token_expiry is a naive datetime in UTC
+        return credentials.token_expiry - (now or datetime.utcnow()) < timedelta(seconds=margin)
+
+    def get_fresh(self, http=None, margin=REFRESH_MARGIN):
+        """
+        Load the credentials, refreshing the access token in advance if it expires within margin seconds.
+
+        A valid token saved by any process is reused without taking the lock, so most runs skip the refresh request
+        and the retried request after a 401 response.
+
+        :param http: httplib2.Http: HTTP client for the refresh request
+        :param margin: int: seconds the access token should stay valid
+        :return: oauth2client.client.Credentials, or None if the file does not exist or is invalid
+        """
+        # the file is replaced atomically, so it can be read without the lock
+        credentials = self.locked_get()
+        if credentials is None or credentials.invalid or not self._expiring(credentials, margin):
+            return credentials
+
+        self.acquire_lock()
+        try:
+            latest = self.locked_get()
+            if latest is not None and not latest.invalid and not self._expiring(latest, margin):
+                logger.debug('reused the access token refreshed by another process')
+                return latest
+
+            credentials = latest or credentials
+            if getattr(credentials, 'refresh_token', None):
+                try:
+                    # the lock is already held, so call the refresh request directly; it saves the new token
+                    credentials._do_refresh_request(http or httplib2.Http())
+                    logger.debug('refreshed the access token')
+                except (oauth2client.client.Error, httplib2.HttpLib2Error, socket.error, IOError) as e:
+                    # the token is refreshed again when a request fails with 401
+                    logger.debug('failed to refresh the access token: %s', e)
+            return credentials
+        finally:
+            self.release_lock()
@@ -0,0 +1,105 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+import os
+import io
+import json
+import time
+import socket
+import httplib2
+
+DISCOVERY_URI = 'https://www.googleapis.com/discovery/v1/apis/%(api)s/%(version)s/rest'
+
+
+class DiscoveryCache(object):
+    """
+    Discovery documents stored on disk.
+
+    A cached document is used as it is while it is newer than the TTL. After that, it is revalidated with its ETag,
+    and a stale document is still used when the discovery endpoint is not available or does not answer in time.
+    """
+
+    DEFAULT_TTL = 24 * 60 * 60
+    DEFAULT_TIMEOUT = 5
+
+    def __init__(self, cache_dir, ttl=DEFAULT_TTL, timeout=DEFAULT_TIMEOUT):
+        """
+        :param cache_dir: string: directory to store discovery documents
+        :param ttl: int: seconds to use a cached document without revalidation
+        :param timeout: int: seconds to wait for the discovery endpoint before falling back to the stale document
+        """
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.timeout = timeout
+
+    def new_http(self):
+        """
+        :return: httplib2.Http: HTTP client with the timeout for fetching documents
+        """
+        return httplib2.Http(timeout=self.timeout)
+
+    def _path(self, api, version):
+        return os.path.join(self.cache_dir, 'discovery-%s-%s.json' % (api, version))
+
+    def _load(self, path):
+        """
+        :return: (content, etag, fetched_at) or None
+        """
+        try:
+            with io.open(path, encoding='utf-8') as f:
+                d = json.load(f)
+            return d['content'], d.get('etag'), d['fetched_at']
+        except (IOError, OSError, ValueError, KeyError):
+            return None
+
+    def _save(self, path, content, etag, fetched_at):
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+        # write to a temporary file and rename it so that concurrent processes never read a partial file
+        tmp_path = '%s.%d.tmp' % (path, os.getpid())
+        with io.open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'content': content, 'etag': etag, 'fetched_at': fetched_at}, ensure_ascii=False))
+        os.rename(tmp_path, path)
+
+    @staticmethod
+    def _get_static_doc(api, version):
+        """Return the discovery document bundled with google-api-python-client if available."""
+        try:
+            from googleapiclient.discovery_cache import get_static_doc
+        except ImportError:
+            return None
+        return get_static_doc(api, version)
+
+    def get(self, api, version, http=None, now=None):
+        """
+        :param api: string: API name
+        :param version: string: API version
+        :param http: httplib2.Http: HTTP client to fetch the document (default: new_http())
+        :return: string: discovery document
+        """
+        now = time.time() if now is None else now
+        path = self._path(api, version)
+        cached = self._load(path)
+
+        if cached is not None and now - cached[2] < self.ttl:
+            return cached[0]
+
+        headers = {} if cached is None or cached[1] is None else {'if-none-match': cached[1]}
+        try:
+            resp, body = (http or self.new_http()).request(DISCOVERY_URI % {'api': api, 'version': version},
+                                                           headers=headers)
+        except (httplib2.HttpLib2Error, socket.error, IOError):
+            resp, body = None, None
+
+        if resp is not None and resp.status == 304 and cached is not None:
+            self._save(path, cached[0], cached[1], now)
+            return cached[0]
+        if resp is not None and resp.status == 200:
+            content = body.decode('utf-8') if isinstance(body, bytes) else body
+            self._save(path, content, resp.get('etag'), now)
+            return content
+
+        # the discovery endpoint is not available
+        content = cached[0] if cached is not None else self._get_static_doc(api, version)
+        assert content is not None, 'Failed to fetch the discovery document: %s %s' % (api, version)
+        return content
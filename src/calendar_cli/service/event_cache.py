@@ -0,0 +1,244 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+import os
+import json
+import hashlib
+import time
+import sqlite3
+import threading
+import six
+from calendar_cli.model import Event
+from calendar_cli.model.time_parser import to_epoch
+from calendar_cli.model.text_index import tokenize
+
+
+class EventCache(object):
+    """
+    On-disk event store backed by SQLite.
+
+    Raw event resources are stored per calendar together with the sync token of the last synchronization,
+    so that the next synchronization only needs to transfer the changes.
+    The connection is shared among threads and every access is serialized by a lock.
+    """
+
+    SCHEMA_VERSION = 4
+    FETCH_SIZE = 1000
+
+    def __init__(self, path):
+        """
+        :param path: string: path to the database file
+        """
+        parent_dir = os.path.dirname(path)
+        if parent_dir and not os.path.exists(parent_dir):
+            os.makedirs(parent_dir)
+
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._lock = threading.RLock()
+        with self._lock:
+            self._init_schema()
+
+    @staticmethod
+    def get_path(cache_dir, credential_path):
+        """Use one cache file per credential since calendar ids like 'primary' depend on the account."""
+        key = hashlib.sha1(os.path.abspath(credential_path).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(cache_dir, 'events-%s.sqlite' % key)
+
+    def _init_schema(self):
+        c = self._conn
+        c.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        row = c.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+        if row is not None and int(row[0]) == self.SCHEMA_VERSION:
+            return
+
+        # the cache can always be rebuilt from the server, so just drop the old one
+        with c:
+            c.execute('DROP TABLE IF EXISTS calendars')
+            c.execute('DROP TABLE IF EXISTS events')
+            c.execute('DROP TABLE IF EXISTS terms')
+            c.execute('CREATE TABLE calendars ('
+                      'calendar_id TEXT PRIMARY KEY, time_zone TEXT, sync_token TEXT, synced_at REAL, '
+                      'max_duration REAL NOT NULL DEFAULT 0)')
+            c.execute('CREATE TABLE events ('
+                      'calendar_id TEXT, event_id TEXT, start_epoch REAL, end_epoch REAL, all_day INTEGER, '
+                      'summary TEXT, body TEXT, PRIMARY KEY (calendar_id, event_id))')
+            c.execute('CREATE INDEX events_start ON events (calendar_id, start_epoch)')
+
+            # inverted index: terms in the summary, location and creator of each event
+            c.execute('CREATE TABLE terms (term TEXT, event_rowid INTEGER)')
+            c.execute('CREATE INDEX terms_term ON terms (term, event_rowid)')
+            c.execute('CREATE INDEX terms_event ON terms (event_rowid)')
+            c.execute("INSERT OR REPLACE INTO meta VALUES ('schema_version', ?)", (str(self.SCHEMA_VERSION),))
+
+    def get_sync_state(self, calendar_id):
+        """
+        :return: (time_zone, sync_token, synced_at) or None if the calendar has never been synchronized
+        """
+        with self._lock:
+            return self._conn.execute('SELECT time_zone, sync_token, synced_at FROM calendars '
+                                      'WHERE calendar_id = ? AND synced_at IS NOT NULL', (calendar_id,)).fetchone()
+
+    def list_calendar_ids(self):
+        """
+        :return: list of string: ids of the synchronized calendars
+        """
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                'SELECT calendar_id FROM calendars WHERE synced_at IS NOT NULL ORDER BY calendar_id')]
+
+    def is_fresh(self, calendar_id, max_age, now=None):
+        """
+        :param max_age: float: maximum age of the cache in seconds
+        :return: True if the calendar has been synchronized within max_age seconds
+        """
+        state = self.get_sync_state(calendar_id)
+        return state is not None and (time.time() if now is None else now) - state[2] <= max_age
+
+    def clear(self, calendar_id):
+        """Remove all the events and the sync state of the calendar."""
+        with self._lock, self._conn as c:
+            c.execute('DELETE FROM terms WHERE event_rowid IN (SELECT rowid FROM events WHERE calendar_id = ?)',
+                      (calendar_id,))
+            c.execute('DELETE FROM events WHERE calendar_id = ?', (calendar_id,))
+            c.execute('DELETE FROM calendars WHERE calendar_id = ?', (calendar_id,))
+
+    def apply_page(self, calendar_id, items, time_zone):
+        """
+        Store the events in a response page. Cancelled events are removed from the cache.
+
+        :param items: list of dict: event resources
+        :param time_zone: string: time zone of the calendar
+        """
+        max_duration = 0
+        with self._lock, self._conn as c:
+            for d in items:
+                c.execute('DELETE FROM terms WHERE event_rowid IN '
+                          '(SELECT rowid FROM events WHERE calendar_id = ? AND event_id = ?)', (calendar_id, d['id']))
+                if d.get('status') == 'cancelled':
+                    c.execute('DELETE FROM events WHERE calendar_id = ? AND event_id = ?', (calendar_id, d['id']))
+                else:
+                    ev = Event.parse_dict(d, time_zone)
+                    start, end = to_epoch(ev.start_time.datetime_tz), to_epoch(ev.end_time.datetime_tz)
+                    max_duration = max(max_duration, end - start)
+                    rowid = c.execute('INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                      (calendar_id, d['id'], start, end, int(not ev.start_time.has_time),
+                                       d.get('summary'), json.dumps(d))).lastrowid
+                    c.executemany('INSERT INTO terms VALUES (?, ?)', [(t, rowid) for t in self._index_terms(d)])
+
+            # keep the longest event duration to bound the range scan on start_epoch
+            c.execute('INSERT OR IGNORE INTO calendars (calendar_id) VALUES (?)', (calendar_id,))
+            c.execute('UPDATE calendars SET max_duration = MAX(max_duration, ?) WHERE calendar_id = ?',
+                      (max_duration, calendar_id))
+
+    @staticmethod
+    def _index_terms(d):
+        creator = d.get('creator', {})
+        texts = [d.get('summary'), d.get('location'), creator.get('displayName'), creator.get('email')]
+        return set(t for s in texts if s for t in tokenize(s))
+
+    def finish_sync(self, calendar_id, time_zone, sync_token, synced_at=None):
+        """Save the sync token after all the pages have been stored."""
+        with self._lock, self._conn as c:
+            c.execute('INSERT OR IGNORE INTO calendars (calendar_id) VALUES (?)', (calendar_id,))
+            c.execute('UPDATE calendars SET time_zone = ?, sync_token = ?, synced_at = ? WHERE calendar_id = ?',
+                      (time_zone, sync_token, time.time() if synced_at is None else synced_at, calendar_id))
+
+    def _select_range(self, columns, calendar_id, time_min, time_max):
+        """
+        :return: (time_zone, cursor): rows of the events overlapping the range ordered by the start time
+        """
+        with self._lock:
+            row = self._conn.execute('SELECT time_zone, max_duration FROM calendars '
+                                     'WHERE calendar_id = ? AND synced_at IS NOT NULL', (calendar_id,)).fetchone()
+            assert row is not None, 'Calendar has not been cached: %s' % calendar_id
+            time_zone, max_duration = row
+
+            # No event starting before (time_min - max_duration) can overlap the range,
+            # so the index on start_epoch only needs to be scanned over the bounded interval.
+            t_min, t_max = to_epoch(time_min), to_epoch(time_max)
+            cursor = self._conn.cursor()
+            cursor.execute(
+                'SELECT ' + columns + ' FROM events '
+                'WHERE calendar_id = ? AND start_epoch >= ? AND start_epoch < ? AND end_epoch > ? '
+                'ORDER BY start_epoch, end_epoch',
+                (calendar_id, t_min - max_duration, t_max, t_min))
+        return time_zone, cursor
+
+    def _iter_rows(self, cursor):
+        # read rows in chunks to keep the memory usage constant for a long range
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(self.FETCH_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                yield row
+
+    def iter_events(self, calendar_id, time_min, time_max):
+        """
+        :return: generator of Event: events overlapping the range ordered by the start time
+        """
+        time_zone, cursor = self._select_range('body', calendar_id, time_min, time_max)
+        for row in self._iter_rows(cursor):
+            yield Event.parse_dict(json.loads(row[0]), time_zone, calendar_id)
+
+    def iter_intervals(self, calendar_id, time_min, time_max):
+        """
+        Read the columns needed for time accounting without decoding event resources.
+
+        :return: generator of (float, float, bool, unicode): start and end epoch seconds, all-day flag and summary
+                 of the events overlapping the range ordered by the start time
+        """
+        _, cursor = self._select_range('start_epoch, end_epoch, all_day, summary', calendar_id, time_min, time_max)
+        for start, end, all_day, summary in self._iter_rows(cursor):
+            yield start, end, bool(all_day), summary
+
+    def search(self, terms, calendar_ids=None, time_min=None, time_max=None):
+        """
+        Find events containing all the terms with the inverted index.
+
+        :param terms: list of (unicode, bool): index terms and whether each is a prefix, e.g. parse_query()
+        :param calendar_ids: list of string: calendars to search (None: all the synchronized calendars)
+        :param time_min: datetime: find events ending after this time (None: no limit)
+        :param time_max: datetime: find events starting before this time (None: no limit)
+        :return: generator of Event: matched events ordered by the start time
+        """
+        assert terms, 'Search terms are empty.'
+
+        conditions = []
+        for term, prefix in terms:
+            if prefix:
+                conditions.append(('t.term >= ? AND t.term < ?', [term, term[:-1] + six.unichr(ord(term[-1]) + 1)]))
+            else:
+                conditions.append(('t.term = ?', [term]))
+
+        with self._lock:
+            # scan the posting list of the rarest term, and check the other terms for each candidate
+            counts = [self._conn.execute('SELECT COUNT(*) FROM (SELECT 1 FROM terms t WHERE %s LIMIT ?)' % cond,
+                                         params + [self.FETCH_SIZE]).fetchone()[0] for cond, params in conditions]
+        rarest = counts.index(min(counts))
+
+        sql = ('SELECT e.calendar_id, c.time_zone, e.body FROM events e '
+               'JOIN calendars c ON c.calendar_id = e.calendar_id '
+               'WHERE c.synced_at IS NOT NULL AND e.rowid IN (SELECT t.event_rowid FROM terms t WHERE %s)'
+               % conditions[rarest][0])
+        params = list(conditions[rarest][1])
+        for i, (cond, ps) in enumerate(conditions):
+            if i != rarest:
+                sql += ' AND EXISTS (SELECT 1 FROM terms t WHERE t.event_rowid = e.rowid AND %s)' % cond
+                params.extend(ps)
+        if calendar_ids is not None:
+            sql += ' AND e.calendar_id IN (%s)' % ', '.join('?' * len(calendar_ids))
+            params.extend(calendar_ids)
+        if time_min is not None:
+            sql += ' AND e.end_epoch > ?'
+            params.append(to_epoch(time_min))
+        if time_max is not None:
+            sql += ' AND e.start_epoch < ?'
+            params.append(to_epoch(time_max))
+        sql += ' ORDER BY e.start_epoch, e.end_epoch'
+
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute(sql, params)
+        for calendar_id, time_zone, body in self._iter_rows(cursor):
+            yield Event.parse_dict(json.loads(body), time_zone, calendar_id)
@@ -1,18 +1,63 @@
 from __future__ import division, print_function, absolute_import, unicode_literals
 
+import os
+import sys
+import itertools
+import collections
+import threading
+from datetime import timedelta
+from multiprocessing.pool import ThreadPool
+import six
+from six.moves import queue
 import pytz
 import httplib2
 from apiclient import discovery
-import oauth2client.file
+from apiclient.errors import HttpError
+from apiclient.http import set_user_agent
+from mog_commons.functional import oget, omap
 from calendar_cli.model import Event
+from calendar_cli.model.time_parser import parse_datetime, to_epoch
+from calendar_cli.model.recurrence import RecurrenceExpander
+from calendar_cli.service.credential_store import CredentialStore
+from calendar_cli.service.event_cache import EventCache
+from calendar_cli.service.discovery_cache import DiscoveryCache
+from calendar_cli.service.response_cache import ResponseCache
+from calendar_cli.service.retry import Retry
+from calendar_cli.util.profiler import profiler
 
-MAX_RESULTS = 100
+DEFAULT_PAGE_SIZE = 250
+MAX_PAGE_SIZE = 2500
+MAX_WORKERS = 8
+PREFETCH_SIZE = 1000  # events fetched ahead of the consumer for each calendar
+POLL_INTERVAL = 0.1
+BATCH_SIZE = 50
+FREEBUSY_MAX_CALENDARS = 50
+FREEBUSY_MAX_DAYS = 60
+
+# Google APIs compress responses only for user agents containing "gzip"
+USER_AGENT = 'calendar-cli/%s (gzip)' % __import__('calendar_cli').__version__
+
+# fields of the event resources stored in the event cache
+SYNC_FIELDS = ('nextPageToken,nextSyncToken,timeZone,'
+               'items(id,status,start,end,summary,creator(displayName,email),location)')
+
+# event resource fields needed to expand recurring events locally
+RECURRENCE_FIELDS = ['id', 'status', 'start', 'end', 'recurrence', 'recurringEventId', 'originalStartTime']
 
 
 class GoogleCalendarService(object):
-    def __init__(self, credential_path):
-        store = oauth2client.file.Storage(credential_path)
-        credentials = store.get()
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, credential_path, cache_dir=None, event_cache=True):
+        """
+        :param credential_path: string: path to the credential file
+        :param cache_dir: string: directory for the discovery document, the event cache and the list responses
+                          (None: disable caches)
+        :param event_cache: bool: False if events should be fetched from the server without the event cache
+        """
+        with profiler.phase('credentials'):
+            credentials = CredentialStore(credential_path).get_fresh(profiler.wrap_http(httplib2.Http()))
 
         assert credentials is not None and not credentials.invalid, '\n'.join([
             'Failed to load credential file: %s' % credential_path,
@@ -22,24 +67,424 @@ class GoogleCalendarService(object):
             ''
         ])
 
-        http = credentials.authorize(httplib2.Http())
-        service = discovery.build('calendar', 'v3', http=http)
+        self._credentials = credentials
+        self._local = threading.local()
+        self._retry = Retry()
+        self._expander = RecurrenceExpander()
+
+        http = self._http()
+        with profiler.phase('discovery'):
+            if cache_dir is None:
+                service = discovery.build('calendar', 'v3', http=http)
+            else:
+                cache = DiscoveryCache(cache_dir)
+                doc = cache.get('calendar', 'v3', http=profiler.wrap_http(cache.new_http()))
+                service = discovery.build_from_document(doc, http=http)
         self._service = service
+        self._cache = EventCache(EventCache.get_path(cache_dir, credential_path)) if cache_dir and event_cache else None
+        self._responses = ResponseCache(ResponseCache.get_path(cache_dir, credential_path)) if cache_dir else None
 
-    def list_events(self, calendar_id, time_min, time_max):
+    @classmethod
+    def shared(cls, credential_path, cache_dir=None, event_cache=True):
         """
-        :return: list[Event]: event list sorted by startTime and endTime (all-day events come first)
+        Return the service created with the same arguments before, so that a long-running process
+        does not reload the credentials and rebuild the API client for every command.
+        """
+        key = (os.path.abspath(credential_path), cache_dir, event_cache)
+        with cls._shared_lock:
+            if key not in cls._shared:
+                cls._shared[key] = cls(credential_path, cache_dir, event_cache)
+            return cls._shared[key]
+
+    @classmethod
+    def clear_shared(cls):
+        with cls._shared_lock:
+            cls._shared.clear()
+
+    def _http(self):
+        """
+        :return: authorized httplib2.Http: one instance per thread since httplib2.Http is not thread-safe
+        """
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            http = self._credentials.authorize(set_user_agent(profiler.wrap_http(httplib2.Http()), USER_AGENT))
+            self._local.http = http
+        return http
+
+    def _execute(self, request, idempotent=True):
+        """
+        Execute the request on the connection of the current thread, retrying transient errors.
+
+        :param idempotent: bool: False if the request must not be sent again after a server or connection error
+        """
+        return self._retry.call(lambda: request.execute(http=self._http()), idempotent)
+
+    def _execute_conditional(self, request):
+        """
+        Execute a GET request with the ETag of the cached response, and use the cached response if the server
+        answers 304 Not Modified.
         """
+        if self._responses is None:
+            return self._execute(request)
+
+        key = request.uri
+        cached = self._responses.get(key)
+        if cached is not None:
+            request.headers['If-None-Match'] = cached[0]
+        try:
+            response = self._execute(request)
+        except HttpError as e:
+            if cached is None or e.resp.status != 304:
+                raise
+            self._responses.record(True, key)
+            self._responses.touch(key)
+            return cached[1]
+
+        self._responses.record(False, key)
+        if response.get('etag'):
+            self._responses.put(key, response['etag'], response)
+        return response
+
+    @property
+    def retry_count(self):
+        """Number of retries so far"""
+        return self._retry.count
+
+    def _iter_pages(self, method, params, page_token=None, conditional=False):
+        """
+        Execute a list request repeatedly following nextPageToken.
+
+        :param method: list method of a collection, e.g. events().list
+        :param params: dict: parameters for the list method
+        :param page_token: string: token of the first page to request (None: the first page of the result)
+        :param conditional: bool: True if the pages should be revalidated with the response cache
+        :return: generator of dict: each response page
+        """
+        execute = self._execute_conditional if conditional else self._execute
+        while True:
+            if page_token is None:
+                page = execute(method(**params))
+            else:
+                page = execute(method(pageToken=page_token, **params))
+            yield page
+
+            page_token = page.get('nextPageToken')
+            if page_token is None:
+                break
+
+    def sync_events(self, calendar_id, page_size=None):
+        """
+        Bring the local event cache up to date.
+
+        The first synchronization downloads all the events on the calendar. After that, only the changes
+        since the last synchronization are transferred by using the sync token.
+        When the server rejects the sync token (410 Gone), the cache is rebuilt from scratch.
+        """
+        assert self._cache is not None, 'Event cache is disabled.'
+
+        state = self._cache.get_sync_state(calendar_id)
+        sync_token = omap(lambda x: x[1], state)
+
+        params = {
+            'calendarId': calendar_id,
+            'maxResults': oget(page_size, MAX_PAGE_SIZE),
+            'singleEvents': True,
+            'fields': SYNC_FIELDS,
+        }
+        if sync_token is None:
+            self._cache.clear(calendar_id)
+        else:
+            params['syncToken'] = sync_token
+
+        try:
+            for page in self._iter_pages(self._service.events().list, params):
+                with profiler.phase('cache'):
+                    self._cache.apply_page(calendar_id, page.get('items', []), page['timeZone'])
+                    if 'nextSyncToken' in page:
+                        self._cache.finish_sync(calendar_id, page['timeZone'], page['nextSyncToken'])
+        except HttpError as e:
+            if sync_token is None or e.resp.status != 410:
+                raise
+            # the sync token has expired: full synchronization
+            self._cache.clear(calendar_id)
+            self.sync_events(calendar_id, page_size)
+
+    def iter_events(self, calendar_id, time_min, time_max, page_size=None, fields=None, expand_locally=False):
+        """
+        Fetch events page by page. Each page is requested only when the previous one has been consumed.
+        If the event cache is enabled, synchronize the cache first and read events from it.
+
+        :param page_size: int: number of events per request (default:DEFAULT_PAGE_SIZE, up to MAX_PAGE_SIZE)
+        :param fields: list of string: event resource fields to download, e.g. EventFormatter.resource_fields
+                       (None: full resources). The event cache always stores SYNC_FIELDS.
+        :param expand_locally: bool: fetch each recurring event once and expand its instances locally
+                               instead of using the event cache
+        :return: generator of Event: events ordered by the start time
+        """
+        assert page_size is None or 1 <= page_size <= MAX_PAGE_SIZE, \
+            'page size must be between 1 and %d: %d' % (MAX_PAGE_SIZE, page_size)
+
+        if expand_locally:
+            for ev in self._iter_expanded_events(calendar_id, time_min, time_max, page_size, fields):
+                yield ev
+            return
+
+        if self._cache is not None:
+            self.sync_events(calendar_id, page_size)
+            for ev in self._cache.iter_events(calendar_id, time_min, time_max):
+                yield ev
+            return
+
         params = {
             'calendarId': calendar_id,
             'timeMin': time_min.astimezone(pytz.utc).isoformat(),
             'timeMax': time_max.astimezone(pytz.utc).isoformat(),
-            'maxResults': MAX_RESULTS,
+            'maxResults': oget(page_size, DEFAULT_PAGE_SIZE),
             'singleEvents': True,
             'orderBy': 'startTime'
         }
-        events_result = self._service.events().list(**params).execute()
-        return sorted(Event.parse_dict(d, events_result['timeZone']) for d in events_result.get('items', []))
+        if fields is not None:
+            params['fields'] = 'etag,nextPageToken,timeZone,items(%s)' % ','.join(fields)
+        for page in self._iter_pages(self._service.events().list, params, conditional=True):
+            for d in page.get('items', []):
+                yield Event.parse_dict(d, page['timeZone'], calendar_id)
+
+    def _iter_expanded_events(self, calendar_id, time_min, time_max, page_size=None, fields=None):
+        """
+        Fetch recurring events, their modified and cancelled instances, and single events without server-side
+        expansion, then expand the recurrence rules locally.
+        Events cannot be ordered by the server in this mode, so all the events in the range are fetched first.
+        """
+        params = {
+            'calendarId': calendar_id,
+            'timeMin': time_min.astimezone(pytz.utc).isoformat(),
+            'timeMax': time_max.astimezone(pytz.utc).isoformat(),
+            'maxResults': oget(page_size, DEFAULT_PAGE_SIZE),
+            'singleEvents': False,
+            'showDeleted': True,  # cancelled instances of recurring events are needed to remove them
+        }
+        if fields is not None:
+            fs = fields + [f for f in RECURRENCE_FIELDS if f not in fields]
+            params['fields'] = 'etag,nextPageToken,timeZone,items(%s)' % ','.join(fs)
+
+        items, time_zone = [], None
+        for page in self._iter_pages(self._service.events().list, params, conditional=True):
+            items.extend(page.get('items', []))
+            time_zone = page['timeZone']
+        if time_zone is None:
+            return
+
+        events = [Event.parse_dict(d, time_zone, calendar_id)
+                  for d in self._expander.expand_all(items, time_zone, time_min, time_max)]
+        # modified instances may have been moved out of the range
+        events = [e for e in events if e.start_time.datetime_tz < time_max and e.end_time.datetime_tz > time_min]
+        for ev in sorted(events, key=lambda e: (e.start_time.to_date(), e.start_time.datetime_tz)):
+            yield ev
+
+    def iter_event_pages(self, calendar_id, time_min, time_max, page_size=None, page_token=None):
+        """
+        Fetch full event resources page by page from the server, bypassing the event cache.
+        A token yielded with a page can be passed to resume from the next page, e.g. after a failure.
+
+        :param page_token: string: token of the first page to request (None: from the beginning)
+        :return: generator of (string, list of dict, string): time zone of the calendar, event resources ordered by
+                 the start time, and the token of the next page (None for the last page)
+        """
+        params = {
+            'calendarId': calendar_id,
+            'timeMin': time_min.astimezone(pytz.utc).isoformat(),
+            'timeMax': time_max.astimezone(pytz.utc).isoformat(),
+            'maxResults': oget(page_size, MAX_PAGE_SIZE),
+            'singleEvents': True,
+            'orderBy': 'startTime'
+        }
+        for page in self._iter_pages(self._service.events().list, params, page_token):
+            yield page['timeZone'], page.get('items', []), page.get('nextPageToken')
+
+    def iter_intervals(self, calendar_id, time_min, time_max, page_size=None):
+        """
+        Fetch the times and summaries of events for time accounting.
+        If the event cache is enabled, they are read from the cache without decoding event resources.
+
+        :return: generator of (float, float, bool, unicode): start and end epoch seconds, all-day flag and summary
+        """
+        if self._cache is not None:
+            self.sync_events(calendar_id, page_size)
+            for x in self._cache.iter_intervals(calendar_id, time_min, time_max):
+                yield x
+            return
+
+        for ev in self.iter_events(calendar_id, time_min, time_max, page_size, ['start', 'end', 'summary']):
+            yield (to_epoch(ev.start_time.datetime_tz), to_epoch(ev.end_time.datetime_tz), not ev.start_time.has_time,
+                   ev.summary)
+
+    def iter_events_concurrently(self, calendar_ids, time_min, time_max, page_size=None, fields=None,
+                                 max_workers=MAX_WORKERS, expand_locally=False):
+        """
+        Fetch events on several calendars concurrently on a thread pool.
+
+        Each calendar runs ahead of the consumer by at most PREFETCH_SIZE events. When a generator is closed
+        before its end or raises an error, fetching the other calendars is stopped.
+
+        :param calendar_ids: list of string: calendar ids
+        :param max_workers: int: maximum number of calendars fetched at the same time
+        :return: list of generator of Event: events on each calendar ordered by the start time
+        """
+        queues = [queue.Queue(PREFETCH_SIZE) for _ in calendar_ids]
+        stopped = threading.Event()
+
+        # one thread per calendar, otherwise workers blocked on a full queue could starve calendars waiting for
+        # a worker; the semaphore limits the calendars fetching events at the same time instead
+        semaphore = threading.Semaphore(max(1, max_workers))
+        pool = ThreadPool(max(1, len(calendar_ids)))
+
+        def put(q, x):
+            while not stopped.is_set():
+                try:
+                    q.put(x, timeout=POLL_INTERVAL)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def fetch(calendar_id, q):
+            try:
+                it = self.iter_events(calendar_id, time_min, time_max, page_size, fields, expand_locally)
+                while True:
+                    with semaphore:
+                        ev = next(it, None)
+                    if not put(q, (True, ev)) or ev is None:
+                        break
+            except Exception:
+                put(q, (False, sys.exc_info()))
+
+        def stop():
+            if not stopped.is_set():
+                stopped.set()
+                pool.terminate()
+
+        def consume(q):
+            finished = False
+            try:
+                while True:
+                    try:
+                        ok, x = q.get(timeout=POLL_INTERVAL)
+                    except queue.Empty:
+                        assert not stopped.is_set(), 'Fetching events was stopped by another calendar.'
+                        continue
+                    if not ok:
+                        six.reraise(*x)
+                    if x is None:
+                        finished = True
+                        break
+                    yield x
+            finally:
+                if not finished:
+                    stop()
+
+        for calendar_id, q in zip(calendar_ids, queues):
+            pool.apply_async(fetch, (calendar_id, q))
+        pool.close()
+        return [consume(q) for q in queues]
+
+    def list_calendar_ids(self):
+        """
+        :return: list of string: ids of all the calendars in the user's calendar list
+        """
+        method = self._service.calendarList().list
+        return [d['id'] for page in self._iter_pages(method, {}, conditional=True) for d in page.get('items', [])]
+
+    def list_busy(self, calendar_ids, time_min, time_max):
+        """
+        Query busy intervals with the free/busy endpoint. Calendars and the time range are split into chunks
+        within the limits of one request.
+
+        :param calendar_ids: list of string: calendar ids
+        :return: list of (datetime, datetime): busy intervals on all the calendars (not merged)
+        """
+        busy = []
+        for i in range(0, len(calendar_ids), FREEBUSY_MAX_CALENDARS):
+            items = [{'id': c} for c in calendar_ids[i:i + FREEBUSY_MAX_CALENDARS]]
+            t = time_min
+            while t < time_max:
+                t_next = min(time_max, t + timedelta(days=FREEBUSY_MAX_DAYS))
+                body = {
+                    'timeMin': t.astimezone(pytz.utc).isoformat(),
+                    'timeMax': t_next.astimezone(pytz.utc).isoformat(),
+                    'items': items,
+                }
+                # the query has no side effects although it is a POST request
+                response = self._execute(self._service.freebusy().query(body=body))
+                for calendar_id, d in sorted(response.get('calendars', {}).items()):
+                    errors = d.get('errors', [])
+                    assert not errors, 'Failed to query free/busy: %s (%s)' % (
+                        calendar_id, ', '.join(e.get('reason', '') for e in errors))
+                    busy.extend((parse_datetime(x['start']), parse_datetime(x['end'])) for x in d.get('busy', []))
+                t = t_next
+        return busy
+
+    def list_events(self, calendar_id, time_min, time_max, page_size=None, expand_locally=False):
+        """
+        :return: list[Event]: event list sorted by startTime and endTime (all-day events come first)
+        """
+        return sorted(self.iter_events(calendar_id, time_min, time_max, page_size, expand_locally=expand_locally))
+
+    def _execute_batch(self, items, make_request, idempotent):
+        """
+        Execute a request for each item in a batch request. Parts failed with retryable errors are sent again
+        in a new batch request.
+
+        :param items: list: items of the requests
+        :param make_request: function: item -> request
+        :param idempotent: bool: False if the requests must not be sent again after a server or connection error
+        :return: list of (dict, Exception): response or error for each item
+        """
+        results = [None] * len(items)
+
+        def callback(request_id, response, exception):
+            results[int(request_id)] = (response, exception)
+
+        pending = list(range(len(items)))
+        attempt = 0
+        while True:
+            batch = self._service.new_batch_http_request(callback=callback)
+            for i in pending:
+                batch.add(make_request(items[i]), request_id=str(i))
+            self._execute(batch, idempotent)
+
+            pending = [i for i in pending if results[i][1] is not None and
+                       self._retry.is_retryable(results[i][1], idempotent)]
+            if not pending or attempt >= self._retry.max_retries:
+                return results
+            self._retry.wait(attempt, results[pending[0]][1])
+            attempt += 1
+
+    @staticmethod
+    def _map_bounded(f, iterable, max_workers):
+        """
+        Apply f to each item on a thread pool, consuming the iterable only as fast as the results are consumed.
+
+        :param max_workers: int: maximum number of items processed at the same time
+        :return: generator of (item, result) in the order of the items
+        """
+        if max_workers <= 1:
+            for x in iterable:
+                yield x, f(x)
+            return
+
+        pool = ThreadPool(max_workers)
+        pending = collections.deque()
+        try:
+            for x in iterable:
+                pending.append((x, pool.apply_async(f, (x,))))
+                if len(pending) >= max_workers:
+                    x, r = pending.popleft()
+                    yield x, r.get()
+            while pending:
+                x, r = pending.popleft()
+                yield x, r.get()
+        finally:
+            pool.close()
 
     def insert_event(self, calendar_id, event):
         """
@@ -47,5 +492,47 @@ class GoogleCalendarService(object):
         :param event: Event:
         :return: string: event id
         """
-        ret = self._service.events().insert(calendarId=calendar_id, body=event.to_dict()).execute()
+        ret = self._execute(self._service.events().insert(calendarId=calendar_id, body=event.to_dict()),
+                            idempotent=event.event_id is not None)  # a duplicate insertion fails with 409
         return ret['id']
+
+    def insert_events(self, calendar_id, events, batch_size=BATCH_SIZE, max_workers=1):
+        """
+        Insert events with batch requests. Events are consumed lazily, batch_size events at a time.
+        Events with ids are retried after server or connection errors since a duplicate insertion fails with 409.
+
+        :param calendar_id: string:
+        :param events: iterable of Event:
+        :param batch_size: int: number of events in one batch request
+        :param max_workers: int: maximum number of batch requests sent at the same time
+        :return: generator of (Event, string, Exception): inserted event, and its event id or the error
+        """
+        def insert(chunk):
+            return self._execute_batch(
+                chunk, lambda ev: self._service.events().insert(calendarId=calendar_id, body=ev.to_dict()),
+                all(ev.event_id is not None for ev in chunk))
+
+        it = iter(events)
+        chunks = iter(lambda: list(itertools.islice(it, batch_size)), [])
+        for chunk, results in self._map_bounded(insert, chunks, max_workers):
+            for ev, (response, exception) in zip(chunk, results):
+                yield ev, omap(lambda r: r['id'], response), exception
+
+    def update_events(self, calendar_id, updates, batch_size=BATCH_SIZE):
+        """
+        Replace or cancel events, e.g. instances of recurring events, with batch requests.
+
+        :param calendar_id: string:
+        :param updates: iterable of (string, Event): event id and the new event (None: cancel the event)
+        :return: generator of (string, Event, Exception): event id, the new event and the error or None
+        """
+        def make_request(x):
+            event_id, ev = x
+            if ev is None:
+                return self._service.events().delete(calendarId=calendar_id, eventId=event_id)
+            return self._service.events().update(calendarId=calendar_id, eventId=event_id, body=ev.to_dict())
+
+        it = iter(updates)
+        for chunk in iter(lambda: list(itertools.islice(it, batch_size)), []):
+            for (event_id, ev), (_, exception) in zip(chunk, self._execute_batch(chunk, make_request, True)):
+                yield event_id, ev, exception
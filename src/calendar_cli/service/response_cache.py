@@ -0,0 +1,97 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+import os
+import io
+import json
+import time
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache(object):
+    """
+    List responses stored on disk with their ETags.
+
+    A request is sent with If-None-Match and the stored response is used when the server answers 304 Not Modified,
+    so that polling the same query does not download the same payload again.
+    Responses not requested for MAX_AGE seconds are removed.
+    """
+
+    MAX_AGE = 7 * 24 * 60 * 60
+
+    def __init__(self, cache_dir, max_age=MAX_AGE):
+        """
+        :param cache_dir: string: directory to store responses
+        :param max_age: int: seconds to keep a response after it was last used
+        """
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def get_path(cache_dir, credential_path):
+        """Use one directory per credential since the same request returns different events for each account."""
+        key = hashlib.sha1(os.path.abspath(credential_path).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(cache_dir, 'responses-%s' % key)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, '%s.json' % hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+    def get(self, key):
+        """
+        :param key: string: request URI including the query parameters
+        :return: (string, dict): ETag and the response, or None
+        """
+        try:
+            with io.open(self._path(key), encoding='utf-8') as f:
+                d = json.load(f)
+            return d['etag'], d['content']
+        except (IOError, OSError, ValueError, KeyError):
+            return None
+
+    def put(self, key, etag, content, now=None):
+        """Store the response, and remove responses not used for max_age seconds."""
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+        # write to a temporary file and rename it so that concurrent processes never read a partial file
+        path = self._path(key)
+        tmp_path = '%s.%d.%d.tmp' % (path, os.getpid(), threading.current_thread().ident)
+        with io.open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'etag': etag, 'content': content}, ensure_ascii=False))
+        os.rename(tmp_path, path)
+
+        now = time.time() if now is None else now
+        os.utime(path, (now, now))
+        self._prune(now)
+
+    def touch(self, key, now=None):
+        """Mark the response as used."""
+        try:
+            os.utime(self._path(key), None if now is None else (now, now))
+        except (IOError, OSError):
+            pass
+
+    def _prune(self, now):
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                if now - os.path.getmtime(path) > self.max_age:
+                    os.remove(path)
+            except (IOError, OSError):
+                pass  # removed by another process
+
+    def record(self, hit, key):
+        """Count a conditional request and print the counters in debug logging."""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            hits, misses = self.hits, self.misses
+        logger.debug('Response cache %s (hits: %d, misses: %d): %s', 'hit' if hit else 'miss', hits, misses, key)
@@ -0,0 +1,126 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+import json
+import time
+import random
+import socket
+import logging
+import threading
+from email.utils import parsedate_tz, mktime_tz
+import httplib2
+from apiclient.errors import HttpError
+
+MAX_RETRIES = 5
+BASE_DELAY = 1.0
+MAX_DELAY = 32.0
+MAX_RETRY_AFTER = 300.0
+SERVER_ERRORS = (500, 502, 503, 504)
+RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded')
+
+logger = logging.getLogger(__name__)
+
+
+class Retry(object):
+    """
+    Retry API calls with jittered exponential backoff.
+
+    Rate-limited requests (429, or 403 with a rate limit reason) are rejected before they are processed,
+    so they are retried for every call. Server errors and connection errors are retried only for idempotent calls
+    since the request may have been applied.
+    """
+
+    def __init__(self, max_retries=MAX_RETRIES, base_delay=BASE_DELAY, max_delay=MAX_DELAY,
+                 sleep=time.sleep, rand=random.random):
+        """
+        :param max_retries: int: maximum number of retries per call
+        :param base_delay: float: upper bound of the first delay in seconds
+        :param max_delay: float: upper bound of every delay in seconds unless the server sends Retry-After
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._sleep = sleep
+        self._rand = rand
+        self._lock = threading.Lock()
+        self.count = 0
+
+    @staticmethod
+    def _reasons(e):
+        try:
+            error = json.loads(e.content.decode('utf-8'))['error']
+            return [x.get('reason') for x in error.get('errors', [])]
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return []
+
+    @classmethod
+    def is_rate_limited(cls, e):
+        if not isinstance(e, HttpError):
+            return False
+        status = e.resp.status
+        return status == 429 or (status == 403 and any(r in RATE_LIMIT_REASONS for r in cls._reasons(e)))
+
+    @classmethod
+    def is_retryable(cls, e, idempotent):
+        if cls.is_rate_limited(e):
+            return True
+        if not idempotent:
+            return False
+        if isinstance(e, HttpError):
+            return e.resp.status in SERVER_ERRORS
+        return isinstance(e, (httplib2.HttpLib2Error, socket.error, IOError))
+
+    @staticmethod
+    def _retry_after(e, now=None):
+        """
+        :return: float: seconds requested by the Retry-After header, or None
+        """
+        value = e.resp.get('retry-after') if isinstance(e, HttpError) else None
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            t = parsedate_tz(value)
+            if t is None:
+                return None
+            return max(0.0, mktime_tz(t) - (time.time() if now is None else now))
+
+    def get_delay(self, attempt, e):
+        """
+        :param attempt: int: number of retries so far
+        :return: float: seconds to wait before the next retry
+        """
+        retry_after = self._retry_after(e)
+        if retry_after is not None:
+            return min(retry_after, MAX_RETRY_AFTER)
+        # full jitter
+        return self._rand() * min(self.max_delay, self.base_delay * 2 ** attempt)
+
+    def wait(self, attempt, e):
+        """
+        Sleep before a retry.
+
+        :param attempt: int: number of retries so far
+        :param e: Exception: error of the last attempt
+        """
+        delay = self.get_delay(attempt, e)
+        with self._lock:
+            self.count += 1
+        logger.debug('Retrying (%d/%d) in %.1f seconds: %s', attempt + 1, self.max_retries, delay, e)
+        self._sleep(delay)
+
+    def call(self, f, idempotent=True):
+        """
+        :param f: function to call
+        :param idempotent: bool: False if the call may have side effects even when it fails
+        :return: result of f
+        """
+        attempt = 0
+        while True:
+            try:
+                return f()
+            except Exception as e:
+                if attempt >= self.max_retries or not self.is_retryable(e, idempotent):
+                    raise
+                self.wait(attempt, e)
+                attempt += 1
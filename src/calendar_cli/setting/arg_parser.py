@@ -2,6 +2,7 @@ from __future__ import division, print_function, absolute_import, unicode_litera
 
 import os
 from optparse import OptionParser
+from calendar_cli.util.profiler import PROFILE_ENV, PROFILE_OUTPUT_ENV
 
 VERSION = 'calendar-cli %s' % __import__('calendar_cli').__version__
 
@@ -9,40 +10,94 @@ USAGE = """
   %prog [options]
                         Print a summary of events on the calendar.
 
+  %prog conflicts [options]
+                        Print events overlapping another event on the calendars. All-day events are ignored.
+
   %prog setup <secret_path> [--read-only --no-browser --credential <credential_path>]
                         Generate a credentials file from the client secret.
 
   %prog create [--date <YYYYMMDD> --start <HHMM> --end <HHMM> --location <location>
                 --credential <credential_path>] <summary>
                         Create an event onto the calendar.
+
+  %prog free [--calendar <calendar_ids> --date <YYYYMMDD> --days <N> --start <HHMM> --end <HHMM>
+              --min-length <MINUTES> --weekends]
+                        Print free time slots common to the calendars within working hours.
+
+  %prog report [--calendar <calendar_ids> --date <YYYYMMDD> --days <N> --period day|week|month
+                --group-by calendar|keyword --keywords <keywords> --report-format csv|json]
+                        Print hours of timed events per period and calendar or keyword.
+
+  %prog search [--calendar <calendar_ids> --date <YYYYMMDD> --days <N> --offline] <word> [<word>...]
+                        Print cached events containing all the words in the summary, location or creator.
+                        A word ending with '*' matches as a prefix.
+
+  %prog export [--calendar <calendar_ids> --date <YYYYMMDD> --days <N> --output <path> --export-format ics|jsonl]
+                        Write events as iCalendar or JSON Lines to the file or stdout.
+                        An interrupted export to a file resumes from the last page with the same arguments.
+
+  %prog import [--calendar <calendar_id> --max-workers <N> --credential <credential_path>] <path>
+                        Import events in an iCalendar (*.ics) file. Importing the same file again skips the events
+                        created before.
+
+  %prog daemon [--socket <socket_path>]
+                        Serve commands in the background keeping the API client in memory.
+                        Other commands are forwarded to the daemon while it is running.
+
+  %prog create --from-file <path> [--credential <credential_path>]
+                        Create events listed in a CSV (*.csv) or JSON Lines file.
+                        Each row has summary, date, start, end and location fields.
 """
 
 
-DEFAULT_CREDENTIAL_PATH = os.path.join(os.path.expanduser('~'), '.credentials', 'calendar-cli.json')
+def _default_credential_path():
+    return os.path.join(os.path.expanduser('~'), '.credentials', 'calendar-cli.json')
+
+
+def _default_cache_dir():
+    return os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+                        'calendar-cli')
+
+
+def _default_socket_path():
+    if os.environ.get('XDG_RUNTIME_DIR'):
+        return os.path.join(os.environ['XDG_RUNTIME_DIR'], 'calendar-cli.sock')
+    return os.path.join(_default_cache_dir(), 'daemon.sock')
+
+
+DEFAULT_CREDENTIAL_PATH = _default_credential_path()
+DEFAULT_CACHE_DIR = _default_cache_dir()
+DEFAULT_SOCKET_PATH = _default_socket_path()
 DEFAULT_FORMAT = '[%T] %S%L%C'
 DEFAULT_FORMAT_DAYS = '%D [%T] %S%L%C'
 
 
 def _get_parser():
+    # defaults depending on the environment are computed for each parser
+    credential_path, cache_dir, socket_path = _default_credential_path(), _default_cache_dir(), _default_socket_path()
+
     p = OptionParser(usage=USAGE, version=VERSION)
     p.add_option(
         '--calendar', dest='calendar', default='primary', type='string', metavar='CALENDAR',
-        help='set calendar id to CALENDAR (default:primary)'
+        help=' '.join([
+            'set calendar id to CALENDAR (default:primary)',
+            'The summary and free commands accept comma-separated calendar ids, or "all" for every calendar.'
+        ])
     )
     p.add_option(
         '--date', dest='date', default=None, type='string', metavar='YYYYMMDD',
-        help='set date to YYYYMMDD in the summary/create command (default:today)'
+        help='set date to YYYYMMDD in the summary/create/free command (default:today)'
     )
     p.add_option(
         '--days', dest='days', default=0, type=int, metavar='N',
         help=' '.join([
-            'show events from the next N days in the summary command (default:0)',
+            'show events from the next N days in the summary/free/report command (default:0)',
             'If you set a negative number(-N), events from past N days will be shown.'
         ])
     )
     p.add_option(
-        '--credential', dest='credential', default=DEFAULT_CREDENTIAL_PATH, type='string', metavar='CREDENTIAL',
-        help='set credential path to CREDENTIAL (default:%s)' % DEFAULT_CREDENTIAL_PATH
+        '--credential', dest='credential', default=credential_path, type='string', metavar='CREDENTIAL',
+        help='set credential path to CREDENTIAL (default:%s)' % credential_path
     )
     p.add_option(
         '--read-only', dest='read_only', action='store_true', default=False,
@@ -54,32 +109,131 @@ def _get_parser():
     )
     p.add_option(
         '--start', dest='start_time', default=None, type='string', metavar='HHMM',
-        help='set start time in the create command'
+        help='set start time in the create command, or start of working hours in the free command (default:0900)'
     )
     p.add_option(
         '--end', dest='end_time', default=None, type='string', metavar='HHMM',
-        help='set end time in the create command'
+        help='set end time in the create command, or end of working hours in the free command (default:1800)'
     )
     p.add_option(
         '--location', dest='location', default=None, type='string', metavar='LOCATION',
         help='set location to LOCATION in the create command'
     )
+    p.add_option(
+        '--min-length', dest='min_length', default=30, type=int, metavar='MINUTES',
+        help='print free slots of at least MINUTES in the free command (default:30)'
+    )
+    p.add_option(
+        '--weekends', dest='weekends', action='store_true', default=False,
+        help='include Saturdays and Sundays in the free command (default: False)'
+    )
+    p.add_option(
+        '--period', dest='period', default='day', type='choice', choices=['day', 'week', 'month'],
+        metavar='PERIOD', help='aggregate hours per PERIOD (day, week or month) in the report command (default:day)'
+    )
+    p.add_option(
+        '--group-by', dest='group_by', default='calendar', type='choice', choices=['calendar', 'keyword'],
+        metavar='GROUP', help='aggregate hours per GROUP (calendar or keyword) in the report command (default:calendar)'
+    )
+    p.add_option(
+        '--keywords', dest='keywords', default=None, type='string', metavar='KEYWORDS',
+        help=' '.join([
+            'group events by the first one of the comma-separated KEYWORDS contained in the summary',
+            'with --group-by keyword (default: group by the whole summary)'
+        ])
+    )
+    p.add_option(
+        '--report-format', dest='report_format', default='csv', type='choice', choices=['csv', 'json'],
+        metavar='FORMAT', help='print the report in FORMAT (csv or json) (default:csv)'
+    )
+    p.add_option(
+        '--output', dest='output', default=None, type='string', metavar='PATH',
+        help='write events to PATH in the export command (default: stdout)'
+    )
+    p.add_option(
+        '--export-format', dest='export_format', default=None, type='choice', choices=['ics', 'jsonl'],
+        metavar='FORMAT',
+        help='write events in FORMAT (ics or jsonl) in the export command (default: jsonl for *.jsonl files, or ics)'
+    )
+    p.add_option(
+        '--max-workers', dest='max_workers', default=4, type=int, metavar='N',
+        help='send up to N batch requests at the same time in the import command (default:4)'
+    )
+    p.add_option(
+        '--from-file', dest='from_file', default=None, type='string', metavar='PATH',
+        help='create events listed in the CSV or JSON Lines file PATH in the create command'
+    )
     p.add_option(
         '--format', dest='format', default=None, type='string', metavar='FORMAT',
         help=' '.join([
-            'set format to FORMAT in the summary command (default: "%s")' % DEFAULT_FORMAT,
+            'set format to FORMAT in the summary/conflicts command (default: "%s")' % DEFAULT_FORMAT,
             'The following symbols will be replaced.',
             '"%D" -> date,',
             '"%T" -> time,',
             '"%S" -> summary,',
             '"%C" -> creator,',
-            '"%L" -> location',
+            '"%L" -> location,',
+            '"%I" -> calendar id,',
+            '"%E" -> end date,',
+            '"%U" -> duration,',
+            '"%X" -> conflict marker',
         ])
     )
     p.add_option(
         '--separator', dest='separator', default=None, type='string', metavar='SEPARATOR',
         help='set date separator to SEPARATOR in the summary command (default: None)'
     )
+    p.add_option(
+        '--page-size', dest='page_size', default=None, type=int, metavar='N',
+        help='fetch N events per request in the summary command (default:250, max:2500)'
+    )
+    p.add_option(
+        '--cache-dir', dest='cache_dir', default=cache_dir, type='string', metavar='DIR',
+        help='set the directory for the local event and API discovery caches to DIR (default:%s)' % cache_dir
+    )
+    p.add_option(
+        '--no-cache', dest='no_cache', action='store_true', default=False,
+        help='access the server directly without the local caches (default: False)'
+    )
+    p.add_option(
+        '--no-event-cache', dest='no_event_cache', action='store_true', default=False,
+        help=' '.join([
+            'fetch events from the server without the local event cache in the summary/conflicts/report command',
+            '(default: False) Unchanged responses are revalidated with their ETags.'
+        ])
+    )
+    p.add_option(
+        '--offline', dest='offline', action='store_true', default=False,
+        help='print events only from the local event cache without accessing the server (default: False)'
+    )
+    p.add_option(
+        '--max-age', dest='max_age', default=None, type=int, metavar='SECONDS',
+        help='use the local event cache without synchronization if it is newer than SECONDS (default: None)'
+    )
+    p.add_option(
+        '--expand-locally', dest='expand_locally', action='store_true', default=False,
+        help=' '.join([
+            'fetch each recurring event once and expand its instances locally in the summary command',
+            'instead of using the local event cache (default: False)'
+        ])
+    )
+    p.add_option(
+        '--socket', dest='socket', default=socket_path, type='string', metavar='PATH',
+        help='set the socket path of the daemon to PATH (default:%s)' % socket_path
+    )
+    p.add_option(
+        '--no-daemon', dest='no_daemon', action='store_true', default=False,
+        help='run the command in this process even if the daemon is running (default: False)'
+    )
+    p.add_option(
+        '--profile', dest='profile', action='store_true', default=bool(os.environ.get(PROFILE_ENV)),
+        help='print wall-clock and CPU time of each phase to stderr (default: False, or set $%s)' % PROFILE_ENV
+    )
+    p.add_option(
+        '--profile-output', dest='profile_output', default=os.environ.get(PROFILE_OUTPUT_ENV), type='string',
+        metavar='PATH',
+        help='append the profiling result as a JSON line to PATH; implies --profile (default: $%s)' % PROFILE_OUTPUT_ENV
+    )
     p.add_option(
         '--debug', dest='debug', action='store_true', default=False,
         help='enable debug logging (default: False)'
@@ -88,3 +242,9 @@ def _get_parser():
 
 
 parser = _get_parser()
+
+
+def reload():
+    """Rebuild the parser with the defaults from the current environment, e.g. of a client of the daemon."""
+    global parser
+    parser = _get_parser()
@@ -1,10 +1,10 @@
 from __future__ import division, print_function, absolute_import, unicode_literals
 
 import re
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, time
 from tzlocal import get_localzone
 from calendar_cli.model import EventTime, Event
-from calendar_cli.operation import HelpOperation, SummaryOperation, CreateOperation, SetupOperation
+from calendar_cli import operation as operations
 from calendar_cli.setting import arg_parser
 from mog_commons.case_class import CaseClass
 from mog_commons.functional import oget
@@ -15,12 +15,16 @@ class Setting(CaseClass):
     """Manages all settings."""
 
     DEFAULT_CREATE_DURATION = timedelta(minutes=15)
+    DEFAULT_WORK_START = time(9, 0)
+    DEFAULT_WORK_END = time(18, 0)
 
-    def __init__(self, operation=None, now=None, debug=None):
+    def __init__(self, operation=None, now=None, debug=None, profile=None, profile_output=None):
         CaseClass.__init__(self,
                            ('operation', operation),
                            ('now', now or get_localzone().localize(datetime.now())),
-                           ('debug', debug)
+                           ('debug', debug),
+                           ('profile', profile),
+                           ('profile_output', profile_output)
                            )
 
     @staticmethod
@@ -106,6 +110,26 @@ class Setting(CaseClass):
                 end += timedelta(days=1)
         return EventTime(True, start), EventTime(True, end)
 
+    @classmethod
+    def _parse_date_range(cls, date, days, now):
+        """
+        :return: (datetime, timedelta): start of the first date and the duration of whole days
+        """
+        dt = oget(cls._parse_date(date, now), now.date())
+        start_time = get_localzone().localize(datetime(dt.year, dt.month, dt.day))
+
+        if days == 0:
+            # show events on one day
+            duration = timedelta(days=1)
+        elif days < 0:
+            # show events from past several days
+            duration = timedelta(days=-days + 1)
+            start_time -= timedelta(days=-days)
+        else:
+            # show events from several days from today
+            duration = timedelta(days=days + 1)
+        return start_time, duration
+
     def parse_args(self, argv):
         assert self.now is not None
 
@@ -113,45 +137,104 @@ class Setting(CaseClass):
         option, args = arg_parser.parser.parse_args([to_unicode(a, errors='ignore') for a in argv[1:]])
 
         try:
-            if not args:
-                # summary
-                dt = oget(self._parse_date(option.date, self.now), self.now.date())
-                start_time = get_localzone().localize(datetime(dt.year, dt.month, dt.day))
-
+            if not args or (args[0] == 'conflicts' and len(args) == 1):
+                # summary, or conflicts
+                start_time, duration = self._parse_date_range(option.date, option.days, self.now)
                 fmt = (option.format or
                        (arg_parser.DEFAULT_FORMAT if option.days == 0 else arg_parser.DEFAULT_FORMAT_DAYS))
 
-                if option.days == 0:
-                    # show events on one day
-                    duration = timedelta(days=1)
-                elif option.days < 0:
-                    # show events from past several days
-                    duration = timedelta(days=-option.days + 1)
-                    start_time -= timedelta(days=-option.days)
-                else:
-                    # show events from several days from today
-                    duration = timedelta(days=option.days + 1)
-
-                operation = SummaryOperation(option.calendar, start_time, duration,
-                                             option.credential, fmt, option.separator)
+                if option.no_cache and (option.offline or option.max_age is not None):
+                    raise ValueError('--offline and --max-age options cannot be used with --no-cache.')
+                if option.no_event_cache and (option.offline or option.max_age is not None):
+                    raise ValueError('--offline and --max-age options cannot be used with --no-event-cache.')
+                if option.expand_locally and (option.offline or option.max_age is not None):
+                    raise ValueError('--offline and --max-age options cannot be used with --expand-locally.')
+                if option.max_age is not None and option.max_age < 0:
+                    raise ValueError('--max-age option must not be negative: %d' % option.max_age)
+
+                cache_dir = None if option.no_cache else option.cache_dir
+                operation = operations.SummaryOperation(option.calendar, start_time, duration, option.credential, fmt,
+                                                        option.separator, option.page_size, cache_dir, option.offline,
+                                                        option.max_age, conflicts_only=bool(args),
+                                                        expand_locally=option.expand_locally,
+                                                        event_cache=not option.no_event_cache)
             elif args[0] == 'setup' and len(args) == 2:
                 # setup
-                operation = SetupOperation(args[1], option.credential, option.read_only, option.no_browser)
+                operation = operations.SetupOperation(args[1], option.credential, option.read_only, option.no_browser)
+            elif args[0] == 'free' and len(args) == 1:
+                # free
+                start_time, duration = self._parse_date_range(option.date, option.days, self.now)
+                if option.min_length <= 0:
+                    raise ValueError('--min-length option must be positive: %d' % option.min_length)
+                operation = operations.FreeOperation(option.calendar, start_time, duration, option.credential,
+                                                     oget(self._parse_time(option.start_time), self.DEFAULT_WORK_START),
+                                                     oget(self._parse_time(option.end_time), self.DEFAULT_WORK_END),
+                                                     timedelta(minutes=option.min_length), option.weekends,
+                                                     None if option.no_cache else option.cache_dir)
+            elif args[0] == 'report' and len(args) == 1:
+                # report
+                start_time, duration = self._parse_date_range(option.date, option.days, self.now)
+                if option.no_cache and option.offline:
+                    raise ValueError('--offline option cannot be used with --no-cache.')
+                if option.no_event_cache and option.offline:
+                    raise ValueError('--offline option cannot be used with --no-event-cache.')
+                keywords = [x.strip() for x in (option.keywords or '').split(',') if x.strip()]
+                operation = operations.ReportOperation(option.calendar, start_time, duration, option.credential,
+                                                       option.period, option.group_by, keywords, option.report_format,
+                                                       option.page_size, None if option.no_cache else option.cache_dir,
+                                                       option.offline, not option.no_event_cache)
+            elif args[0] == 'search' and len(args) >= 2:
+                # search
+                if option.no_cache or option.no_event_cache:
+                    raise ValueError('search command cannot be used with --no-cache or --no-event-cache.')
+                if option.date is None and option.days == 0:
+                    # search all the events in the cache
+                    start_time, duration = None, None
+                else:
+                    start_time, duration = self._parse_date_range(option.date, option.days, self.now)
+                fmt = option.format or arg_parser.DEFAULT_FORMAT_DAYS
+                operation = operations.SearchOperation(option.calendar, args[1:], start_time, duration,
+                                                       option.credential, fmt, option.cache_dir, option.offline,
+                                                       option.max_age)
+            elif args[0] == 'export' and len(args) == 1:
+                # export
+                start_time, duration = self._parse_date_range(option.date, option.days, self.now)
+                output = None if option.output in (None, '-') else option.output
+                operation = operations.ExportOperation(option.calendar, start_time, duration, option.credential, output,
+                                                       option.export_format, option.page_size,
+                                                       None if option.no_cache else option.cache_dir)
+            elif args[0] == 'import' and len(args) == 2:
+                # import
+                if option.max_workers <= 0:
+                    raise ValueError('--max-workers option must be positive: %d' % option.max_workers)
+                cache_dir = None if option.no_cache else option.cache_dir
+                operation = operations.ImportOperation(option.calendar, args[1], option.credential,
+                                                       str(self.now.tzinfo), cache_dir, option.max_workers)
+            elif args[0] == 'daemon' and len(args) == 1:
+                # daemon
+                operation = operations.DaemonOperation(option.socket)
+            elif args[0] == 'create' and len(args) == 1 and option.from_file:
+                # create from a file
+                operation = operations.BulkCreateOperation(option.calendar, option.from_file, option.credential,
+                                                           self.now, None if option.no_cache else option.cache_dir)
             elif args[0] == 'create' and len(args) >= 2:
                 # create
                 summary = ' '.join(args[1:])
                 start, end = self._parse_time_range(option.date, option.start_time, option.end_time, self.now)
                 ev = Event(start, end, summary, location=option.location)
-                operation = CreateOperation(option.calendar, ev, option.credential)
+                operation = operations.CreateOperation(option.calendar, ev, option.credential,
+                                                       None if option.no_cache else option.cache_dir)
             else:
                 # help
-                operation = HelpOperation()
+                operation = operations.HelpOperation()
         except Exception as e:
             # parse error
-            operation = HelpOperation(e)
+            operation = operations.HelpOperation(e)
             if option.debug:
                 import traceback
                 traceback.print_exc()
                 print()
 
-        return self.copy(operation=operation, debug=option.debug)
+        return self.copy(operation=operation, debug=option.debug,
+                         profile=option.profile or option.profile_output is not None,
+                         profile_output=option.profile_output)
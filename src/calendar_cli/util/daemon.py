@@ -0,0 +1,318 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+import os
+import sys
+import json
+import time
+import socket
+import struct
+import threading
+from calendar_cli.util.profiler import PROFILE_ENV, PROFILE_OUTPUT_ENV
+
+RECV_SIZE = 64 * 1024
+ACCEPT_TIMEOUT = 0.5
+
+# each response frame is a channel and the length of the payload followed by the payload
+FRAME_HEADER = struct.Struct('>BI')
+RESULT, STDOUT, STDERR = 0, 1, 2
+
+# environment variables read by commands, applied while the daemon runs a command of the client
+FORWARDED_ENV = ['HOME', 'TZ', 'XDG_CACHE_HOME', 'XDG_RUNTIME_DIR', PROFILE_ENV, PROFILE_OUTPUT_ENV]
+
+# messages are chosen when the daemon starts, so a client with another locale runs commands in its own process
+LOCALE_ENV = ['LANG', 'LANGUAGE', 'LC_ALL', 'LC_CTYPE', 'LC_MESSAGES']
+
+
+def get_environment():
+    """
+    :return: dict: values of the environment variables sent to the daemon (None for unset variables)
+    """
+    return dict((k, os.environ.get(k)) for k in FORWARDED_ENV + LOCALE_ENV)
+
+
+def _recv_all(sock):
+    chunks = []
+    while True:
+        b = sock.recv(RECV_SIZE)
+        if not b:
+            break
+        chunks.append(b)
+    return b''.join(chunks)
+
+
+def _recv_exact(sock, size):
+    """
+    :return: bytes: received bytes, or None if the connection is closed before size bytes
+    """
+    chunks, n = [], 0
+    while n < size:
+        b = sock.recv(min(size - n, RECV_SIZE))
+        if not b:
+            return None
+        chunks.append(b)
+        n += len(b)
+    return b''.join(chunks)
+
+
+def _send_json(sock, d):
+    sock.sendall(json.dumps(d).encode('utf-8'))
+    sock.shutdown(socket.SHUT_WR)
+
+
+def _send_frame(sock, channel, payload):
+    sock.sendall(FRAME_HEADER.pack(channel, len(payload)) + payload)
+
+
+def _iter_frames(sock):
+    """
+    :return: generator of (int, bytes): channel and payload of each frame until the connection is closed
+    """
+    while True:
+        header = _recv_exact(sock, FRAME_HEADER.size)
+        if header is None:
+            break
+        channel, size = FRAME_HEADER.unpack(header)
+        payload = _recv_exact(sock, size)
+        if payload is None:
+            break
+        yield channel, payload
+
+
+class Environment(object):
+    """
+    Set environment variables in the block and restore them after it. None unsets the variable.
+    """
+
+    def __init__(self, env):
+        """
+        :param env: dict: variable name -> value or None
+        """
+        self.env = env
+        self._saved = {}
+
+    @staticmethod
+    def _apply(env):
+        for k, v in env.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+        if 'TZ' in env and hasattr(time, 'tzset'):
+            time.tzset()
+
+    def __enter__(self):
+        self._saved = dict((k, os.environ.get(k)) for k in self.env)
+        self._apply(self.env)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._apply(self._saved)
+        self._saved = {}
+
+
+class OutputStream(object):
+    """
+    Redirect the file descriptors of stdout and stderr to pipes, and pass the output to a function as it is written.
+
+    Output is redirected at the file descriptor level since some functions keep a reference to sys.stdout
+    taken at import time. Once the function fails, e.g. the client has gone away, the rest of the output is discarded.
+    """
+
+    def __init__(self, write):
+        """
+        :param write: function: (int, bytes) -> None: called with the file descriptor and the output
+        """
+        self._write = write
+        self._pipes = []
+
+    def _read(self, fd, r):
+        failed = False
+        try:
+            while True:
+                b = os.read(r, RECV_SIZE)
+                if not b:
+                    break
+                if not failed:
+                    try:
+                        self._write(fd, b)
+                    except (socket.error, IOError, OSError):
+                        failed = True  # keep reading so that the command is never blocked on a full pipe
+        finally:
+            os.close(r)
+
+    def __enter__(self):
+        for fd in [1, 2]:
+            r, w = os.pipe()
+            saved = os.dup(fd)
+            os.dup2(w, fd)
+            os.close(w)
+            t = threading.Thread(target=self._read, args=(fd, r))
+            t.daemon = True
+            t.start()
+            self._pipes.append((fd, saved, t))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for s in [sys.stdout, sys.stderr]:
+            s.flush()
+
+        # restoring the file descriptors closes the pipes, and the readers finish after the remaining output
+        for fd, saved, t in self._pipes:
+            os.dup2(saved, fd)
+            os.close(saved)
+            t.join()
+        self._pipes = []
+
+
+class DaemonServer(object):
+    """
+    Serve commands over a Unix domain socket one at a time.
+
+    A request is a JSON object with 'argv', 'cwd' and 'env'. The response is a sequence of frames: the output of the
+    command on STDOUT and STDERR as it is written, and a JSON object on RESULT with 'return_code', or with 'fallback'
+    if the command should run in the client's process.
+    """
+
+    def __init__(self, socket_path, handler):
+        """
+        :param socket_path: string: path to the socket file
+        :param handler: function: argv -> return code
+        """
+        self.socket_path = socket_path
+        self.handler = handler
+        self._running = False
+
+    def _bind(self):
+        # remove the socket file left by a daemon which has not exited cleanly
+        if os.path.exists(self.socket_path):
+            assert not is_running(self.socket_path), 'Daemon is already running: %s' % self.socket_path
+            os.unlink(self.socket_path)
+
+        parent_dir = os.path.dirname(self.socket_path)
+        if parent_dir and not os.path.exists(parent_dir):
+            os.makedirs(parent_dir)
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0o077)  # only the owner can connect
+        try:
+            sock.bind(self.socket_path)
+        finally:
+            os.umask(umask)
+        sock.listen(5)
+        sock.settimeout(ACCEPT_TIMEOUT)
+        return sock
+
+    def _handle(self, conn):
+        data = _recv_all(conn)
+        if not data:
+            # connection check by is_running()
+            return
+        req = json.loads(data.decode('utf-8'))
+        env = req.get('env', {})
+
+        if any(env[k] != os.environ.get(k) for k in LOCALE_ENV if k in env):
+            _send_frame(conn, RESULT, json.dumps({'fallback': 'locale'}).encode('utf-8'))
+            return
+
+        lock = threading.Lock()
+
+        def write(fd, b):
+            with lock:
+                _send_frame(conn, STDOUT if fd == 1 else STDERR, b)
+
+        cwd = os.getcwd()
+        try:
+            # relative paths in the arguments are resolved from the client's directory
+            os.chdir(req['cwd'])
+            with Environment(dict((k, env[k]) for k in FORWARDED_ENV if k in env)), OutputStream(write):
+                return_code = self.handler(req['argv'])
+        finally:
+            os.chdir(cwd)
+
+        _send_frame(conn, RESULT, json.dumps({'return_code': return_code}).encode('utf-8'))
+
+    def serve_forever(self):
+        sock = self._bind()
+        self._running = True
+        try:
+            while self._running:
+                try:
+                    conn, _ = sock.accept()
+                except socket.timeout:
+                    continue
+                try:
+                    conn.settimeout(None)
+                    self._handle(conn)
+                except socket.error:
+                    pass  # the client has gone away
+                finally:
+                    conn.close()
+        finally:
+            sock.close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def shutdown(self):
+        """Stop serving after the current request."""
+        self._running = False
+
+
+def is_running(socket_path):
+    """
+    :return: True if a daemon is listening on the socket
+    """
+    if not hasattr(socket, 'AF_UNIX') or not os.path.exists(socket_path):
+        return False
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+        return True
+    except socket.error:
+        return False
+    finally:
+        sock.close()
+
+
+def send_request(socket_path, argv, cwd=None, env=None, stdout=None, stderr=None):
+    """
+    Run a command on the daemon, writing its output as it arrives.
+
+    :param argv: list of string: command line arguments
+    :param cwd: string: working directory to run the command (default: current directory)
+    :param env: dict: environment variables for the command (default: get_environment())
+    :param stdout: binary file object for the output of the command (default: sys.stdout)
+    :param stderr: binary file object for the error output of the command (default: sys.stderr)
+    :return: int: return code, or None if the daemon is not running or the command should run in this process
+    """
+    if not hasattr(socket, 'AF_UNIX') or not os.path.exists(socket_path):
+        return None
+
+    outputs = {
+        STDOUT: stdout or getattr(sys.stdout, 'buffer', sys.stdout),
+        STDERR: stderr or getattr(sys.stderr, 'buffer', sys.stderr),
+    }
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        try:
+            sock.connect(socket_path)
+        except socket.error:
+            return None
+
+        _send_json(sock, {
+            'argv': argv,
+            'cwd': os.getcwd() if cwd is None else cwd,
+            'env': get_environment() if env is None else env,
+        })
+        for channel, payload in _iter_frames(sock):
+            if channel == RESULT:
+                result = json.loads(payload.decode('utf-8'))
+                return None if 'fallback' in result else result['return_code']
+            outputs[channel].write(payload)
+            outputs[channel].flush()
+    finally:
+        sock.close()
+
+    # the command may have been executed partially, so do not fall back to in-process execution
+    assert False, 'Daemon closed the connection without a response: %s' % socket_path
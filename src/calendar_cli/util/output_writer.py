@@ -0,0 +1,57 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+import sys
+from mog_commons.string import to_bytes
+
+
+class OutputWriter(object):
+    """
+    Buffered line writer which encodes strings in the same way as mog_commons.io.print_safe.
+
+    Lines are written to the output when the buffer exceeds the buffer size, or on every flush_lines() call
+    if the output is a terminal so that interactive users see each chunk as soon as it is complete.
+    """
+
+    DEFAULT_BUFFER_SIZE = 64 * 1024
+
+    def __init__(self, output=None, encoding='utf-8', errors='ignore', buffer_size=DEFAULT_BUFFER_SIZE):
+        """
+        :param output: output file handler (default: sys.stdout at the time of construction)
+        :param encoding: encoding
+        :param errors: error handling scheme. Refer to codecs.register_error.
+        :param buffer_size: int: maximum bytes to keep in the buffer
+        """
+        self.output = sys.stdout if output is None else output
+        self.encoding = encoding
+        self.errors = errors
+        self.buffer_size = buffer_size
+
+        self._writer = self.output.buffer if hasattr(self.output, 'buffer') else self.output
+        self._interactive = hasattr(self.output, 'isatty') and self.output.isatty()
+        self._buffer = []
+        self._size = 0
+
+    def write_line(self, s):
+        b = to_bytes(s, self.encoding, self.errors) + b'\n'
+        self._buffer.append(b)
+        self._size += len(b)
+        if self._size >= self.buffer_size:
+            self.flush()
+
+    def flush_lines(self):
+        """Mark the end of a chunk of lines."""
+        if self._interactive:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self._writer.write(b''.join(self._buffer))
+            self._buffer = []
+            self._size = 0
+        self.output.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
@@ -0,0 +1,146 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+import io
+import os
+import sys
+import json
+import time
+import socket
+import threading
+from contextlib import contextmanager
+
+PROFILE_ENV = 'CALENDAR_CLI_PROFILE'
+PROFILE_OUTPUT_ENV = 'CALENDAR_CLI_PROFILE_OUTPUT'
+
+if hasattr(time, 'thread_time'):
+    _cpu_time = time.thread_time
+elif hasattr(time, 'process_time'):
+    _cpu_time = time.process_time
+else:
+    _cpu_time = time.clock
+
+
+class Profiler(object):
+    """
+    Records wall-clock and CPU time per phase, and HTTP request statistics.
+
+    Phases can be nested. The time of an inner phase is excluded from the outer phase.
+    Nothing is recorded unless the profiler is enabled.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self, argv=None):
+        """
+        Disable the profiler and discard the results.
+
+        :param argv: list of string: command line arguments recorded in the trace (default: sys.argv)
+        """
+        self.enabled = False
+        self.argv = sys.argv if argv is None else argv
+        self.started_at = time.time()
+        self._started_cpu = _cpu_time()
+        self._phases = {}
+        self._order = []
+        self._http = {'requests': 0, 'bytes_sent': 0, 'bytes_received': 0}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def enable(self):
+        self.enabled = True
+
+    def _add(self, name, wall, cpu, count):
+        with self._lock:
+            if name not in self._phases:
+                self._phases[name] = {'count': 0, 'wall': 0.0, 'cpu': 0.0}
+                self._order.append(name)
+            p = self._phases[name]
+            p['count'] += count
+            p['wall'] += wall
+            p['cpu'] += cpu
+
+    @contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+
+        wall, cpu = time.time(), _cpu_time()
+        if stack:
+            # pause the outer phase
+            self._add(stack[-1][0], wall - stack[-1][1], cpu - stack[-1][2], 0)
+        frame = [name, wall, cpu]
+        stack.append(frame)
+        try:
+            yield
+        finally:
+            wall, cpu = time.time(), _cpu_time()
+            self._add(name, wall - frame[1], cpu - frame[2], 1)
+            stack.pop()
+            if stack:
+                # resume the outer phase
+                stack[-1][1], stack[-1][2] = wall, cpu
+
+    def record_http(self, bytes_sent, bytes_received):
+        with self._lock:
+            self._http['requests'] += 1
+            self._http['bytes_sent'] += bytes_sent
+            self._http['bytes_received'] += bytes_received
+
+    def wrap_http(self, http):
+        """
+        Record every request of the httplib2.Http instance in the 'http' phase while the profiler is enabled.
+
+        :return: the same http instance
+        """
+        request_orig = http.request
+
+        def request(uri, method='GET', body=None, *args, **kwargs):
+            if not self.enabled:
+                return request_orig(uri, method, body, *args, **kwargs)
+            with self.phase('http'):
+                resp, content = request_orig(uri, method, body, *args, **kwargs)
+            self.record_http(len(body or b''), len(content or b''))
+            return resp, content
+
+        http.request = request
+        return http
+
+    def to_dict(self):
+        return {
+            'started_at': self.started_at,
+            'host': socket.gethostname(),
+            'pid': os.getpid(),
+            'argv': self.argv,
+            'total': {'wall': time.time() - self.started_at, 'cpu': _cpu_time() - self._started_cpu},
+            'phases': dict((k, dict(v)) for k, v in self._phases.items()),
+            'http': dict(self._http),
+        }
+
+    def report(self, output=None):
+        """Print the summary table."""
+        output = sys.stderr if output is None else output
+        d = self.to_dict()
+
+        lines = ['%-12s %6s %10s %10s' % ('phase', 'count', 'wall(s)', 'cpu(s)')]
+        for name in self._order:
+            p = d['phases'][name]
+            lines.append('%-12s %6d %10.3f %10.3f' % (name, p['count'], p['wall'], p['cpu']))
+        lines.append('%-12s %6s %10.3f %10.3f' % ('total', '', d['total']['wall'], d['total']['cpu']))
+        lines.append('http: %(requests)d requests, %(bytes_sent)d bytes sent, %(bytes_received)d bytes received'
+                     % d['http'])
+        output.write('\n'.join(lines) + '\n')
+        output.flush()
+
+    def write_trace(self, path):
+        """Append the result as a JSON line so that traces from many runs can be aggregated."""
+        with io.open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(self.to_dict(), sort_keys=True) + '\n')
+
+
+profiler = Profiler()
@@ -1,11 +1,12 @@
 # encoding: utf-8
 from __future__ import division, print_function, absolute_import, unicode_literals
 
-from datetime import datetime
+import random
+from datetime import datetime, timedelta
 import pytz
 from mog_commons import unittest
-from calendar_cli.model import EventTime, Event
-from calendar_cli.i18n import MSG_ALL_DAY, MSG_WEEK_DAY
+from calendar_cli.model import EventTime, Event, EventFormatter
+from calendar_cli.i18n import MSG_ALL_DAY, MSG_WEEK_DAY, MSG_CONFLICT
 
 
 class TestEventTime(unittest.TestCase):
@@ -112,11 +113,153 @@ class TestEvent(unittest.TestCase):
     def test_init_error(self):
         """todo"""
 
+    def test_compact(self):
+        self.assertFalse(hasattr(self.t0, '__dict__'))
+        self.assertFalse(hasattr(self.e0, '__dict__'))
+        self.assertFalse(hasattr(Event.parse_dict({'summary': 'x', 'start': {'date': '2015-10-17'},
+                                                   'end': {'date': '2015-10-18'}}, 'UTC'), '__dict__'))
+
+    def test_parse_dict_lazy(self):
+        d = {
+            'summary': 'Google I/O 2016',
+            'start': {'dateTime': '2015-05-28T09:00:00-07:00'},
+            'end': {'dateTime': '2015-05-28T17:00:00-07:00'},
+            'creator': {'displayName': 'Foo Bar', 'email': 'foo@example.com'},
+            'location': 'Mountain View',
+        }
+        e = Event.parse_dict(d, 'America/Los_Angeles')
+
+        # fields are decoded on first access
+        d['location'] = 'Shoreline'
+        self.assertEqual(e.location, 'Shoreline')
+        d['location'] = 'Mountain View'
+        self.assertEqual(e.location, 'Shoreline')
+        self.assertEqual(e, self.e3.copy(location='Shoreline'))
+        self.assertEqual(repr(e), repr(self.e3.copy(location='Shoreline')))
+
+    def test_merge(self):
+        def ev(day, hour, summary):
+            if hour is None:
+                t = EventTime(False, datetime(2015, 10, day, 0, 0, 0, 0, pytz.utc))
+            else:
+                t = EventTime(True, datetime(2015, 10, day, hour, 0, 0, 0, pytz.utc))
+            return Event(t, t, summary)
+
+        xs = [ev(17, 9, 'a1'), ev(18, None, 'a2'), ev(18, 10, 'a3')]
+        ys = [ev(17, None, 'b1'), ev(17, 9, 'b2'), ev(19, 8, 'b3')]
+        zs = []
+        self.assertEqual([e.summary for e in Event.merge([iter(xs), iter(ys), iter(zs)])],
+                         ['b1', 'a1', 'b2', 'a2', 'a3', 'b3'])
+        self.assertEqual(list(Event.merge([])), [])
+
+    def test_mark_conflicts(self):
+        def ev(day, start, end, summary):
+            if start is None:
+                t0 = EventTime(False, datetime(2015, 10, day, 0, 0, 0, 0, pytz.utc))
+                t1 = EventTime(False, datetime(2015, 10, day + 1, 0, 0, 0, 0, pytz.utc))
+            else:
+                t0 = EventTime(True, datetime(2015, 10, day, start, 0, 0, 0, pytz.utc))
+                t1 = EventTime(True, datetime(2015, 10, day, end, 0, 0, 0, pytz.utc))
+            return Event(t0, t1, summary)
+
+        xs = [
+            ev(17, None, None, 'a'),  # all-day events never conflict
+            ev(17, 9, 12, 'b'),
+            ev(17, 10, 11, 'c'),
+            ev(17, 11, 13, 'd'),  # overlaps with b
+            ev(17, 13, 14, 'e'),  # adjacent events do not conflict
+            ev(18, None, None, 'f'),
+            ev(18, 9, 10, 'g'),
+            ev(18, 9, 10, 'h'),
+        ]
+        ys = list(Event.mark_conflicts(iter(xs)))
+        self.assertEqual([e.summary for e in ys], ['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h'])
+        self.assertEqual([e.summary for e in ys if e.conflict], ['b', 'c', 'd', 'g', 'h'])
+        self.assertEqual(list(Event.mark_conflicts([])), [])
+
+        # timezones are respected: 18:00 in Los Angeles is 01:00 UTC on the next day
+        t0 = EventTime(True, self.tz_la.localize(datetime(2015, 10, 16, 17, 0)))
+        t1 = EventTime(True, self.tz_la.localize(datetime(2015, 10, 16, 18, 30)))
+        e0 = Event(t0, t1, 'la')
+        e1 = Event(EventTime(True, datetime(2015, 10, 17, 1, 0, 0, 0, pytz.utc)),
+                   EventTime(True, datetime(2015, 10, 17, 2, 0, 0, 0, pytz.utc)), 'utc')
+        self.assertEqual([e.conflict for e in Event.mark_conflicts([e0, e1])], [True, True])
+        self.assertEqual(e0.to_format('%S%X'), 'la%s' % MSG_CONFLICT)
+
+        # events merged from calendars in different time zones are not ordered by the absolute time
+        tz_ny = pytz.timezone('America/New_York')
+        ny = Event(EventTime(True, tz_ny.localize(datetime(2015, 10, 16, 20, 0))),
+                   EventTime(True, tz_ny.localize(datetime(2015, 10, 16, 20, 30))), 'ny')  # 00:00Z on 17th
+        tokyo = Event(EventTime(True, self.tz_tokyo.localize(datetime(2015, 10, 17, 8, 0))),
+                      EventTime(True, self.tz_tokyo.localize(datetime(2015, 10, 17, 8, 30))), 'tokyo')  # 23:00Z
+        tokyo2 = Event(EventTime(True, self.tz_tokyo.localize(datetime(2015, 10, 17, 9, 15))),
+                       EventTime(True, self.tz_tokyo.localize(datetime(2015, 10, 17, 9, 45))), 'tokyo2')  # 00:15Z
+        merged = list(Event.merge([[ny], [tokyo, tokyo2]]))
+        self.assertEqual([e.summary for e in merged], ['ny', 'tokyo', 'tokyo2'])
+        self.assertEqual([(e.summary, e.conflict) for e in Event.mark_conflicts(merged)],
+                         [('ny', True), ('tokyo', False), ('tokyo2', True)])
+        self.assertEqual(Event(t0, t1, 'x').to_format('%S%X'), 'x')
+
+    def test_mark_conflicts_random(self):
+        rand = random.Random(1)
+        tzs = [pytz.utc, self.tz_la, self.tz_tokyo, pytz.timezone('Pacific/Kiritimati')]
+        calendars = []
+        for tz in tzs:
+            xs = []
+            for _ in range(50):
+                t = tz.localize(datetime(2015, 10, 17) + timedelta(minutes=rand.randrange(0, 3 * 24 * 60, 15)))
+                d = timedelta(minutes=rand.choice([0, 15, 30, 60, 240]))
+                xs.append(Event(EventTime(True, t), EventTime(True, t + d), 'x'))
+            calendars.append(sorted(xs, key=lambda e: e.start_time.datetime_tz))
+        merged = list(Event.merge(calendars))
+
+        expected = [any(a is not b and a.start_time.datetime_tz < b.end_time.datetime_tz and
+                        b.start_time.datetime_tz < a.end_time.datetime_tz for b in merged) for a in merged]
+        ys = list(Event.mark_conflicts(merged))
+        self.assertEqual([id(e) for e in ys], [id(e) for e in merged])
+        self.assertEqual([e.conflict for e in ys], expected)
+        self.assertTrue(any(expected) and not all(expected))
+
+    def test_mark_conflicts_dense(self):
+        consumed = [0]
+
+        def events():
+            # back-to-back events do not conflict however many they are in a day
+            for day in range(17, 22):
+                t = datetime(2015, 10, day, 0, 0, 0, 0, pytz.utc)
+                for i in range(2000):
+                    consumed[0] += 1
+                    yield Event(EventTime(True, t + timedelta(seconds=30 * i)),
+                                EventTime(True, t + timedelta(seconds=30 * (i + 1))), 'x')
+
+        ys = Event.mark_conflicts(events())
+        self.assertFalse(next(ys).conflict)
+        self.assertLessEqual(consumed[0], 3)  # yielded without reading the whole day
+        self.assertEqual(sum(1 for e in ys if e.conflict), 0)
+        self.assertEqual(consumed[0], 10000)
+
     def test_to_format(self):
         self.assertEqual(self.e0.to_format('[%T] %S%L%C'), '[09:00-17:00] Google I/O 2015 (Foo Bar)')
         self.assertEqual(self.e1.to_format('[%T] %S%L%C'), '[%s] あいうえお' % MSG_ALL_DAY)
         self.assertEqual(self.e2.to_format('[%T] %S%L%C'), '[%s] あいうえお (foo@example.com)' % MSG_ALL_DAY)
         self.assertEqual(self.e3.to_format('[%T] %S%L%C'), '[09:00-17:00] Google I/O 2016 @Mountain View (Foo Bar)')
+        self.assertEqual(self.e0.copy(calendar_id='foo@example.com').to_format('%I: %S'),
+                         'foo@example.com: Google I/O 2015')
+        self.assertEqual(self.e0.to_format('%I: %S'), ': Google I/O 2015')
+
+    def test_to_format_new_symbols(self):
+        t5 = EventTime(False, self.tz_tokyo.localize(datetime(2015, 10, 20, 0, 0, 0, 0)))
+        t6 = EventTime(True, self.tz_la.localize(datetime(2015, 5, 29, 1, 30, 0, 0)))
+        self.assertEqual(self.e0.to_format('%E %U'), '2015-05-28 %s 8:00' % MSG_WEEK_DAY[3])
+        self.assertEqual(Event(self.t0, t6, 'x').to_format('%E %U'), '2015-05-29 %s 16:30' % MSG_WEEK_DAY[4])
+        self.assertEqual(self.e1.to_format('%E %U'), '2015-10-17 %s 1d' % MSG_WEEK_DAY[5])
+        self.assertEqual(Event(self.t2, t5, 'x').to_format('%E %U'), '2015-10-19 %s 3d' % MSG_WEEK_DAY[0])
+        self.assertEqual(Event(self.t2, self.t2, 'x').to_format('%E %U'), '2015-10-17 %s 0d' % MSG_WEEK_DAY[5])
+
+    def test_to_format_literal(self):
+        # symbols in the event fields are not replaced
+        self.assertEqual(self.e3.copy(summary='100% %L').to_format('%S%L %Z %'),
+                         '100% %L @Mountain View %Z %')
 
     def test_to_long_summary(self):
         self.assertEqual(self.e0.to_long_summary(), '2015-05-28 %s [09:00-17:00] Google I/O 2015' % MSG_WEEK_DAY[3])
@@ -141,6 +284,14 @@ class TestEvent(unittest.TestCase):
             'end': {'date': '2015-10-18', 'timeZone': 'Asia/Tokyo'},
             'creator': {'email': 'foo@example.com'},
         })
+        self.assertEqual(self.e1.copy(event_id='abc', description='memo', recurrence=['RRULE:FREQ=DAILY']).to_dict(), {
+            'id': 'abc',
+            'summary': 'あいうえお',
+            'description': 'memo',
+            'recurrence': ['RRULE:FREQ=DAILY'],
+            'start': {'date': '2015-10-17', 'timeZone': 'Asia/Tokyo'},
+            'end': {'date': '2015-10-18', 'timeZone': 'Asia/Tokyo'},
+        })
 
     def test_parse_dict(self):
         self.assertEqual(Event.parse_dict({
@@ -161,3 +312,25 @@ class TestEvent(unittest.TestCase):
             'end': {'date': '2015-10-18'},
             'creator': {'email': 'foo@example.com'},
         }, 'Asia/Tokyo'), self.e2)
+
+
+class TestEventFormatter(unittest.TestCase):
+    def test_compile(self):
+        f = EventFormatter.compile('%D [%T] %S%L')
+        self.assertIs(EventFormatter.compile('%D [%T] %S%L'), f)
+        self.assertEqual(f.symbols, frozenset(['D', 'T', 'S', 'L']))
+        self.assertEqual(EventFormatter.compile('%% %Z').symbols, frozenset())
+
+    def test_resource_fields(self):
+        self.assertEqual(EventFormatter('%D [%T] %S').resource_fields, ('start', 'end', 'summary'))
+        self.assertEqual(EventFormatter('%L %I %C %L').resource_fields,
+                         ('start', 'end', 'summary', 'creator(displayName,email)', 'location'))
+
+    def test_format_evaluates_used_fields_only(self):
+        class E(object):
+            summary = 'summary'
+
+            def __getattr__(self, name):
+                raise AssertionError('unexpected access: %s' % name)
+
+        self.assertEqual(EventFormatter('[%S]').format(E()), '[summary]')
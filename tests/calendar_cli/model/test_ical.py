@@ -0,0 +1,155 @@
+# encoding: utf-8
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+from datetime import datetime, timedelta
+import pytz
+from mog_commons import unittest
+from calendar_cli.model import ical, EventTime
+
+
+class TestICal(unittest.TestCase):
+    def test_escape_text(self):
+        self.assertEqual(ical.escape_text('a,b;c\\d\ne'), 'a\\,b\\;c\\\\d\\ne')
+
+    def test_fold_line(self):
+        self.assertEqual(ical.fold_line('SUMMARY:abc'), 'SUMMARY:abc\r\n')
+
+        s = ical.fold_line('SUMMARY:' + 'x' * 100)
+        self.assertEqual(s.split('\r\n'), ['SUMMARY:' + 'x' * 67, ' ' + 'x' * 33, ''])
+
+        # multi-byte characters are not split
+        s = ical.fold_line('SUMMARY:' + 'あ' * 40)
+        lines = s.split('\r\n')
+        self.assertEqual(lines[-1], '')
+        self.assertTrue(all(len(x.encode('utf-8')) <= 75 for x in lines))
+        self.assertEqual(''.join(x[1:] if i else x for i, x in enumerate(lines)), 'SUMMARY:' + 'あ' * 40)
+
+    def test_format_event(self):
+        d = {
+            'id': 'ev1',
+            'iCalUID': 'ev1@google.com',
+            'status': 'confirmed',
+            'updated': '2015-10-01T00:00:00.000Z',
+            'summary': 'Meeting, weekly',
+            'location': 'Room 1',
+            'creator': {'displayName': 'Alice', 'email': 'alice@example.com'},
+            'start': {'dateTime': '2015-10-17T10:30:00+09:00'},
+            'end': {'dateTime': '2015-10-17T11:00:00', 'timeZone': 'Asia/Tokyo'},
+        }
+        self.assertEqual(ical.format_event(d, 'UTC').split('\r\n'), [
+            'BEGIN:VEVENT',
+            'UID:ev1@google.com',
+            'DTSTAMP:20151001T000000Z',
+            'DTSTART:20151017T013000Z',
+            'DTEND:20151017T020000Z',
+            'SUMMARY:Meeting\\, weekly',
+            'LOCATION:Room 1',
+            'ORGANIZER;CN="Alice":mailto:alice@example.com',
+            'STATUS:CONFIRMED',
+            'END:VEVENT',
+            '',
+        ])
+
+        d = {'id': 'ev2', 'start': {'date': '2015-10-17'}, 'end': {'date': '2015-10-18'}}
+        self.assertEqual(ical.format_event(d, 'UTC').split('\r\n'), [
+            'BEGIN:VEVENT', 'UID:ev2', 'DTSTART;VALUE=DATE:20151017', 'DTEND;VALUE=DATE:20151018', 'END:VEVENT', ''])
+
+        # an instance of a recurring event is written as a standalone event
+        d = {'id': 'ev3_20151017T010000Z', 'iCalUID': 'ev3@google.com', 'recurringEventId': 'ev3',
+             'originalStartTime': {'dateTime': '2015-10-17T10:00:00+09:00'},
+             'start': {'dateTime': '2015-10-17T10:30:00+09:00'}, 'end': {'dateTime': '2015-10-17T11:00:00+09:00'}}
+        self.assertEqual(ical.format_event(d, 'UTC').split('\r\n'), [
+            'BEGIN:VEVENT', 'UID:ev3_20151017T010000Z', 'DTSTART:20151017T013000Z', 'DTEND:20151017T020000Z',
+            'END:VEVENT', ''])
+
+    def test_header_footer(self):
+        self.assertEqual(ical.header().split('\r\n')[:2], ['BEGIN:VCALENDAR', 'VERSION:2.0'])
+        self.assertEqual(ical.footer(), 'END:VCALENDAR\r\n')
+
+    def test_event_id(self):
+        self.assertEqual(ical.event_id('abc@example.com'), ical.event_id('abc@example.com'))
+        self.assertNotEqual(ical.event_id('abc@example.com'), ical.event_id('abd@example.com'))
+        self.assertRegexpMatches(ical.event_id('abc@example.com'), '^[0-9a-v]{32}$')
+
+    def test_parse_content_line(self):
+        self.assertEqual(ical.parse_content_line('dtstart;tzid=Asia/Tokyo:20151017T103000'),
+                         ('DTSTART', {'TZID': 'Asia/Tokyo'}, '20151017T103000'))
+        self.assertEqual(ical.parse_content_line('ORGANIZER;CN="Doe; J:":mailto:j@example.com'),
+                         ('ORGANIZER', {'CN': 'Doe; J:'}, 'mailto:j@example.com'))
+        self.assertRaisesRegexp(ValueError, 'Invalid content line: abc', ical.parse_content_line, 'abc')
+
+    def test_iter_events(self):
+        lines = [
+            'BEGIN:VCALENDAR\r\n',
+            'X-WR-TIMEZONE:Asia/Tokyo\r\n',
+            'BEGIN:VEVENT\r\n',
+            'UID:a@example.com\r\n',
+            'DTSTART;TZID=America/New_York:20151017T103000\r\n',
+            'DURATION:PT1H30M\r\n',
+            'SUMMARY:Weekly\\, meeting\r\n',
+            'DESCRIPTION:line 1\\nline\r\n',
+            '  2\r\n',
+            'ORGANIZER;CN=Alice:mailto:alice@example.com\r\n',
+            'RRULE:FREQ=WEEKLY;COUNT=3\r\n',
+            'EXDATE;TZID=America/New_York:20151024T103000\r\n',
+            'BEGIN:VALARM\r\n',
+            'DESCRIPTION:alarm\r\n',
+            'END:VALARM\r\n',
+            'END:VEVENT\r\n',
+            'BEGIN:VEVENT\r\n',
+            'UID:a@example.com\r\n',
+            'RECURRENCE-ID:20151031T143000Z\r\n',
+            'DTSTART;VALUE=DATE:20151031\r\n',
+            'STATUS:CANCELLED\r\n',
+            'END:VEVENT\r\n',
+            'BEGIN:VEVENT\r\n',
+            'SUMMARY:no start\r\n',
+            'END:VEVENT\r\n',
+            'END:VCALENDAR\r\n',
+        ]
+        results = list(ical.iter_events(iter(lines), 'UTC'))
+        self.assertEqual([n for n, _ in results], [3, 17, 23])
+
+        ev, original_start, cancelled = results[0][1]
+        ny = pytz.timezone('America/New_York')
+        self.assertEqual((original_start, cancelled), (None, False))
+        self.assertEqual(ev.start_time, EventTime(True, ny.localize(datetime(2015, 10, 17, 10, 30))))
+        self.assertEqual(ev.end_time.datetime_tz - ev.start_time.datetime_tz, timedelta(minutes=90))
+        self.assertEqual((ev.summary, ev.description, ev.location), ('Weekly, meeting', 'line 1\nline 2', None))
+        self.assertEqual((ev.creator_name, ev.creator_email), ('Alice', 'alice@example.com'))
+        self.assertEqual(ev.event_id, ical.event_id('a@example.com'))
+        self.assertEqual(ev.recurrence,
+                         ['RRULE:FREQ=WEEKLY;COUNT=3', 'EXDATE;TZID=America/New_York:20151024T103000'])
+
+        # the date is in the calendar time zone, and the end defaults to the next day
+        ev, original_start, cancelled = results[1][1]
+        self.assertEqual(original_start.datetime_tz, datetime(2015, 10, 31, 14, 30, tzinfo=pytz.utc))
+        self.assertEqual(cancelled, True)
+        self.assertEqual(ev.start_time.to_dict(), {'date': '2015-10-31', 'timeZone': 'Asia/Tokyo'})
+        self.assertEqual(ev.end_time.to_dict(), {'date': '2015-11-01', 'timeZone': 'Asia/Tokyo'})
+
+        # errors are reported for each component
+        self.assertIsInstance(results[2][1], AssertionError)
+        self.assertEqual(str(results[2][1]), 'DTSTART is missing')
+
+    def test_round_trip(self):
+        d = {'id': 'ev1', 'summary': 'a;b', 'start': {'dateTime': '2015-10-17T10:30:00+09:00'},
+             'end': {'dateTime': '2015-10-17T11:00:00+09:00'}, 'recurrence': ['RRULE:FREQ=DAILY;COUNT=2']}
+        s = ical.header() + ical.format_event(d, 'UTC') + ical.footer()
+        [(_, (ev, _, _))] = list(ical.iter_events(s.splitlines(True), 'UTC'))
+        self.assertEqual((ev.summary, ev.recurrence), ('a;b', ['RRULE:FREQ=DAILY;COUNT=2']))
+        self.assertEqual(ev.event_id, ical.event_id('ev1'))
+        self.assertEqual(ev.start_time.datetime_tz, datetime(2015, 10, 17, 1, 30, tzinfo=pytz.utc))
+
+    def test_round_trip_instance(self):
+        instances = [
+            {'id': 'ev1_20151017T013000Z', 'iCalUID': 'ev1@google.com', 'recurringEventId': 'ev1', 'summary': 'a',
+             'originalStartTime': {'dateTime': '2015-10-17T10:30:00+09:00'},
+             'start': {'dateTime': '2015-10-17T10:%02d:00+09:00' % m}, 'end': {'dateTime': '2015-10-17T11:00:00+09:00'}}
+            for m in [30, 45]
+        ]
+        instances[1]['id'] = 'ev1_20151018T013000Z'
+        s = ical.header() + ''.join(ical.format_event(d, 'UTC') for d in instances) + ical.footer()
+        xs = [x for _, x in ical.iter_events(s.splitlines(True), 'UTC')]
+        self.assertEqual([(ev.event_id, original_start) for ev, original_start, _ in xs],
+                         [(ical.event_id('ev1_20151017T013000Z'), None), (ical.event_id('ev1_20151018T013000Z'), None)])
@@ -0,0 +1,35 @@
+# encoding: utf-8
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+from datetime import date, time, datetime, timedelta
+import pytz
+from mog_commons import unittest
+from calendar_cli.model.interval import merge_intervals, subtract_intervals, daily_intervals
+
+
+class TestInterval(unittest.TestCase):
+    def test_merge_intervals(self):
+        self.assertEqual(merge_intervals([]), [])
+        self.assertEqual(merge_intervals([(5, 7), (1, 3), (2, 4), (4, 5), (8, 9), (8, 8), (10, 12), (10, 11)]),
+                         [(1, 7), (8, 9), (10, 12)])
+
+    def test_subtract_intervals(self):
+        self.assertEqual(list(subtract_intervals([(0, 10)], [])), [(0, 10)])
+        self.assertEqual(list(subtract_intervals([(0, 10), (20, 30), (40, 50)], [(-5, 2), (4, 6), (9, 22), (45, 60)])),
+                         [(2, 4), (6, 9), (22, 30), (40, 45)])
+        self.assertEqual(list(subtract_intervals([(0, 10), (20, 30)], [(0, 30)])), [])
+        self.assertEqual(list(subtract_intervals([(10, 20)], [(0, 5), (25, 30)])), [(10, 20)])
+
+    def test_daily_intervals(self):
+        tz = pytz.timezone('America/New_York')
+        xs = list(daily_intervals(date(2015, 10, 30), date(2015, 11, 2), time(9), time(18), tz, set(range(5))))
+        self.assertEqual(xs, [
+            (tz.localize(datetime(2015, 10, 30, 9)), tz.localize(datetime(2015, 10, 30, 18))),
+            (tz.localize(datetime(2015, 11, 2, 9)), tz.localize(datetime(2015, 11, 2, 18))),
+        ])
+        # daylight saving time ends on 2015-11-01
+        self.assertEqual([s.utcoffset() for s, _ in xs], [timedelta(hours=-4), timedelta(hours=-5)])
+
+        self.assertEqual(len(list(daily_intervals(date(2015, 10, 30), date(2015, 11, 2), time(9), time(18), tz))), 4)
+        self.assertRaises(AssertionError, list, daily_intervals(date(2015, 10, 30), date(2015, 11, 2), time(18),
+                                                                time(9), tz))
@@ -0,0 +1,90 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+from datetime import datetime
+import pytz
+from mog_commons import unittest
+from calendar_cli.model.recurrence import RecurrenceExpander, instance_key
+
+
+class TestRecurrence(unittest.TestCase):
+    tz = pytz.timezone('America/New_York')
+    t0 = tz.localize(datetime(2015, 10, 1))
+    t1 = tz.localize(datetime(2016, 1, 1))
+
+    @staticmethod
+    def _master(recurrence, start='2015-10-26T10:00:00-04:00', end='2015-10-26T11:00:00-04:00'):
+        return {
+            'id': 'm',
+            'summary': 'weekly',
+            'start': {'dateTime': start, 'timeZone': 'America/New_York'},
+            'end': {'dateTime': end, 'timeZone': 'America/New_York'},
+            'recurrence': recurrence,
+        }
+
+    def test_instance_key(self):
+        self.assertEqual(instance_key({'dateTime': '2015-10-26T10:00:00-04:00'}, self.tz), '20151026T140000Z')
+        self.assertEqual(instance_key({'dateTime': '2015-10-26T10:00:00'}, self.tz), '20151026T140000Z')
+        self.assertEqual(instance_key({'date': '2015-10-26'}, self.tz), '20151026')
+
+    def test_expand(self):
+        e = RecurrenceExpander()
+
+        # the local time is kept across the end of daylight saving time (2015-11-01)
+        xs = list(e.expand(self._master(['RRULE:FREQ=WEEKLY;COUNT=3']), 'UTC', self.t0, self.t1))
+        self.assertEqual([(d['id'], d['start']['dateTime'], d['end']['dateTime']) for d in xs], [
+            ('m_20151026T140000Z', '2015-10-26T10:00:00-04:00', '2015-10-26T11:00:00-04:00'),
+            ('m_20151102T150000Z', '2015-11-02T10:00:00-05:00', '2015-11-02T11:00:00-05:00'),
+            ('m_20151109T150000Z', '2015-11-09T10:00:00-05:00', '2015-11-09T11:00:00-05:00'),
+        ])
+        self.assertEqual([(d['summary'], d['recurringEventId'], 'recurrence' in d) for d in xs],
+                         [('weekly', 'm', False)] * 3)
+
+        # only the instances overlapping the range
+        t = self.tz.localize(datetime(2015, 11, 2, 10, 30))
+        xs = list(e.expand(self._master(['RRULE:FREQ=WEEKLY;COUNT=3']), 'UTC', t, self.t1))
+        self.assertEqual([d['id'] for d in xs], ['m_20151102T150000Z', 'm_20151109T150000Z'])
+
+        # EXDATE and UNTIL in UTC
+        xs = list(e.expand(self._master(['RRULE:FREQ=WEEKLY;UNTIL=20151116T150000Z',
+                                         'EXDATE;TZID=America/New_York:20151102T100000']), 'UTC', self.t0, self.t1))
+        self.assertEqual([d['id'] for d in xs], ['m_20151026T140000Z', 'm_20151109T150000Z', 'm_20151116T150000Z'])
+
+        xs = list(e.expand(self._master(['RRULE:FREQ=WEEKLY;COUNT=3', 'EXDATE:20151026T140000Z,20151109T150000Z']),
+                           'UTC', self.t0, self.t1))
+        self.assertEqual([d['id'] for d in xs], ['m_20151102T150000Z'])
+
+    def test_expand_all_day(self):
+        master = {'id': 'a', 'start': {'date': '2015-12-30'}, 'end': {'date': '2015-12-31'},
+                  'recurrence': ['RRULE:FREQ=DAILY;UNTIL=20160102', 'EXDATE;VALUE=DATE:20151231']}
+        xs = list(RecurrenceExpander().expand(master, 'America/New_York', self.t0, self.t1))
+        self.assertEqual([(d['id'], d['start'], d['end']) for d in xs], [
+            ('a_20151230', {'date': '2015-12-30'}, {'date': '2015-12-31'}),
+        ])
+
+    def test_expand_all(self):
+        items = [
+            self._master(['RRULE:FREQ=WEEKLY;COUNT=3']),
+            # moved
+            {'id': 'm_20151102T150000Z', 'recurringEventId': 'm', 'summary': 'moved',
+             'originalStartTime': {'dateTime': '2015-11-02T10:00:00-05:00', 'timeZone': 'America/New_York'},
+             'start': {'dateTime': '2015-11-03T10:00:00-05:00'}, 'end': {'dateTime': '2015-11-03T11:00:00-05:00'}},
+            # cancelled
+            {'id': 'm_20151109T150000Z', 'recurringEventId': 'm', 'status': 'cancelled',
+             'originalStartTime': {'dateTime': '2015-11-09T15:00:00Z'}},
+            {'id': 'x', 'summary': 'single', 'start': {'date': '2015-10-27'}, 'end': {'date': '2015-10-28'}},
+            {'id': 'y', 'status': 'cancelled'},
+        ]
+        xs = RecurrenceExpander().expand_all(items, 'UTC', self.t0, self.t1)
+        self.assertEqual(sorted((d['id'], d['summary']) for d in xs),
+                         [('m_20151026T140000Z', 'weekly'), ('m_20151102T150000Z', 'moved'), ('x', 'single')])
+
+    def test_memoization(self):
+        e = RecurrenceExpander()
+        master = self._master(['RRULE:FREQ=WEEKLY;COUNT=3'])
+        list(e.expand(master, 'UTC', self.t0, self.t1))
+        list(e.expand(dict(master), 'UTC', self.t0, self.t1))
+        self.assertEqual(len(e._rules), 1)
+
+        # a new revision of the event is parsed again
+        list(e.expand(self._master(['RRULE:FREQ=WEEKLY;COUNT=2']), 'UTC', self.t0, self.t1))
+        self.assertEqual(len(e._rules), 2)
@@ -0,0 +1,20 @@
+# encoding: utf-8
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+from mog_commons import unittest
+from calendar_cli.model.text_index import tokenize, parse_query
+
+
+class TestTextIndex(unittest.TestCase):
+    def test_tokenize(self):
+        self.assertEqual(tokenize(None), set())
+        self.assertEqual(tokenize('Weekly Sync (foo-bar) foo@example.com'),
+                         set(['weekly', 'sync', 'foo', 'bar', 'example', 'com']))
+        self.assertEqual(tokenize('定例会議 Room2'), set(['定', '例', '会', '議', '定例', '例会', '会議', 'room2']))
+
+    def test_parse_query(self):
+        self.assertEqual(parse_query(['Sync', 'wee*']), [('sync', False), ('wee', True)])
+        self.assertEqual(parse_query(['会議室']), [('会議', False), ('議室', False)])
+        self.assertEqual(parse_query(['会*']), [('会', False)])
+        self.assertEqual(parse_query(['foo-bar']), [('foo', False), ('bar', False)])
+        self.assertEqual(parse_query(['*']), [])
@@ -0,0 +1,42 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+from datetime import datetime, timedelta
+import pytz
+from dateutil import parser
+from mog_commons import unittest
+from calendar_cli.model.time_parser import get_timezone, parse_date, parse_datetime
+
+
+class TestTimeParser(unittest.TestCase):
+    def test_get_timezone(self):
+        self.assertIs(get_timezone('Asia/Tokyo'), get_timezone('Asia/Tokyo'))
+        self.assertEqual(get_timezone('Asia/Tokyo'), pytz.timezone('Asia/Tokyo'))
+        self.assertRaises(pytz.UnknownTimeZoneError, get_timezone, 'Unknown/Zone')
+
+    def test_parse_date(self):
+        self.assertEqual(parse_date('2015-10-17'), datetime(2015, 10, 17))
+        self.assertEqual(parse_date('20151017'), datetime(2015, 10, 17))  # fallback
+        self.assertRaises(ValueError, parse_date, '2015-02-29')
+
+    def test_parse_datetime(self):
+        for s in [
+            '2015-10-01T10:30:00+09:00',
+            '2015-10-01T10:30:00-04:30',
+            '2015-10-01T10:30:00+00:00',
+            '2015-10-01T10:30:00Z',
+            '2015-10-01t10:30:00z',
+            '2015-10-01T10:30:00.123Z',
+            '2015-10-01T10:30:00.123456789-07:00',
+            '2015-10-01T10:30:00',
+            '2015-10-01 10:30:00+09:00',
+            '2015-10-01T10:30+09:00',  # fallback
+        ]:
+            expected = parser.parse(s)
+            actual = parse_datetime(s)
+            self.assertEqual(actual, expected, s)
+            self.assertEqual(actual.utcoffset(), expected.utcoffset(), s)
+
+        self.assertEqual(parse_datetime('2015-10-01T10:30:00-04:30').utcoffset(), -timedelta(hours=4, minutes=30))
+        self.assertIs(parse_datetime('2015-10-01T10:30:00Z').tzinfo, pytz.utc)
+        self.assertIs(parse_datetime('2015-10-01T10:30:00+00:00').tzinfo, pytz.utc)
+        self.assertRaises(ValueError, parse_datetime, '2015-10-01T25:30:00Z')
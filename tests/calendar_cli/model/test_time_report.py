@@ -0,0 +1,46 @@
+# encoding: utf-8
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+from array import array
+from datetime import date, datetime
+import pytz
+from mog_commons import unittest
+from calendar_cli.model.time_parser import to_epoch
+from calendar_cli.model.time_report import period_boundaries, aggregate
+
+
+class TestTimeReport(unittest.TestCase):
+    tz = pytz.timezone('America/New_York')
+
+    def _epoch(self, *args):
+        return to_epoch(self.tz.localize(datetime(*args)))
+
+    def test_period_boundaries(self):
+        t0, t1 = self.tz.localize(datetime(2015, 10, 30)), self.tz.localize(datetime(2015, 11, 3))
+        labels, bounds = period_boundaries(t0, t1, 'day', self.tz)
+        self.assertEqual(labels, [date(2015, 10, 30), date(2015, 10, 31), date(2015, 11, 1), date(2015, 11, 2)])
+        self.assertEqual(list(bounds), [self._epoch(2015, 10, d) for d in [30, 31]] +
+                         [self._epoch(2015, 11, d) for d in [1, 2, 3]])
+        # daylight saving time ends on 2015-11-01
+        self.assertEqual(bounds[3] - bounds[2], 25 * 3600)
+
+        labels, bounds = period_boundaries(t0, t1, 'week', self.tz)
+        self.assertEqual(labels, [date(2015, 10, 26), date(2015, 11, 2)])
+        self.assertEqual(list(bounds), [self._epoch(2015, 10, 30), self._epoch(2015, 11, 2), self._epoch(2015, 11, 3)])
+
+        t2 = self.tz.localize(datetime(2016, 1, 15))
+        labels, bounds = period_boundaries(t0, t2, 'month', self.tz)
+        self.assertEqual(labels, [date(2015, 10, 1), date(2015, 11, 1), date(2015, 12, 1), date(2016, 1, 1)])
+        self.assertEqual(bounds[-1], self._epoch(2016, 1, 15))
+
+        self.assertEqual(period_boundaries(t0, t0, 'day', self.tz), ([], array('d', [self._epoch(2015, 10, 30)])))
+
+    def test_aggregate(self):
+        bounds = array('d', [0, 10, 20, 30])
+        starts = array('d', [-5, 2, 8, 25, 35, 12])
+        ends = array('d', [3, 4, 22, 26, 40, 12])
+        groups = array('l', [0, 1, 0, 1, 0, 0])
+        seconds, counts = aggregate(bounds, starts, ends, groups, 2)
+
+        self.assertEqual([list(x) for x in seconds], [[5, 10, 2], [2, 0, 1]])
+        self.assertEqual([list(x) for x in counts], [[2, 1, 1], [1, 0, 1]])
@@ -0,0 +1,73 @@
+# encoding: utf-8
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+import io
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from tzlocal import get_localzone
+from mog_commons import unittest
+from calendar_cli.operation import BulkCreateOperation
+from calendar_cli.model import EventTime, Event
+
+
+class TestBulkCreateOperation(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    @staticmethod
+    def _localize(year, month, day, hour, minute):
+        return get_localzone().localize(datetime(year, month, day, hour, minute))
+
+    def _operation(self, file_name, content):
+        path = os.path.join(self.tmp_dir, file_name)
+        with io.open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return BulkCreateOperation('primary', path, 'dummy_path', self._localize(2015, 10, 19, 9, 30))
+
+    def test_iter_rows_csv(self):
+        op = self._operation('events.csv', '\n'.join([
+            'summary,date,start,end,location',
+            'あいう,20151020,1000,1030,Tokyo',
+            'all day,2015-10-21,,,',
+            'error,20151020,xx,,',
+            ',20151020,1000,,',
+            '',
+        ]))
+        rows = list(op._iter_rows())
+
+        self.assertEqual(rows[:2], [
+            (2, Event(EventTime(True, self._localize(2015, 10, 20, 10, 0)),
+                      EventTime(True, self._localize(2015, 10, 20, 10, 30)), 'あいう', location='Tokyo')),
+            (3, Event(EventTime(False, self._localize(2015, 10, 21, 0, 0)),
+                      EventTime(False, self._localize(2015, 10, 21, 0, 0)), 'all day')),
+        ])
+        self.assertEqual(rows[2][0], 4)
+        self.assertIsInstance(rows[2][1], ValueError)
+        self.assertEqual(rows[3][0], 5)
+        self.assertIsInstance(rows[3][1], AssertionError)
+        self.assertEqual(len(rows), 4)
+
+    def test_iter_rows_jsonl(self):
+        op = self._operation('events.jsonl', '\n'.join([
+            '{"summary": "a", "start": "10:00"}',
+            '',
+            '{"summary": "b", "start": {"date": "2015-10-20"}, "end": {"date": "2015-10-21"}}',
+            '{bad json',
+            '{"summary": "c", "start": "11:00"}',
+        ]))
+        rows = list(op._iter_rows())
+
+        self.assertEqual([r[0] for r in rows], [1, 3, 4, 5])
+        self.assertEqual(rows[0][1], Event(EventTime(True, self._localize(2015, 10, 19, 10, 0)),
+                                           EventTime(True, self._localize(2015, 10, 19, 10, 15)), 'a'))
+        self.assertEqual(rows[1][1].summary, 'b')
+        self.assertEqual(rows[1][1].start_time, EventTime(False, self._localize(2015, 10, 20, 0, 0)))
+
+        # a malformed line fails only that row
+        self.assertIsInstance(rows[2][1], ValueError)
+        self.assertEqual(rows[3][1].summary, 'c')
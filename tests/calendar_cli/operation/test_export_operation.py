@@ -0,0 +1,87 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+import io
+import os
+import json
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+import pytz
+from mog_commons import unittest
+from calendar_cli.operation import ExportOperation
+
+
+class _FakeService(object):
+    def __init__(self, fail_at=None):
+        self.fail_at = fail_at
+        self.requests = []
+
+    def list_calendar_ids(self):
+        return ['a', 'b']
+
+    def iter_event_pages(self, calendar_id, time_min, time_max, page_size=None, page_token=None):
+        tokens = [None, 'p2', 'p3']
+        for i in range(tokens.index(page_token), len(tokens)):
+            self.requests.append((calendar_id, tokens[i]))
+            if (calendar_id, tokens[i]) == self.fail_at:
+                raise IOError('connection reset')
+            items = [{'id': '%s%d' % (calendar_id, i), 'summary': 'event %s%d' % (calendar_id, i),
+                      'start': {'date': '2015-10-17'}, 'end': {'date': '2015-10-18'}}]
+            yield 'UTC', items, tokens[i + 1] if i + 1 < len(tokens) else None
+
+
+class TestExportOperation(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _operation(self, name, export_format=None):
+        return ExportOperation('all', datetime(2015, 10, 1, tzinfo=pytz.utc), timedelta(days=365), 'path',
+                               os.path.join(self.tmp_dir, name), export_format)
+
+    def test_init(self):
+        self.assertEqual(self._operation('out.jsonl').export_format, 'jsonl')
+        self.assertEqual(self._operation('out.ics').export_format, 'ics')
+        self.assertEqual(self._operation('out.txt', 'jsonl').export_format, 'jsonl')
+        self.assertRaisesRegexp(AssertionError, 'Unknown export format: xml', self._operation, 'out.xml', 'xml')
+
+    def test_write_file(self):
+        op = self._operation('out.jsonl')
+        self.assertEqual(op._write_file(_FakeService()), 6)
+        with io.open(op.output_path, encoding='utf-8') as f:
+            self.assertEqual([json.loads(line)['id'] for line in f], ['a0', 'a1', 'a2', 'b0', 'b1', 'b2'])
+        self.assertFalse(os.path.exists(op.output_path + '.checkpoint'))
+
+    def test_write_file_resume(self):
+        op = self._operation('out.ics')
+        service = _FakeService(fail_at=('b', 'p2'))
+        self.assertRaises(IOError, op._write_file, service)
+        with io.open(op.output_path + '.checkpoint', encoding='utf-8') as f:
+            state = json.load(f)
+        self.assertEqual((state['calendar_index'], state['page_token'], state['count']), (1, 'p2', 4))
+
+        # garbage after the checkpoint is discarded
+        with io.open(op.output_path, 'ab') as f:
+            f.write(b'BEGIN:VEVENT\r\nUID:partial')
+
+        service = _FakeService()
+        self.assertEqual(op._write_file(service), 6)
+        self.assertEqual(service.requests, [('b', 'p2'), ('b', 'p3')])
+
+        with io.open(op.output_path, 'rb') as f:
+            lines = f.read().decode('utf-8').split('\r\n')
+        self.assertEqual([x[4:] for x in lines if x.startswith('UID:')], ['a0', 'a1', 'a2', 'b0', 'b1', 'b2'])
+        self.assertEqual((lines[0], lines[-2:]), ('BEGIN:VCALENDAR', ['END:VCALENDAR', '']))
+        self.assertFalse(os.path.exists(op.output_path + '.checkpoint'))
+
+    def test_write_file_restart(self):
+        op = self._operation('out.jsonl')
+        self.assertRaises(IOError, op._write_file, _FakeService(fail_at=('a', 'p2')))
+
+        # a checkpoint of a different range is not used
+        op2 = op.copy(duration=timedelta(days=30))
+        service = _FakeService()
+        self.assertEqual(op2._write_file(service), 6)
+        self.assertEqual(service.requests[0], ('a', None))
@@ -0,0 +1,43 @@
+# encoding: utf-8
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+from datetime import datetime, timedelta, time
+from tzlocal import get_localzone
+from mog_commons import unittest
+from calendar_cli.operation import FreeOperation
+
+
+class TestFreeOperation(unittest.TestCase):
+    @staticmethod
+    def _localize(*args):
+        return get_localzone().localize(datetime(*args))
+
+    def _operation(self, days, **kwargs):
+        return FreeOperation('primary', self._localize(2015, 10, 16, 0, 0), timedelta(days=days), 'path',
+                             time(9), time(18), kwargs.get('min_length', timedelta(minutes=30)),
+                             kwargs.get('weekends', False))
+
+    def test_find_free(self):
+        t = self._localize
+        busy = [
+            (t(2015, 10, 16, 8, 0), t(2015, 10, 16, 10, 0)),
+            (t(2015, 10, 16, 9, 30), t(2015, 10, 16, 11, 0)),
+            (t(2015, 10, 16, 11, 20), t(2015, 10, 16, 12, 0)),
+            (t(2015, 10, 16, 13, 0), t(2015, 10, 17, 10, 0)),
+            (t(2015, 10, 19, 17, 45), t(2015, 10, 19, 19, 0)),
+        ]
+
+        # 2015-10-16 is Friday
+        self.assertEqual(list(self._operation(4)._find_free(busy)), [
+            (t(2015, 10, 16, 12, 0), t(2015, 10, 16, 13, 0)),
+            (t(2015, 10, 19, 9, 0), t(2015, 10, 19, 17, 45)),
+        ])
+        self.assertEqual(list(self._operation(2, min_length=timedelta(minutes=20), weekends=True)._find_free(busy)), [
+            (t(2015, 10, 16, 11, 0), t(2015, 10, 16, 11, 20)),
+            (t(2015, 10, 16, 12, 0), t(2015, 10, 16, 13, 0)),
+            (t(2015, 10, 17, 10, 0), t(2015, 10, 17, 18, 0)),
+        ])
+
+    def test_format_slot(self):
+        s = FreeOperation._format_slot(self._localize(2015, 10, 16, 12, 0), self._localize(2015, 10, 16, 13, 30))
+        self.assertEqual(s, '2015-10-16 Fri [12:00-13:30] 1:30')
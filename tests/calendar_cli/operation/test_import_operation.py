@@ -0,0 +1,142 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+import io
+import os
+import shutil
+import tempfile
+import httplib2
+from apiclient.errors import HttpError
+from mog_commons import unittest
+from calendar_cli.operation import ImportOperation
+from calendar_cli.model import ical
+
+ICS = """BEGIN:VCALENDAR
+BEGIN:VEVENT
+UID:a
+DTSTART:20151017T010000Z
+DTEND:20151017T020000Z
+SUMMARY:weekly
+RRULE:FREQ=WEEKLY;COUNT=3
+END:VEVENT
+BEGIN:VEVENT
+UID:b
+DTSTART;VALUE=DATE:20151018
+SUMMARY:existing
+END:VEVENT
+BEGIN:VEVENT
+SUMMARY:broken
+END:VEVENT
+BEGIN:VEVENT
+UID:a
+RECURRENCE-ID:20151024T010000Z
+DTSTART:20151024T030000Z
+DTEND:20151024T040000Z
+SUMMARY:moved
+END:VEVENT
+BEGIN:VEVENT
+UID:a
+RECURRENCE-ID:20151031T010000Z
+DTSTART:20151031T010000Z
+STATUS:CANCELLED
+END:VEVENT
+BEGIN:VEVENT
+UID:c
+DTSTART;VALUE=DATE:20151019
+STATUS:CANCELLED
+END:VEVENT
+BEGIN:VEVENT
+UID:d
+RECURRENCE-ID:20151020T010000Z
+DTSTART:20151020T020000Z
+DTEND:20151020T030000Z
+SUMMARY:override only
+END:VEVENT
+BEGIN:VEVENT
+UID:d
+RECURRENCE-ID:20151027T010000Z
+DTSTART:20151027T010000Z
+STATUS:CANCELLED
+END:VEVENT
+END:VCALENDAR
+"""
+
+
+class _FakeService(object):
+    def __init__(self):
+        self.inserted = []
+        self.updated = []
+
+    def insert_events(self, calendar_id, events, batch_size=50, max_workers=1):
+        for ev in events:
+            self.inserted.append(ev)
+            if ev.summary == 'existing':
+                yield ev, None, HttpError(httplib2.Response({'status': 409}), b'Conflict')
+            else:
+                yield ev, ev.event_id, None
+
+    def update_events(self, calendar_id, updates, batch_size=50):
+        for event_id, ev in updates:
+            self.updated.append((event_id, ev))
+            yield event_id, ev, HttpError(httplib2.Response({'status': 410}), b'Gone') if ev is None else None
+
+
+class _ImportOperation(ImportOperation):
+    errors = []
+
+    def _report_error(self, line_num, e):
+        self.errors.append((line_num, str(e)))
+
+
+class TestImportOperation(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'events.ics')
+        with io.open(self.path, 'w', encoding='utf-8') as f:
+            f.write(ICS)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_init_error(self):
+        self.assertRaisesRegexp(AssertionError, 'max_workers must be positive: 0',
+                                ImportOperation, 'primary', self.path, 'path', 'UTC', max_workers=0)
+
+    def test_import(self):
+        service = _FakeService()
+        op = _ImportOperation('primary', self.path, 'path', 'UTC')
+        op.errors[:] = []
+
+        # 1 created, 1 existing, 1 parse error, 1 modified and 1 cancelled instance, and 2 instances without
+        # the recurring event
+        self.assertEqual(op._import(service), (5, 1, 7))
+        self.assertEqual(op.errors, [(14, 'DTSTART is missing')])
+
+        self.assertEqual([(ev.summary, ev.event_id) for ev in service.inserted], [
+            ('weekly', ical.event_id('a')),
+            ('existing', ical.event_id('b')),
+            ('override only', ical.event_id(ical.event_id('d') + '_20151020T010000Z')),
+        ])
+        self.assertEqual(service.inserted[0].recurrence, ['RRULE:FREQ=WEEKLY;COUNT=3'])
+
+        self.assertEqual([(event_id, ev and ev.summary) for event_id, ev in service.updated], [
+            (ical.event_id('a') + '_20151024T010000Z', 'moved'),
+            (ical.event_id('a') + '_20151031T010000Z', None),
+        ])
+        self.assertEqual(service.updated[0][1].event_id, None)
+
+    def test_import_exported_instance(self):
+        # an instance of a recurring event exported by the export command
+        d = {'id': 'm_20151017T010000Z', 'iCalUID': 'm@google.com', 'recurringEventId': 'm', 'summary': 'weekly',
+             'originalStartTime': {'dateTime': '2015-10-17T01:00:00Z'},
+             'start': {'dateTime': '2015-10-17T01:00:00Z'}, 'end': {'dateTime': '2015-10-17T02:00:00Z'}}
+        with io.open(self.path, 'w', encoding='utf-8') as f:
+            f.write(ical.header() + ical.format_event(d, 'UTC') + ical.footer())
+
+        service = _FakeService()
+        op = _ImportOperation('primary', self.path, 'path', 'UTC')
+        op.errors[:] = []
+        self.assertEqual(op._import(service), (1, 0, 1))
+        self.assertEqual(op.errors, [])
+        self.assertEqual([(ev.summary, ev.event_id) for ev in service.inserted],
+                         [('weekly', ical.event_id('m_20151017T010000Z'))])
+        self.assertEqual(service.updated, [])
@@ -0,0 +1,60 @@
+# encoding: utf-8
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+import json
+from datetime import datetime, timedelta, date
+from tzlocal import get_localzone
+from mog_commons import unittest
+from calendar_cli.operation import ReportOperation
+from calendar_cli.model.time_parser import to_epoch
+
+
+class TestReportOperation(unittest.TestCase):
+    def _operation(self, period='day', group_by='calendar', keywords=None, report_format='csv'):
+        return ReportOperation('a,b', get_localzone().localize(datetime(2015, 10, 16)), timedelta(days=3), 'path',
+                               period, group_by, keywords or [], report_format)
+
+    def _intervals(self):
+        t0 = get_localzone().localize(datetime(2015, 10, 16))
+
+        def t(hours):
+            return to_epoch(t0 + timedelta(hours=hours))
+
+        return [
+            ('a', (t(9), t(10), False, 'Project X: design')),
+            ('a', (t(0), t(24), True, 'Holiday')),
+            ('b', (t(23), t(25), False, 'project x review')),
+            ('b', (t(33), t(34), False, 'Lunch, "team"')),
+        ]
+
+    def test_make_rows(self):
+        rows = list(self._operation()._make_rows(self._intervals()))
+        self.assertEqual(rows, [
+            (date(2015, 10, 16), 'a', 1.0, 1),
+            (date(2015, 10, 16), 'b', 1.0, 1),
+            (date(2015, 10, 17), 'b', 2.0, 2),
+        ])
+
+        rows = list(self._operation('week', 'keyword', ['Project X'])._make_rows(self._intervals()))
+        self.assertEqual(rows, [
+            (date(2015, 10, 12), '(other)', 1.0, 1),
+            (date(2015, 10, 12), 'Project X', 3.0, 2),
+        ])
+
+        rows = list(self._operation('month', 'keyword')._make_rows(self._intervals()))
+        self.assertEqual([r[1] for r in rows], ['Lunch, "team"', 'Project X: design', 'project x review'])
+
+    def test_iter_output(self):
+        op = self._operation('week', 'keyword')
+        self.assertEqual(list(op._iter_output(op._make_rows(self._intervals()))), [
+            'period,group,hours,events',
+            '2015-10-12,"Lunch, ""team""",1.00,1',
+            '2015-10-12,Project X: design,1.00,1',
+            '2015-10-12,project x review,2.00,1',
+        ])
+
+        op = self._operation('week', report_format='json')
+        self.assertEqual(json.loads('\n'.join(op._iter_output(op._make_rows(self._intervals())))), [
+            {'period': '2015-10-12', 'group': 'a', 'hours': 1.0, 'events': 1},
+            {'period': '2015-10-12', 'group': 'b', 'hours': 3.0, 'events': 2},
+        ])
@@ -1,11 +1,13 @@
 from __future__ import division, print_function, absolute_import, unicode_literals
 
+import io
 from datetime import datetime, timedelta
 import pytz
 from mog_commons import unittest
 from calendar_cli.operation import SummaryOperation
 from calendar_cli.model import EventTime, Event
-from calendar_cli.i18n import MSG_ALL_DAY, MSG_WEEK_DAY
+from calendar_cli.i18n import MSG_ALL_DAY, MSG_WEEK_DAY, MSG_CONFLICT
+from calendar_cli.util.output_writer import OutputWriter
 
 
 class TestSummaryOperation(unittest.TestCase):
@@ -61,3 +63,58 @@ class TestSummaryOperation(unittest.TestCase):
             '2015-10-18 %s [12:15-12:45] event 3' % MSG_WEEK_DAY[6],
         ]))
         self.assertEqual(so3._make_output([]), '')
+
+    def test_make_output_sorts_each_date(self):
+        so = SummaryOperation('primary', datetime(2015, 10, 17, 0, 0, 0, 0, pytz.utc),
+                              timedelta(days=3), 'dummy_path', '%D [%T] %S', None)
+
+        et1 = EventTime(False, datetime(2015, 10, 17, 0, 0, 0, 0, pytz.utc))
+        et2 = EventTime(False, datetime(2015, 10, 18, 0, 0, 0, 0, pytz.utc))
+        et3 = EventTime(True, datetime(2015, 10, 17, 9, 0, 0, 0, pytz.utc))
+        et4 = EventTime(True, datetime(2015, 10, 17, 10, 0, 0, 0, pytz.utc))
+
+        ev1 = Event(et3, et4, 'event 1', None, None)
+        ev2 = Event(et1, et2, 'event 2', None, None)
+
+        # events in the API order (by start time) are sorted in each date
+        self.assertEqual(so._make_output([ev1, ev2]), '\n'.join([
+            '2015-10-17 %s [%s] event 2' % (MSG_WEEK_DAY[5], MSG_ALL_DAY),
+            '2015-10-17 %s [09:00-10:00] event 1' % MSG_WEEK_DAY[5],
+        ]))
+
+    def test_make_output_conflicts(self):
+        def ev(start, end, summary):
+            return Event(EventTime(True, datetime(2015, 10, 17, start, 0, 0, 0, pytz.utc)),
+                         EventTime(True, datetime(2015, 10, 17, end, 0, 0, 0, pytz.utc)), summary)
+
+        events = [ev(9, 10, 'a'), ev(9, 11, 'b'), ev(12, 13, 'c')]
+        so = SummaryOperation('primary', datetime(2015, 10, 17, 0, 0, 0, 0, pytz.utc),
+                              timedelta(days=1), 'dummy_path', '[%T] %S%X', None)
+        self.assertEqual(so._make_output(events), '\n'.join([
+            '[09:00-10:00] a%s' % MSG_CONFLICT,
+            '[09:00-11:00] b%s' % MSG_CONFLICT,
+            '[12:00-13:00] c',
+        ]))
+
+        so = SummaryOperation('primary', datetime(2015, 10, 17, 0, 0, 0, 0, pytz.utc),
+                              timedelta(days=1), 'dummy_path', '[%T] %S', None, conflicts_only=True)
+        self.assertEqual(so._make_output(events), '[09:00-10:00] a\n[09:00-11:00] b')
+
+    def test_write_output(self):
+        so = SummaryOperation('primary', datetime(2015, 10, 17, 0, 0, 0, 0, pytz.utc),
+                              timedelta(days=3), 'dummy_path', '%S', '--')
+
+        def events():
+            for day in [17, 17, 18]:
+                t = EventTime(False, datetime(2015, 10, day, 0, 0, 0, 0, pytz.utc))
+                yield Event(t, t, 'event %d' % day)
+
+        out = io.BytesIO()
+        with OutputWriter(out) as w:
+            so._write_output(events(), w)
+        self.assertEqual(out.getvalue(), b'event 17\nevent 17\n--\nevent 18\n')
+
+        out = io.BytesIO()
+        with OutputWriter(out) as w:
+            so._write_output([], w)
+        self.assertEqual(out.getvalue(), b'\n')
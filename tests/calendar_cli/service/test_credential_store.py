@@ -0,0 +1,100 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+import os
+import json
+import time
+import shutil
+import tempfile
+import threading
+from datetime import datetime, timedelta
+import httplib2
+import oauth2client.client
+from mog_commons import unittest
+from calendar_cli.service import credential_store
+from calendar_cli.service.credential_store import CredentialStore
+
+
+class _FakeHttp(object):
+    """Token endpoint issuing a new access token for each request"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def request(self, uri, method='GET', body=None, headers=None, **kwargs):
+        with self._lock:
+            self.count += 1
+            token = 'token-%d' % self.count
+        time.sleep(self.delay)
+        return httplib2.Response({'status': 200}), json.dumps({'access_token': token, 'expires_in': 3600}).encode()
+
+
+class _CountingLock(object):
+    def __init__(self):
+        self.count = 0
+
+    def acquire(self):
+        self.count += 1
+
+    def release(self):
+        pass
+
+
+class TestCredentialStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'credentials', 'calendar-cli.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _put(self, expires_in):
+        credentials = oauth2client.client.OAuth2Credentials(
+            'token-0', 'client-id', 'client-secret', 'refresh-token',
+            datetime.utcnow() + timedelta(seconds=expires_in), 'https://oauth2.example.com/token', 'calendar-cli')
+        CredentialStore(self.path).put(credentials)
+
+    def test_put_get(self):
+        self.assertEqual(CredentialStore(self.path).get(), None)
+
+        self._put(3600)
+        self.assertEqual(CredentialStore(self.path).get().access_token, 'token-0')
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+        self.assertEqual(sorted(os.listdir(os.path.dirname(self.path))),
+                         ['calendar-cli.json', 'calendar-cli.json.lock'])
+
+    def test_get_fresh(self):
+        self._put(3600)
+        http = _FakeHttp()
+        store = CredentialStore(self.path)
+        store._lock = _CountingLock()
+        self.assertEqual(store.get_fresh(http).access_token, 'token-0')
+        self.assertEqual((http.count, store._lock.count), (0, 0))  # the lock is not taken for a valid token
+
+        # refreshed in advance and saved
+        self._put(60)
+        self.assertEqual(CredentialStore(self.path).get_fresh(http).access_token, 'token-1')
+        self.assertEqual(CredentialStore(self.path).get().access_token, 'token-1')
+        self.assertEqual(http.count, 1)
+
+    def test_get_fresh_single_flight(self):
+        if credential_store.fcntl is None:
+            return  # only threads are serialized without flock
+
+        self._put(60)
+        http = _FakeHttp(delay=0.1)
+        tokens = []
+
+        # each store opens its own lock file like separate processes
+        def f():
+            tokens.append(CredentialStore(self.path).get_fresh(http).access_token)
+
+        threads = [threading.Thread(target=f) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(http.count, 1)
+        self.assertEqual(tokens, ['token-1'] * 8)
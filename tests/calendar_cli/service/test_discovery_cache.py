@@ -0,0 +1,67 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+import shutil
+import socket
+import tempfile
+import httplib2
+from mog_commons import unittest
+from calendar_cli.service.discovery_cache import DiscoveryCache
+
+
+class _FakeHttp(object):
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def request(self, uri, headers=None):
+        self.requests.append((uri, headers))
+        r = self.responses.pop(0)
+        if isinstance(r, Exception):
+            raise r
+        status, etag, body = r
+        return httplib2.Response({'status': status, 'etag': etag}), body
+
+
+class TestDiscoveryCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_get(self):
+        c = DiscoveryCache(self.tmp_dir, ttl=100)
+
+        # fetch and store
+        http = _FakeHttp((200, '"v1"', b'{"doc": 1}'))
+        self.assertEqual(c.get('calendar', 'v3', http, now=1000), '{"doc": 1}')
+        self.assertEqual(http.requests, [('https://www.googleapis.com/discovery/v1/apis/calendar/v3/rest', {})])
+
+        # fresh cache
+        http = _FakeHttp()
+        self.assertEqual(c.get('calendar', 'v3', http, now=1099), '{"doc": 1}')
+        self.assertEqual(http.requests, [])
+
+        # revalidate
+        http = _FakeHttp((304, '"v1"', b''))
+        self.assertEqual(c.get('calendar', 'v3', http, now=1100), '{"doc": 1}')
+        self.assertEqual(http.requests[0][1], {'if-none-match': '"v1"'})
+        self.assertEqual(c.get('calendar', 'v3', _FakeHttp(), now=1199), '{"doc": 1}')
+
+        # updated
+        http = _FakeHttp((200, '"v2"', b'{"doc": 2}'))
+        self.assertEqual(c.get('calendar', 'v3', http, now=1200), '{"doc": 2}')
+
+        # use the stale document if the endpoint is not available
+        self.assertEqual(c.get('calendar', 'v3', _FakeHttp(socket.timeout()), now=2000), '{"doc": 2}')
+        self.assertEqual(c.get('calendar', 'v3', _FakeHttp((503, None, b'')), now=2000), '{"doc": 2}')
+
+    def test_new_http(self):
+        self.assertEqual(DiscoveryCache(self.tmp_dir).new_http().timeout, DiscoveryCache.DEFAULT_TIMEOUT)
+        self.assertEqual(DiscoveryCache(self.tmp_dir, timeout=1).new_http().timeout, 1)
+
+    def test_get_error(self):
+        c = DiscoveryCache(self.tmp_dir)
+        c._get_static_doc = lambda api, version: None
+        self.assertRaisesRegexp(AssertionError, 'Failed to fetch the discovery document: calendar v3',
+                                c.get, 'calendar', 'v3', _FakeHttp(socket.timeout()))
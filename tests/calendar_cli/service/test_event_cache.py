@@ -0,0 +1,137 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+import os
+import shutil
+import tempfile
+from datetime import datetime
+import pytz
+from mog_commons import unittest
+from calendar_cli.service import EventCache
+
+
+class TestEventCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'cache', 'events.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    @staticmethod
+    def _item(event_id, start, end, summary='x', status='confirmed'):
+        return {'id': event_id, 'status': status, 'summary': summary,
+                'start': {'dateTime': start}, 'end': {'dateTime': end}}
+
+    def test_iter_events(self):
+        c = EventCache(self.path)
+        c.apply_page('primary', [
+            self._item('a', '2015-10-17T09:00:00Z', '2015-10-17T10:00:00Z', 'a'),
+            self._item('b', '2015-10-16T23:00:00Z', '2015-10-17T01:00:00Z', 'b'),
+            self._item('c', '2015-10-18T09:00:00Z', '2015-10-18T10:00:00Z', 'c'),
+            self._item('d', '2015-10-16T09:00:00Z', '2015-10-16T10:00:00Z', 'd'),
+        ], 'UTC')
+        c.apply_page('other', [self._item('e', '2015-10-17T09:00:00Z', '2015-10-17T10:00:00Z', 'e')], 'UTC')
+        c.finish_sync('primary', 'UTC', 'token', 12345.0)
+
+        t0 = datetime(2015, 10, 17, 0, 0, 0, 0, pytz.utc)
+        t1 = datetime(2015, 10, 18, 0, 0, 0, 0, pytz.utc)
+        self.assertEqual([e.summary for e in c.iter_events('primary', t0, t1)], ['b', 'a'])
+        self.assertEqual(c.get_sync_state('primary'), ('UTC', 'token', 12345.0))
+        self.assertEqual(c.get_sync_state('other'), None)
+        self.assertEqual(c.list_calendar_ids(), ['primary'])
+
+        # delete and update events
+        c.apply_page('primary', [
+            self._item('a', '2015-10-17T09:00:00Z', '2015-10-17T10:00:00Z', 'a', 'cancelled'),
+            self._item('c', '2015-10-17T11:00:00Z', '2015-10-17T12:00:00Z', 'c2'),
+        ], 'UTC')
+        self.assertEqual([e.summary for e in c.iter_events('primary', t0, t1)], ['b', 'c2'])
+
+        # persistent
+        c = EventCache(self.path)
+        self.assertEqual([e.summary for e in c.iter_events('primary', t0, t1)], ['b', 'c2'])
+
+        c.clear('primary')
+        self.assertEqual(c.get_sync_state('primary'), None)
+        self.assertRaisesRegexp(AssertionError, 'Calendar has not been cached: primary',
+                                list, c.iter_events('primary', t0, t1))
+
+    def test_iter_intervals(self):
+        c = EventCache(self.path)
+        c.apply_page('primary', [
+            self._item('a', '2015-10-17T09:00:00Z', '2015-10-17T10:00:00Z', 'a'),
+            {'id': 'b', 'status': 'confirmed', 'summary': 'b', 'start': {'date': '2015-10-17'},
+             'end': {'date': '2015-10-18'}},
+        ], 'UTC')
+        c.finish_sync('primary', 'UTC', 'token')
+
+        t0 = datetime(2015, 10, 17, 0, 0, 0, 0, pytz.utc)
+        t1 = datetime(2015, 10, 18, 0, 0, 0, 0, pytz.utc)
+        self.assertEqual(list(c.iter_intervals('primary', t0, t1)), [
+            (1445040000, 1445126400, True, 'b'),
+            (1445072400, 1445076000, False, 'a'),
+        ])
+
+    def test_search(self):
+        c = EventCache(self.path)
+        c.apply_page('primary', [
+            self._item('a', '2015-10-17T09:00:00Z', '2015-10-17T10:00:00Z', 'Weekly sync'),
+            self._item('b', '2015-10-18T09:00:00Z', '2015-10-18T10:00:00Z', 'Weekend trip'),
+            self._item('c', '2015-10-19T09:00:00Z', '2015-10-19T10:00:00Z', '定例会議'),
+            dict(self._item('d', '2015-10-16T09:00:00Z', '2015-10-16T10:00:00Z', 'Lunch'),
+                 location='Sync Cafe', creator={'email': 'bob@example.com'}),
+        ], 'UTC')
+        c.apply_page('other', [self._item('e', '2015-10-17T09:00:00Z', '2015-10-17T10:00:00Z', 'sync')], 'UTC')
+        c.finish_sync('primary', 'UTC', 'token')
+        c.finish_sync('other', 'UTC', 'token')
+
+        def search(terms, *args):
+            return [(e.calendar_id, e.summary) for e in c.search(terms, *args)]
+
+        self.assertEqual(search([('sync', False)]),
+                         [('primary', 'Lunch'), ('primary', 'Weekly sync'), ('other', 'sync')])
+        self.assertEqual(search([('sync', False)], ['primary']), [('primary', 'Lunch'), ('primary', 'Weekly sync')])
+        self.assertEqual(search([('wee', True)]), [('primary', 'Weekly sync'), ('primary', 'Weekend trip')])
+        self.assertEqual(search([('wee', True), ('sync', False)]), [('primary', 'Weekly sync')])
+        self.assertEqual(search([('bob', False)]), [('primary', 'Lunch')])
+        self.assertEqual(search([('会議', False)]), [('primary', '定例会議')])
+        self.assertEqual(search([('xyz', False)]), [])
+
+        t0 = datetime(2015, 10, 17, 0, 0, 0, 0, pytz.utc)
+        t1 = datetime(2015, 10, 18, 0, 0, 0, 0, pytz.utc)
+        self.assertEqual(search([('sync', False)], None, t0, t1), [('primary', 'Weekly sync'), ('other', 'sync')])
+
+        # the index follows updates and deletions
+        c.apply_page('primary', [
+            self._item('a', '2015-10-17T09:00:00Z', '2015-10-17T10:00:00Z', 'Weekly meeting'),
+            self._item('d', '2015-10-16T09:00:00Z', '2015-10-16T10:00:00Z', 'Lunch', 'cancelled'),
+        ], 'UTC')
+        self.assertEqual(search([('sync', False)]), [('other', 'sync')])
+        self.assertEqual(search([('meeting', False)]), [('primary', 'Weekly meeting')])
+
+        c.clear('other')
+        self.assertEqual(search([('sync', False)]), [])
+
+    def test_iter_events_long_event(self):
+        c = EventCache(self.path)
+        c.apply_page('primary', [
+            self._item('a', '2015-10-01T09:00:00Z', '2015-10-20T10:00:00Z', 'a'),
+            self._item('b', '2015-10-01T09:00:00Z', '2015-10-01T10:00:00Z', 'b'),
+        ], 'UTC')
+        c.apply_page('primary', [self._item('c', '2015-10-17T09:00:00Z', '2015-10-17T10:00:00Z', 'c')], 'UTC')
+        c.finish_sync('primary', 'UTC', 'token')
+
+        t0 = datetime(2015, 10, 17, 0, 0, 0, 0, pytz.utc)
+        t1 = datetime(2015, 10, 18, 0, 0, 0, 0, pytz.utc)
+        self.assertEqual([e.summary for e in c.iter_events('primary', t0, t1)], ['a', 'c'])
+
+    def test_is_fresh(self):
+        c = EventCache(self.path)
+        self.assertFalse(c.is_fresh('primary', 60, 10000.0))
+
+        c.apply_page('primary', [], 'UTC')
+        self.assertFalse(c.is_fresh('primary', 60, 10000.0))
+
+        c.finish_sync('primary', 'UTC', 'token', 9900.0)
+        self.assertFalse(c.is_fresh('primary', 60, 10000.0))
+        self.assertTrue(c.is_fresh('primary', 100, 10000.0))
@@ -0,0 +1,458 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+import os
+import shutil
+import tempfile
+import time
+import threading
+from datetime import datetime, timedelta
+import pytz
+import httplib2
+from apiclient.errors import HttpError
+from mog_commons import unittest
+from calendar_cli.service import GoogleCalendarService, EventCache, ResponseCache, Retry
+from calendar_cli.service import google_calendar_service
+from calendar_cli.service.google_calendar_service import SYNC_FIELDS
+from calendar_cli.model.recurrence import RecurrenceExpander
+
+
+class _FakeRequest(object):
+    def __init__(self, result, params=None):
+        self.result = result
+        self.uri = 'https://example.com/?' + '&'.join('%s=%s' % x for x in sorted((params or {}).items()))
+        self.headers = {}
+
+    def execute(self, http=None):
+        if isinstance(self.result, Exception):
+            raise self.result
+        if 'If-None-Match' in self.headers and self.headers['If-None-Match'] == self.result.get('etag'):
+            raise HttpError(httplib2.Response({'status': 304}), b'')
+        return self.result
+
+
+class _FakeEvents(object):
+    def __init__(self, pages):
+        self.pages = pages
+        self.requests = []
+
+    def list(self, **params):
+        self.requests.append(params)
+        return _FakeRequest(self.pages[params.get('syncToken'), params.get('pageToken')], params)
+
+    def insert(self, calendarId, body):
+        return _FakeRequest(body)
+
+    def update(self, calendarId, eventId, body):
+        return _FakeRequest(dict(body, id=eventId))
+
+    def delete(self, calendarId, eventId):
+        return _FakeRequest({'id': eventId, 'summary': 'deleted'})
+
+
+class _FakeCalendarList(object):
+    def list(self, **params):
+        pages = {
+            None: {'items': [{'id': 'a'}, {'id': 'b'}], 'nextPageToken': 'p2'},
+            'p2': {'items': [{'id': 'c'}]},
+        }
+        return _FakeRequest(pages[params.get('pageToken')])
+
+
+class _FakeBatch(object):
+    def __init__(self, callback):
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self, http=None):
+        for request_id, request in self.requests:
+            summary = request.result['summary']
+            if summary == 'error':
+                self.callback(request_id, None, ValueError('error'))
+            elif summary.startswith('flaky') and len(_FakeBatch.flaky) < 2:
+                # fails twice with a server error
+                _FakeBatch.flaky.append(summary)
+                self.callback(request_id, None, HttpError(httplib2.Response({'status': 503}), b''))
+            else:
+                self.callback(request_id, {'id': 'id-' + summary}, None)
+
+    flaky = []
+
+
+class _FakeFreeBusy(object):
+    def __init__(self):
+        self.requests = []
+
+    def query(self, body):
+        self.requests.append(body)
+        calendars = {}
+        for item in body['items']:
+            if item['id'] == 'error':
+                calendars['error'] = {'errors': [{'reason': 'notFound'}]}
+            else:
+                calendars[item['id']] = {'busy': [{'start': body['timeMin'], 'end': body['timeMin']}]}
+        return _FakeRequest({'calendars': calendars})
+
+
+class _FakeService(object):
+    def __init__(self, pages):
+        self._events = _FakeEvents(pages)
+        self._freebusy = _FakeFreeBusy()
+        self.batches = []
+
+    def new_batch_http_request(self, callback):
+        self.batches.append(_FakeBatch(callback))
+        return self.batches[-1]
+
+    def events(self):
+        return self._events
+
+    def calendarList(self):
+        return _FakeCalendarList()
+
+    def freebusy(self):
+        return self._freebusy
+
+
+class _FakeCredentials(object):
+    def authorize(self, http):
+        return http
+
+
+class TestGoogleCalendarService(unittest.TestCase):
+    t0 = datetime(2015, 10, 17, 0, 0, 0, 0, pytz.utc)
+    t1 = datetime(2015, 10, 20, 0, 0, 0, 0, pytz.utc)
+
+    @staticmethod
+    def _item(day, summary, status=None):
+        return {
+            'id': 'ev%d' % day,
+            'status': status or 'confirmed',
+            'summary': summary,
+            'start': {'date': '2015-10-%02d' % day},
+            'end': {'date': '2015-10-%02d' % (day + 1)},
+        }
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _service(self, pages, cache=False):
+        s = GoogleCalendarService.__new__(GoogleCalendarService)
+        s._service = _FakeService(pages)
+        s._credentials = _FakeCredentials()
+        s._local = threading.local()
+        s._retry = Retry(sleep=lambda x: None)
+        s._expander = RecurrenceExpander()
+        s._cache = EventCache(os.path.join(self.tmp_dir, 'events.sqlite')) if cache else None
+        s._responses = None
+        return s
+
+    def test_iter_events_follows_page_token(self):
+        s = self._service({
+            (None, None): {'timeZone': 'UTC', 'items': [self._item(17, 'a'), self._item(18, 'b')],
+                           'nextPageToken': 'p2'},
+            (None, 'p2'): {'timeZone': 'UTC', 'items': [self._item(19, 'c')], 'nextPageToken': 'p3'},
+            (None, 'p3'): {'timeZone': 'UTC'},
+        })
+        it = s.iter_events('primary', self.t0, self.t1, 2)
+
+        # the second page is not requested until the first page is consumed
+        self.assertEqual(next(it).summary, 'a')
+        self.assertEqual(len(s._service.events().requests), 1)
+
+        self.assertEqual([e.summary for e in it], ['b', 'c'])
+        requests = s._service.events().requests
+        self.assertEqual([r.get('pageToken') for r in requests], [None, 'p2', 'p3'])
+        self.assertEqual(set(r['maxResults'] for r in requests), set([2]))
+        self.assertFalse(any('fields' in r for r in requests))
+
+    def test_iter_events_fields(self):
+        s = self._service({(None, None): {'timeZone': 'UTC', 'items': [self._item(17, 'a')]}})
+        self.assertEqual([e.summary for e in s.iter_events('primary', self.t0, self.t1, fields=['start', 'end'])],
+                         ['a'])
+        self.assertEqual(s._service.events().requests[0]['fields'], 'etag,nextPageToken,timeZone,items(start,end)')
+
+    def test_iter_events_expand_locally(self):
+        master = {'id': 'm', 'summary': 'daily', 'start': {'dateTime': '2015-10-16T23:30:00+00:00'},
+                  'end': {'dateTime': '2015-10-17T00:30:00+00:00'}, 'recurrence': ['RRULE:FREQ=DAILY']}
+        moved = {'id': 'm_20151018T233000Z', 'recurringEventId': 'm', 'summary': 'moved',
+                 'originalStartTime': {'dateTime': '2015-10-18T23:30:00Z'},
+                 'start': {'dateTime': '2015-10-21T10:00:00Z'}, 'end': {'dateTime': '2015-10-21T11:00:00Z'}}
+        s = self._service({
+            (None, None): {'timeZone': 'UTC', 'items': [self._item(19, 'c'), master], 'nextPageToken': 'p2'},
+            (None, 'p2'): {'timeZone': 'UTC', 'items': [moved]},
+        }, cache=True)
+
+        events = list(s.iter_events('primary', self.t0, self.t1, fields=['summary', 'start', 'end'],
+                                    expand_locally=True))
+        self.assertEqual([(e.summary, e.start_time.datetime_tz.day) for e in events],
+                         [('daily', 16), ('daily', 17), ('c', 19), ('daily', 19)])
+
+        requests = s._service.events().requests
+        self.assertEqual([(r['singleEvents'], r['showDeleted'], 'orderBy' in r) for r in requests],
+                         [(False, True, False)] * 2)
+        self.assertEqual(requests[0]['fields'], 'etag,nextPageToken,timeZone,items(summary,start,end,id,status,'
+                                                'recurrence,recurringEventId,originalStartTime)')
+        # the event cache is not used
+        self.assertEqual(s._cache.get_sync_state('primary'), None)
+
+    def test_iter_event_pages(self):
+        s = self._service({
+            (None, None): {'timeZone': 'UTC', 'items': [self._item(17, 'a')], 'nextPageToken': 'p2'},
+            (None, 'p2'): {'timeZone': 'UTC', 'items': [self._item(18, 'b')]},
+        }, cache=True)
+        pages = s.iter_event_pages('primary', self.t0, self.t1)
+        self.assertEqual([(tz, [d['summary'] for d in items], t) for tz, items, t in pages],
+                         [('UTC', ['a'], 'p2'), ('UTC', ['b'], None)])
+
+        # resume from the second page
+        self.assertEqual([t for _, _, t in s.iter_event_pages('primary', self.t0, self.t1, page_token='p2')], [None])
+        self.assertEqual([r.get('pageToken') for r in s._service.events().requests], [None, 'p2', 'p2'])
+        self.assertEqual(s._cache.get_sync_state('primary'), None)
+
+    def test_iter_events_page_size_error(self):
+        s = self._service({})
+        self.assertRaisesRegexp(AssertionError, 'page size must be between 1 and 2500',
+                                list, s.iter_events('primary', self.t0, self.t1, 2501))
+        self.assertRaisesRegexp(AssertionError, 'page size must be between 1 and 2500',
+                                list, s.iter_events('primary', self.t0, self.t1, 0))
+
+    def test_execute_retry(self):
+        class FlakyRequest(object):
+            def __init__(self):
+                self.calls = 0
+
+            def execute(self, http=None):
+                self.calls += 1
+                if self.calls == 1:
+                    raise HttpError(httplib2.Response({'status': 503}), b'')
+                return {'id': 'x'}
+
+        s = self._service({})
+        r = FlakyRequest()
+        self.assertEqual(s._execute(r), {'id': 'x'})
+        self.assertEqual((r.calls, s.retry_count), (2, 1))
+
+        r = FlakyRequest()
+        self.assertRaises(HttpError, s._execute, r, False)
+        self.assertEqual((r.calls, s.retry_count), (1, 1))
+
+    def test_list_busy(self):
+        s = self._service({})
+        ids = ['c%d' % i for i in range(60)]
+        t0 = datetime(2015, 10, 1, tzinfo=pytz.utc)
+        busy = s.list_busy(ids, t0, t0 + timedelta(days=100))
+
+        # 2 chunks of calendars x 2 chunks of the time range
+        requests = s._service.freebusy().requests
+        self.assertEqual([(len(r['items']), r['timeMin'], r['timeMax']) for r in requests], [
+            (50, '2015-10-01T00:00:00+00:00', '2015-11-30T00:00:00+00:00'),
+            (50, '2015-11-30T00:00:00+00:00', '2016-01-09T00:00:00+00:00'),
+            (10, '2015-10-01T00:00:00+00:00', '2015-11-30T00:00:00+00:00'),
+            (10, '2015-11-30T00:00:00+00:00', '2016-01-09T00:00:00+00:00'),
+        ])
+        self.assertEqual(len(busy), 120)
+        self.assertEqual(busy[0], (t0, t0))
+
+        self.assertRaisesRegexp(AssertionError, 'Failed to query free/busy: error \\(notFound\\)',
+                                s.list_busy, ['a', 'error'], t0, t0 + timedelta(days=1))
+
+    def test_list_events(self):
+        s = self._service({
+            (None, None): {'timeZone': 'UTC', 'items': [self._item(18, 'b')], 'nextPageToken': 'p2'},
+            (None, 'p2'): {'timeZone': 'UTC', 'items': [self._item(17, 'a')]},
+        })
+        self.assertEqual([e.summary for e in s.list_events('primary', self.t0, self.t1)], ['a', 'b'])
+
+    def test_list_events_conditional(self):
+        pages = {
+            (None, None): {'etag': '"e1"', 'timeZone': 'UTC', 'items': [self._item(18, 'b')], 'nextPageToken': 'p2'},
+            (None, 'p2'): {'etag': '"e2"', 'timeZone': 'UTC', 'items': [self._item(17, 'a')]},
+        }
+        s = self._service(pages)
+        s._responses = ResponseCache(os.path.join(self.tmp_dir, 'responses'))
+        self.assertEqual([e.summary for e in s.list_events('primary', self.t0, self.t1)], ['a', 'b'])
+        self.assertEqual((s._responses.hits, s._responses.misses), (0, 2))
+
+        # not modified
+        self.assertEqual([e.summary for e in s.list_events('primary', self.t0, self.t1)], ['a', 'b'])
+        self.assertEqual((s._responses.hits, s._responses.misses), (2, 2))
+
+        # the second page has been modified
+        pages[None, 'p2'] = {'etag': '"e3"', 'timeZone': 'UTC', 'items': [self._item(17, 'c')]}
+        self.assertEqual([e.summary for e in s.list_events('primary', self.t0, self.t1)], ['c', 'b'])
+        self.assertEqual((s._responses.hits, s._responses.misses), (3, 3))
+        self.assertEqual([e.summary for e in s.list_events('primary', self.t0, self.t1)], ['c', 'b'])
+        self.assertEqual((s._responses.hits, s._responses.misses), (5, 3))
+
+        # a different window is another query
+        self.assertEqual(len(s.list_events('primary', self.t0, self.t1 + timedelta(days=1))), 2)
+        self.assertEqual((s._responses.hits, s._responses.misses), (5, 5))
+
+    def test_summary_without_event_cache(self):
+        from calendar_cli.setting.setting import Setting
+
+        credential_path = os.path.join(self.tmp_dir, 'credentials.json')
+        pages = {(None, None): {'etag': '"e1"', 'timeZone': 'UTC', 'items': [self._item(17, 'a')]}}
+        s = self._service(pages)
+        s._responses = ResponseCache(ResponseCache.get_path(self.tmp_dir, credential_path))
+        GoogleCalendarService._shared[(os.path.abspath(credential_path), self.tmp_dir, False)] = s
+        try:
+            argv = ['calendar-cli', '--no-event-cache', '--cache-dir', self.tmp_dir, '--credential', credential_path,
+                    '--date', '20151017', '--format', '%S']
+            for _ in range(2):
+                with self.withBytesOutput() as (out, err):
+                    self.assertEqual(Setting().parse_args(argv).operation.run(), 0)
+                self.assertEqual(out.getvalue(), b'a\n')
+        finally:
+            GoogleCalendarService.clear_shared()
+
+        # the second run is revalidated with the ETag
+        self.assertEqual((s._responses.hits, s._responses.misses), (1, 1))
+        self.assertFalse(os.path.exists(EventCache.get_path(self.tmp_dir, credential_path)))
+
+    def test_sync_events(self):
+        s = self._service({
+            (None, None): {'timeZone': 'UTC', 'items': [self._item(17, 'a')], 'nextPageToken': 'p2'},
+            (None, 'p2'): {'timeZone': 'UTC', 'items': [self._item(18, 'b')], 'nextSyncToken': 's1'},
+            ('s1', None): {'timeZone': 'UTC', 'items': [self._item(17, 'a', 'cancelled'), self._item(19, 'c')],
+                           'nextSyncToken': 's2'},
+        }, cache=True)
+
+        # full synchronization
+        self.assertEqual([e.summary for e in s.iter_events('primary', self.t0, self.t1)], ['a', 'b'])
+        self.assertEqual(s._cache.get_sync_state('primary')[:2], ('UTC', 's1'))
+
+        # incremental synchronization
+        self.assertEqual([e.summary for e in s.iter_events('primary', self.t0, self.t1)], ['b', 'c'])
+        self.assertEqual(s._cache.get_sync_state('primary')[:2], ('UTC', 's2'))
+        self.assertEqual(set(r['fields'] for r in s._service.events().requests), set([SYNC_FIELDS]))
+
+        requests = s._service.events().requests
+        self.assertEqual([(r.get('syncToken'), r.get('pageToken')) for r in requests],
+                         [(None, None), (None, 'p2'), ('s1', None)])
+        self.assertFalse(any('timeMin' in r or 'orderBy' in r for r in requests))
+
+    def test_sync_events_expired_token(self):
+        s = self._service({
+            (None, None): {'timeZone': 'UTC', 'items': [self._item(18, 'b')], 'nextSyncToken': 's2'},
+            ('s1', None): HttpError(httplib2.Response({'status': 410}), b'Gone'),
+        }, cache=True)
+        s._cache.apply_page('primary', [self._item(17, 'a')], 'UTC')
+        s._cache.finish_sync('primary', 'UTC', 's1')
+
+        self.assertEqual([e.summary for e in s.iter_events('primary', self.t0, self.t1)], ['b'])
+        self.assertEqual(s._cache.get_sync_state('primary')[:2], ('UTC', 's2'))
+
+    def test_iter_events_concurrently(self):
+        class Events(object):
+            def list(self, **params):
+                if params['calendarId'] == 'error':
+                    return _FakeRequest(HttpError(httplib2.Response({'status': 404}), b'Not Found'))
+                items = [TestGoogleCalendarService._item(d, params['calendarId']) for d in [17, 18]]
+                return _FakeRequest({'timeZone': 'UTC', 'items': items})
+
+        s = self._service({})
+        s._service._events = Events()
+
+        its = s.iter_events_concurrently(['a', 'b', 'c'], self.t0, self.t1, max_workers=2)
+        self.assertEqual([[(e.summary, e.calendar_id) for e in it] for it in its],
+                         [[('a', 'a'), ('a', 'a')], [('b', 'b'), ('b', 'b')], [('c', 'c'), ('c', 'c')]])
+
+        its = s.iter_events_concurrently(['a', 'error'], self.t0, self.t1)
+        self.assertEqual(len(list(its[0])), 2)
+        self.assertRaises(HttpError, list, its[1])
+
+    def test_iter_events_concurrently_stop(self):
+        class Events(object):
+            def __init__(self):
+                self.count = 0
+
+            def list(self, **params):
+                # endless pages
+                self.count += 1
+                n = int(params.get('pageToken') or 0)
+                return _FakeRequest({'timeZone': 'UTC', 'items': [TestGoogleCalendarService._item(17, 'x')] * 2,
+                                     'nextPageToken': str(n + 1)})
+
+        s = self._service({})
+        s._service._events = Events()
+
+        its = s.iter_events_concurrently(['a', 'b', 'c'], self.t0, self.t1, max_workers=2)
+        self.assertEqual(next(its[0]).summary, 'x')
+        its[0].close()
+
+        # workers stop soon after the consumer has gone, and the others fail instead of waiting forever
+        time.sleep(0.5)
+        count = s._service._events.count
+        time.sleep(0.5)
+        self.assertEqual(s._service._events.count, count)
+        self.assertLess(count, 3 * (google_calendar_service.PREFETCH_SIZE + 2))
+        self.assertRaisesRegexp(AssertionError, 'Fetching events was stopped', list, its[1])
+
+    def test_list_calendar_ids(self):
+        self.assertEqual(self._service({}).list_calendar_ids(), ['a', 'b', 'c'])
+
+    def test_insert_events(self):
+        from calendar_cli.model import Event
+        s = self._service({})
+        events = [Event.parse_dict(self._item(day, summary), 'UTC')
+                  for day, summary in [(17, 'a'), (18, 'error'), (19, 'c'), (20, 'd'), (21, 'e')]]
+
+        results = list(s.insert_events('primary', iter(events), batch_size=2))
+        self.assertEqual([(ev.summary, event_id, str(e) if e else None) for ev, event_id, e in results], [
+            ('a', 'id-a', None), ('error', None, 'error'), ('c', 'id-c', None), ('d', 'id-d', None),
+            ('e', 'id-e', None)])
+        self.assertEqual([len(b.requests) for b in s._service.batches], [2, 2, 1])
+
+    def test_insert_events_retry(self):
+        from calendar_cli.model import Event
+        _FakeBatch.flaky = []
+        s = self._service({})
+        events = [Event.parse_dict(self._item(day, summary), 'UTC').copy(event_id=summary)
+                  for day, summary in [(17, 'a'), (18, 'flaky'), (19, 'c')]]
+
+        results = list(s.insert_events('primary', events, batch_size=3))
+        self.assertEqual([(ev.summary, event_id, e) for ev, event_id, e in results],
+                         [('a', 'id-a', None), ('flaky', 'id-flaky', None), ('c', 'id-c', None)])
+
+        # only the failed part is sent again
+        self.assertEqual([[r.result['summary'] for _, r in b.requests] for b in s._service.batches],
+                         [['a', 'flaky', 'c'], ['flaky'], ['flaky']])
+        self.assertEqual(s.retry_count, 2)
+
+        # events without ids are not sent again after server errors
+        _FakeBatch.flaky = []
+        results = list(s.insert_events('primary', [events[1].copy(event_id=None)]))
+        self.assertEqual(results[0][2].resp.status, 503)
+
+    def test_insert_events_concurrently(self):
+        from calendar_cli.model import Event
+        s = self._service({})
+        events = [Event.parse_dict(self._item(day, 'e%d' % day), 'UTC') for day in range(1, 29)]
+        consumed = []
+
+        def gen():
+            for ev in events:
+                consumed.append(ev)
+                yield ev
+
+        it = s.insert_events('primary', gen(), batch_size=2, max_workers=3)
+        self.assertEqual(next(it)[1], 'id-e1')
+        # only a few batches are read ahead
+        self.assertLessEqual(len(consumed), 2 * 4)
+        self.assertEqual([event_id for _, event_id, _ in it], ['id-e%d' % day for day in range(2, 29)])
+
+    def test_update_events(self):
+        from calendar_cli.model import Event
+        s = self._service({})
+        ev = Event.parse_dict(self._item(17, 'moved'), 'UTC')
+        results = list(s.update_events('primary', [('m_20151017', ev), ('m_20151018', None)]))
+        self.assertEqual([(event_id, e) for event_id, _, e in results], [('m_20151017', None), ('m_20151018', None)])
+        self.assertEqual([r.result for _, r in s._service.batches[0].requests][1],
+                         {'id': 'm_20151018', 'summary': 'deleted'})
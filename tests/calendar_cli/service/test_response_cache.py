@@ -0,0 +1,47 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+import os
+import time
+import shutil
+import tempfile
+from mog_commons import unittest
+from calendar_cli.service.response_cache import ResponseCache
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_get_path(self):
+        self.assertEqual(ResponseCache.get_path('cache', 'a.json'), ResponseCache.get_path('cache', 'a.json'))
+        self.assertNotEqual(ResponseCache.get_path('cache', 'a.json'), ResponseCache.get_path('cache', 'b.json'))
+
+    def test_put_get(self):
+        c = ResponseCache(os.path.join(self.tmp_dir, 'responses'))
+        self.assertEqual(c.get('https://example.com/?a=1'), None)
+
+        c.put('https://example.com/?a=1', '"e1"', {'items': ['あ']})
+        self.assertEqual(c.get('https://example.com/?a=1'), ('"e1"', {'items': ['あ']}))
+        self.assertEqual(c.get('https://example.com/?a=2'), None)
+
+    def test_prune(self):
+        c = ResponseCache(self.tmp_dir, max_age=100)
+        c.put('a', '"e1"', {})
+        c.put('b', '"e2"', {}, now=time.time() + 50)
+        self.assertEqual(len(os.listdir(self.tmp_dir)), 2)
+
+        c.touch('b', now=time.time() + 100)
+        c.put('c', '"e3"', {}, now=time.time() + 150)
+        self.assertEqual(c.get('a'), None)
+        self.assertEqual(c.get('b'), ('"e2"', {}))
+        self.assertEqual(len(os.listdir(self.tmp_dir)), 2)
+
+    def test_record(self):
+        c = ResponseCache(self.tmp_dir)
+        c.record(True, 'a')
+        c.record(False, 'a')
+        c.record(True, 'a')
+        self.assertEqual((c.hits, c.misses), (2, 1))
@@ -0,0 +1,78 @@
+# encoding: utf-8
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+import json
+import socket
+import httplib2
+from apiclient.errors import HttpError
+from mog_commons import unittest
+from calendar_cli.service import Retry
+
+
+def _http_error(status, reason=None, headers=None):
+    resp = httplib2.Response(dict({'status': status}, **(headers or {})))
+    content = {'error': {'code': status, 'errors': [{'reason': reason}] if reason else []}}
+    return HttpError(resp, json.dumps(content).encode('utf-8'))
+
+
+class _Flaky(object):
+    def __init__(self, errors, result='ok'):
+        self.errors = list(errors)
+        self.result = result
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return self.result
+
+
+class TestRetry(unittest.TestCase):
+    def setUp(self):
+        self.sleeps = []
+        self.retry = Retry(max_retries=3, base_delay=1.0, max_delay=4.0, sleep=self.sleeps.append, rand=lambda: 1.0)
+
+    def test_is_retryable(self):
+        self.assertTrue(Retry.is_retryable(_http_error(503), True))
+        self.assertFalse(Retry.is_retryable(_http_error(503), False))
+        self.assertTrue(Retry.is_retryable(_http_error(429), False))
+        self.assertTrue(Retry.is_retryable(_http_error(403, 'rateLimitExceeded'), False))
+        self.assertTrue(Retry.is_retryable(_http_error(403, 'userRateLimitExceeded'), True))
+        self.assertFalse(Retry.is_retryable(_http_error(403, 'forbidden'), True))
+        self.assertFalse(Retry.is_retryable(_http_error(404), True))
+        self.assertFalse(Retry.is_retryable(_http_error(410), True))
+        self.assertTrue(Retry.is_retryable(socket.timeout(), True))
+        self.assertFalse(Retry.is_retryable(socket.timeout(), False))
+        self.assertFalse(Retry.is_retryable(ValueError(), True))
+
+    def test_call(self):
+        f = _Flaky([_http_error(500), _http_error(503), socket.error()])
+        self.assertEqual(self.retry.call(f), 'ok')
+        self.assertEqual(f.calls, 4)
+        self.assertEqual(self.sleeps, [1.0, 2.0, 4.0])
+        self.assertEqual(self.retry.count, 3)
+
+    def test_call_max_retries(self):
+        f = _Flaky([_http_error(500)] * 4)
+        self.assertRaises(HttpError, self.retry.call, f)
+        self.assertEqual(f.calls, 4)
+        self.assertEqual(self.sleeps, [1.0, 2.0, 4.0])
+
+    def test_call_not_idempotent(self):
+        f = _Flaky([_http_error(500)])
+        self.assertRaises(HttpError, self.retry.call, f, False)
+        self.assertEqual(f.calls, 1)
+
+        f = _Flaky([_http_error(429)])
+        self.assertEqual(self.retry.call(f, False), 'ok')
+        self.assertEqual(f.calls, 2)
+
+    def test_retry_after(self):
+        f = _Flaky([_http_error(429, headers={'retry-after': '7'}), _http_error(503, headers={'retry-after': '1000'})])
+        self.assertEqual(self.retry.call(f), 'ok')
+        self.assertEqual(self.sleeps, [7.0, 300.0])
+
+        e = _http_error(503, headers={'retry-after': 'Wed, 21 Oct 2015 07:28:00 GMT'})
+        self.assertEqual(Retry._retry_after(e, now=1445412470), 10.0)
+        self.assertEqual(Retry._retry_after(_http_error(503, headers={'retry-after': 'xxx'})), None)
@@ -2,11 +2,12 @@
 from __future__ import division, print_function, absolute_import, unicode_literals
 
 import six
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, time
 from tzlocal import get_localzone
 from mog_commons import unittest
 from calendar_cli.model import EventTime, Event
 from calendar_cli.setting.setting import Setting
+from calendar_cli.setting import arg_parser
 from calendar_cli.operation import *
 
 
@@ -30,6 +31,13 @@ class TestSetting(unittest.TestCase):
             'あいう えお'
         ))
 
+        a = ['calendar-cli', 'create', '--from-file', 'events.csv']
+        s = Setting().parse_args(a)
+
+        self.assertIsInstance(s.operation, BulkCreateOperation)
+        self.assertEqual(s.operation.calendar_id, 'primary')
+        self.assertEqual(s.operation.path, 'events.csv')
+
         # summary
         t = datetime.now()
         today = get_localzone().localize(datetime(t.year, t.month, t.day))
@@ -106,6 +114,54 @@ class TestSetting(unittest.TestCase):
         self.assertEqual(s.operation.duration, timedelta(days=4))
         self.assertEqual(s.operation.format, '%S')
 
+        a = ['calendar-cli', '--days', '90', '--page-size', '2500']
+        s = Setting().parse_args(a)
+
+        self.assertIsInstance(s.operation, SummaryOperation)
+        self.assertEqual(s.operation.duration, timedelta(days=91))
+        self.assertEqual(s.operation.page_size, 2500)
+        self.assertEqual(s.operation.cache_dir, arg_parser.DEFAULT_CACHE_DIR)
+
+        a = ['calendar-cli', '--no-cache']
+        s = Setting().parse_args(a)
+
+        self.assertIsInstance(s.operation, SummaryOperation)
+        self.assertEqual(s.operation.cache_dir, None)
+
+        a = ['calendar-cli', '--offline']
+        s = Setting().parse_args(a)
+
+        self.assertIsInstance(s.operation, SummaryOperation)
+        self.assertEqual(s.operation.offline, True)
+        self.assertEqual(s.operation.max_age, None)
+
+        a = ['calendar-cli', '--max-age', '300']
+        s = Setting().parse_args(a)
+
+        self.assertIsInstance(s.operation, SummaryOperation)
+        self.assertEqual(s.operation.offline, False)
+        self.assertEqual(s.operation.max_age, 300)
+
+        a = ['calendar-cli', '--offline', '--no-cache']
+        s = Setting().parse_args(a)
+
+        self.assertIsInstance(s.operation, HelpOperation)
+
+        # only the event cache is disabled
+        s = Setting().parse_args(['calendar-cli', '--no-event-cache'])
+        self.assertIsInstance(s.operation, SummaryOperation)
+        self.assertEqual((s.operation.cache_dir, s.operation.event_cache), (arg_parser.DEFAULT_CACHE_DIR, False))
+        self.assertEqual(Setting().parse_args(['calendar-cli']).operation.event_cache, True)
+        self.assertIsInstance(Setting().parse_args(['calendar-cli', '--no-event-cache', '--max-age', '1']).operation,
+                              HelpOperation)
+
+        s = Setting().parse_args(['calendar-cli', '--expand-locally', '--days', '364'])
+        self.assertIsInstance(s.operation, SummaryOperation)
+        self.assertEqual(s.operation.expand_locally, True)
+        self.assertEqual(Setting().parse_args(['calendar-cli']).operation.expand_locally, False)
+        self.assertIsInstance(Setting().parse_args(['calendar-cli', '--expand-locally', '--offline']).operation,
+                              HelpOperation)
+
         # setup
         a = ['calendar-cli', 'setup', 'client_secret.json']
         s = Setting().parse_args(a)
@@ -123,6 +179,110 @@ class TestSetting(unittest.TestCase):
         self.assertEqual(s.operation.read_only, True)
         self.assertEqual(s.operation.no_browser, True)
 
+        # export
+        s = Setting().parse_args(['calendar-cli', 'export', '--calendar', 'all', '--date', '2015-01-01', '--days',
+                                  '364', '--output', 'backup.jsonl'])
+        self.assertIsInstance(s.operation, ExportOperation)
+        self.assertEqual((s.operation.calendar_id, s.operation.duration), ('all', timedelta(days=365)))
+        self.assertEqual((s.operation.output_path, s.operation.export_format), ('backup.jsonl', 'jsonl'))
+
+        s = Setting().parse_args(['calendar-cli', 'export', '--export-format', 'ics'])
+        self.assertEqual((s.operation.output_path, s.operation.export_format), (None, 'ics'))
+        self.assertEqual(Setting().parse_args(['calendar-cli', 'export', '--output', '-']).operation.output_path, None)
+
+        # import
+        s = Setting().parse_args(['calendar-cli', 'import', 'events.ics', '--calendar', 'a', '--max-workers', '2'])
+        self.assertIsInstance(s.operation, ImportOperation)
+        self.assertEqual((s.operation.calendar_id, s.operation.path, s.operation.max_workers), ('a', 'events.ics', 2))
+        self.assertIsInstance(Setting().parse_args(['calendar-cli', 'import']).operation, HelpOperation)
+        self.assertIsInstance(Setting().parse_args(['calendar-cli', 'import', 'a.ics', '--max-workers', '0']).operation,
+                              HelpOperation)
+
+        # conflicts
+        s = Setting().parse_args(['calendar-cli', 'conflicts', '--calendar', 'all', '--days', '6'])
+        self.assertIsInstance(s.operation, SummaryOperation)
+        self.assertEqual(s.operation.calendar_id, 'all')
+        self.assertEqual(s.operation.conflicts_only, True)
+        self.assertEqual(Setting().parse_args(['calendar-cli']).operation.conflicts_only, False)
+
+        # free
+        s = Setting(now=self._localize(2015, 10, 16, 12, 34)).parse_args(
+            ['calendar-cli', 'free', '--calendar', 'a,b', '--days', '6', '--start', '1000', '--min-length', '60'])
+        self.assertIsInstance(s.operation, FreeOperation)
+        self.assertEqual(s.operation.calendar_id, 'a,b')
+        self.assertEqual(s.operation.start_time, self._localize(2015, 10, 16, 0, 0))
+        self.assertEqual(s.operation.duration, timedelta(days=7))
+        self.assertEqual((s.operation.work_start, s.operation.work_end), (time(10, 0), time(18, 0)))
+        self.assertEqual(s.operation.min_length, timedelta(minutes=60))
+        self.assertEqual(s.operation.weekends, False)
+
+        s = Setting().parse_args(['calendar-cli', 'free', '--min-length', '0'])
+        self.assertIsInstance(s.operation, HelpOperation)
+
+        # report
+        s = Setting().parse_args(['calendar-cli', 'report', '--days', '364', '--period', 'month', '--group-by',
+                                  'keyword', '--keywords', 'foo, bar', '--report-format', 'json', '--offline'])
+        self.assertIsInstance(s.operation, ReportOperation)
+        self.assertEqual(s.operation.duration, timedelta(days=365))
+        self.assertEqual((s.operation.period, s.operation.group_by, s.operation.keywords, s.operation.report_format),
+                         ('month', 'keyword', ['foo', 'bar'], 'json'))
+        self.assertEqual(s.operation.offline, True)
+
+        s = Setting().parse_args(['calendar-cli', 'report', '--offline', '--no-cache'])
+        self.assertIsInstance(s.operation, HelpOperation)
+        s = Setting().parse_args(['calendar-cli', 'report', '--no-event-cache'])
+        self.assertEqual((s.operation.cache_dir, s.operation.event_cache), (arg_parser.DEFAULT_CACHE_DIR, False))
+        s = Setting().parse_args(['calendar-cli', 'report', '--offline', '--no-event-cache'])
+        self.assertIsInstance(s.operation, HelpOperation)
+
+        # search
+        s = Setting().parse_args(['calendar-cli', 'search', 'foo', 'ba*', '--calendar', 'all'])
+        self.assertIsInstance(s.operation, SearchOperation)
+        self.assertEqual(s.operation.query, ['foo', 'ba*'])
+        self.assertEqual((s.operation.calendar_id, s.operation.start_time, s.operation.duration), ('all', None, None))
+        self.assertEqual(s.operation.format, arg_parser.DEFAULT_FORMAT_DAYS)
+
+        s = Setting().parse_args(['calendar-cli', 'search', 'foo', '--date', '20151016', '--days', '2'])
+        self.assertEqual((s.operation.start_time, s.operation.duration),
+                         (self._localize(2015, 10, 16, 0, 0), timedelta(days=3)))
+
+        # --days without --date counts from today
+        s = Setting(now=self._localize(2015, 10, 16, 12, 34)).parse_args(
+            ['calendar-cli', 'search', 'foo', '--days', '-7'])
+        self.assertEqual((s.operation.start_time, s.operation.duration),
+                         (self._localize(2015, 10, 9, 0, 0), timedelta(days=8)))
+        self.assertIsInstance(Setting().parse_args(['calendar-cli', 'search', 'foo', '--no-cache']).operation,
+                              HelpOperation)
+        self.assertIsInstance(Setting().parse_args(['calendar-cli', 'search', 'foo', '--no-event-cache']).operation,
+                              HelpOperation)
+        self.assertIsInstance(Setting().parse_args(['calendar-cli', 'search']).operation, HelpOperation)
+
+        # daemon
+        s = Setting().parse_args(['calendar-cli', 'daemon', '--socket', '/tmp/calendar-cli.sock'])
+        self.assertIsInstance(s.operation, DaemonOperation)
+        self.assertEqual(s.operation.socket_path, '/tmp/calendar-cli.sock')
+
+        # profile
+        s = Setting().parse_args(['calendar-cli', '--profile'])
+        self.assertEqual((s.profile, s.profile_output), (True, None))
+
+        s = Setting().parse_args(['calendar-cli', '--profile-output', 'trace.jsonl'])
+        self.assertEqual((s.profile, s.profile_output), (True, 'trace.jsonl'))
+
+    def test_parse_args_reload(self):
+        from calendar_cli.util.daemon import Environment
+
+        # defaults from the environment of a client of the daemon
+        with Environment({'XDG_CACHE_HOME': '/tmp/cache', 'CALENDAR_CLI_PROFILE_OUTPUT': 'trace.jsonl'}):
+            arg_parser.reload()
+            s = Setting().parse_args(['calendar-cli', 'search', '--offline', 'x'])
+            self.assertEqual(s.operation.cache_dir, '/tmp/cache/calendar-cli')
+            self.assertEqual((s.profile, s.profile_output), (True, 'trace.jsonl'))
+
+        arg_parser.reload()
+        s = Setting().parse_args(['calendar-cli', 'search', '--offline', 'x'])
+        self.assertEqual(s.operation.cache_dir, arg_parser.DEFAULT_CACHE_DIR)
+
     def test_parse_time_range(self):
         now = self._localize(2015, 10, 19, 9, 30)
 
@@ -0,0 +1,66 @@
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import subprocess
+from mog_commons import unittest
+import calendar_cli
+
+# modules which should be imported only when a subcommand actually needs them
+HEAVY_MODULES = ['apiclient', 'googleapiclient', 'oauth2client', 'httplib2', 'dateutil', 'sqlite3']
+
+# seconds to import the command and parse the arguments (generous for slow CI machines)
+STARTUP_BUDGET = 1.0
+
+SCRIPT = """
+import sys, time, json
+t = time.time()
+from calendar_cli.calendar_cli import main
+sys.argv = %r
+try:
+    main()
+except SystemExit:
+    pass
+elapsed = time.time() - t
+sys.stderr.write(json.dumps({
+    'elapsed': elapsed,
+    'modules': sorted(set(m.split('.')[0] for m in sys.modules)),
+    'operations': sorted(m.split('.')[2] for m in sys.modules if m.startswith('calendar_cli.operation.')),
+}))
+"""
+
+
+class TestStartup(unittest.TestCase):
+    def _run(self, *args):
+        env = dict(os.environ)
+        src_dir = os.path.dirname(os.path.dirname(os.path.abspath(calendar_cli.__file__)))
+        env['PYTHONPATH'] = os.pathsep.join([src_dir] + env.get('PYTHONPATH', '').split(os.pathsep))
+
+        p = subprocess.Popen([sys.executable, '-c', SCRIPT % (['calendar-cli'] + list(args),)], env=env,
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        _, stderr = p.communicate()
+        return json.loads(stderr.decode('utf-8').splitlines()[-1])
+
+    def test_startup(self):
+        for args in [['--version'], ['--help'], ['setup']]:
+            result = self._run(*args)
+            self.assertEqual([m for m in HEAVY_MODULES if m in result['modules']], [], args)
+            self.assertLess(result['elapsed'], STARTUP_BUDGET, args)
+
+    def test_startup_operations(self):
+        # only the operation of the subcommand is loaded
+        if sys.version_info < (3, 7):
+            return  # all operations are loaded without module __getattr__
+
+        self.assertEqual(self._run('--version')['operations'], [])
+        self.assertEqual(self._run('setup')['operations'], ['help_operation', 'operation'])
+
+        cache_dir = tempfile.mkdtemp()
+        try:
+            self.assertEqual(self._run('--no-daemon', '--offline', '--cache-dir', cache_dir)['operations'],
+                             ['operation', 'summary_operation'])
+        finally:
+            shutil.rmtree(cache_dir)
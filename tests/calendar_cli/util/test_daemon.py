@@ -0,0 +1,140 @@
+# encoding: utf-8
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+import os
+import io
+import time
+import shutil
+import tempfile
+import threading
+from mog_commons import unittest
+from calendar_cli.util.daemon import DaemonServer, Environment, OutputStream, send_request, is_running, \
+    get_environment
+
+
+class TestDaemon(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.temp_dir, 'daemon.sock')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _start(self, handler):
+        server = DaemonServer(self.socket_path, handler)
+        t = threading.Thread(target=server.serve_forever)
+        t.daemon = True
+        t.start()
+        for _ in range(100):
+            if is_running(self.socket_path):
+                break
+            t.join(0.01)
+        return server, t
+
+    def test_output_stream(self):
+        outputs = []
+
+        # write to the file descriptors directly since the test runner may replace sys.stdout
+        with OutputStream(lambda fd, b: outputs.append((fd, b))):
+            os.write(1, 'あいう\n'.encode('utf-8'))
+            os.write(2, b'error\n')
+        self.assertEqual(sorted(outputs), [(1, 'あいう\n'.encode('utf-8')), (2, b'error\n')])
+
+    def test_environment(self):
+        os.environ['CALENDAR_CLI_TEST_A'] = 'a'
+        os.environ.pop('CALENDAR_CLI_TEST_B', None)
+        try:
+            with Environment({'CALENDAR_CLI_TEST_A': None, 'CALENDAR_CLI_TEST_B': 'b'}):
+                self.assertEqual(os.environ.get('CALENDAR_CLI_TEST_A'), None)
+                self.assertEqual(os.environ.get('CALENDAR_CLI_TEST_B'), 'b')
+            self.assertEqual(os.environ.get('CALENDAR_CLI_TEST_A'), 'a')
+            self.assertEqual(os.environ.get('CALENDAR_CLI_TEST_B'), None)
+        finally:
+            os.environ.pop('CALENDAR_CLI_TEST_A', None)
+
+    def test_send_request_not_running(self):
+        self.assertEqual(send_request(self.socket_path, ['calendar-cli']), None)
+
+        # stale socket file
+        with open(self.socket_path, 'w'):
+            pass
+        self.assertEqual(send_request(self.socket_path, ['calendar-cli']), None)
+        self.assertFalse(is_running(self.socket_path))
+
+    def test_serve(self):
+        requests = []
+
+        def handler(argv):
+            requests.append((argv, os.getcwd()))
+            os.write(1, (' '.join(argv) + '\n').encode('utf-8'))
+            return len(argv)
+
+        server, t = self._start(handler)
+        try:
+            self.assertTrue(is_running(self.socket_path))
+            self.assertEqual(os.stat(self.socket_path).st_mode & 0o077, 0)
+
+            out, err = io.BytesIO(), io.BytesIO()
+            r = send_request(self.socket_path, ['calendar-cli', 'create', 'あいう'], cwd=self.temp_dir,
+                             stdout=out, stderr=err)
+            self.assertEqual(r, 3)
+            self.assertEqual(out.getvalue(), 'calendar-cli create あいう\n'.encode('utf-8'))
+            self.assertEqual(err.getvalue(), b'')
+            self.assertEqual(requests, [(['calendar-cli', 'create', 'あいう'], os.path.realpath(self.temp_dir))])
+            self.assertNotEqual(os.getcwd(), os.path.realpath(self.temp_dir))
+
+            # only one daemon at a time
+            self.assertRaises(AssertionError, DaemonServer(self.socket_path, handler).serve_forever)
+        finally:
+            server.shutdown()
+            t.join()
+        self.assertFalse(os.path.exists(self.socket_path))
+
+    def test_serve_streaming(self):
+        received = threading.Event()
+
+        class Output(io.BytesIO):
+            def write(self, b):
+                received.set()
+                return io.BytesIO.write(self, b)
+
+        def handler(argv):
+            os.write(1, b'first\n')
+            # the rest of the output is written after the client receives the first line
+            if not received.wait(5):
+                return 1
+            os.write(1, b'second\n')
+            return 0
+
+        server, t = self._start(handler)
+        try:
+            out = Output()
+            self.assertEqual(send_request(self.socket_path, ['calendar-cli'], stdout=out, stderr=io.BytesIO()), 0)
+            self.assertEqual(out.getvalue(), b'first\nsecond\n')
+        finally:
+            server.shutdown()
+            t.join()
+
+    def test_serve_environment(self):
+        requests = []
+
+        def handler(argv):
+            requests.append((os.environ.get('CALENDAR_CLI_PROFILE_OUTPUT'), os.environ.get('TZ'), time.tzname))
+            return 0
+
+        server, t = self._start(handler)
+        env, tzname = dict(os.environ), time.tzname
+        try:
+            client_env = get_environment()
+            client_env.update({'CALENDAR_CLI_PROFILE_OUTPUT': 'profile.jsonl', 'TZ': 'Asia/Tokyo'})
+            self.assertEqual(send_request(self.socket_path, ['calendar-cli'], env=client_env), 0)
+            self.assertEqual(requests, [('profile.jsonl', 'Asia/Tokyo', ('JST', 'JST'))])
+            self.assertEqual((dict(os.environ), time.tzname), (env, tzname))
+
+            # messages are chosen when the daemon starts, so the client runs the command itself
+            client_env['LANG'] = 'xx_XX.UTF-8' if os.environ.get('LANG') != 'xx_XX.UTF-8' else 'C'
+            self.assertEqual(send_request(self.socket_path, ['calendar-cli'], env=client_env), None)
+            self.assertEqual(len(requests), 1)
+        finally:
+            server.shutdown()
+            t.join()
@@ -0,0 +1,40 @@
+# encoding: utf-8
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+import io
+from mog_commons import unittest
+from calendar_cli.util.output_writer import OutputWriter
+
+
+class _FakeOutput(object):
+    def __init__(self, tty=False):
+        self.buffer = io.BytesIO()
+        self.tty = tty
+        self.writes = []
+
+    def isatty(self):
+        return self.tty
+
+    def flush(self):
+        self.writes.append(self.buffer.getvalue())
+
+
+class TestOutputWriter(unittest.TestCase):
+    def test_write_line(self):
+        out = _FakeOutput()
+        with OutputWriter(out, buffer_size=10) as w:
+            w.write_line('abc')
+            w.flush_lines()
+            self.assertEqual(out.buffer.getvalue(), b'')
+            w.write_line('あいう')
+            self.assertEqual(out.buffer.getvalue(), 'abc\nあいう\n'.encode('utf-8'))
+            w.write_line('')
+        self.assertEqual(out.buffer.getvalue(), 'abc\nあいう\n\n'.encode('utf-8'))
+
+    def test_write_line_interactive(self):
+        out = _FakeOutput(tty=True)
+        with OutputWriter(out) as w:
+            w.write_line('abc')
+            self.assertEqual(out.buffer.getvalue(), b'')
+            w.flush_lines()
+            self.assertEqual(out.buffer.getvalue(), b'abc\n')
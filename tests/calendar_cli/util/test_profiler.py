@@ -0,0 +1,100 @@
+# encoding: utf-8
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+import os
+import io
+import json
+import shutil
+import tempfile
+from mog_commons import unittest
+from calendar_cli.util.profiler import Profiler
+
+
+class _FakeHttp(object):
+    def request(self, uri, method='GET', body=None, headers=None):
+        return {'status': '200'}, b'x' * 10
+
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_phase_disabled(self):
+        p = Profiler()
+        with p.phase('a'):
+            pass
+        http = p.wrap_http(_FakeHttp())
+        self.assertEqual(http.request('http://example.com'), ({'status': '200'}, b'x' * 10))
+        self.assertEqual(p.to_dict()['phases'], {})
+        self.assertEqual(p.to_dict()['http']['requests'], 0)
+
+    def test_phase_nested(self):
+        p = Profiler()
+        p.enable()
+        with p.phase('outer'):
+            for _ in range(3):
+                with p.phase('inner'):
+                    pass
+        with p.phase('outer'):
+            pass
+
+        phases = p.to_dict()['phases']
+        self.assertEqual(phases['outer']['count'], 2)
+        self.assertEqual(phases['inner']['count'], 3)
+        for v in phases.values():
+            self.assertGreaterEqual(v['wall'], 0)
+            self.assertGreaterEqual(v['cpu'], 0)
+
+    def test_phase_exception(self):
+        p = Profiler()
+        p.enable()
+        with self.assertRaises(ValueError):
+            with p.phase('a'):
+                raise ValueError()
+        self.assertEqual(p.to_dict()['phases']['a']['count'], 1)
+
+    def test_wrap_http(self):
+        p = Profiler()
+        p.enable()
+        http = p.wrap_http(_FakeHttp())
+        http.request('http://example.com')
+        http.request('http://example.com', 'POST', body=b'abc')
+
+        d = p.to_dict()
+        self.assertEqual(d['phases']['http']['count'], 2)
+        self.assertEqual(d['http'], {'requests': 2, 'bytes_sent': 3, 'bytes_received': 20})
+
+    def test_report(self):
+        p = Profiler()
+        p.enable()
+        with p.phase('render'):
+            pass
+        out = io.StringIO()
+        p.report(out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0].split(), ['phase', 'count', 'wall(s)', 'cpu(s)'])
+        self.assertEqual(lines[1].split()[:2], ['render', '1'])
+        self.assertEqual(lines[2].split()[0], 'total')
+        self.assertEqual(lines[3], 'http: 0 requests, 0 bytes sent, 0 bytes received')
+
+    def test_write_trace(self):
+        p = Profiler()
+        p.enable()
+        with p.phase('render'):
+            pass
+        path = os.path.join(self.temp_dir, 'trace.jsonl')
+        p.write_trace(path)
+        p.write_trace(path)
+
+        with io.open(path, encoding='utf-8') as f:
+            traces = [json.loads(line) for line in f]
+        self.assertEqual(len(traces), 2)
+        self.assertEqual(traces[0]['phases']['render']['count'], 1)
+        self.assertEqual(sorted(traces[0].keys()), ['argv', 'host', 'http', 'phases', 'pid', 'started_at', 'total'])
+
+        # commands run by the daemon record the arguments of the client
+        p.reset(['calendar-cli', '--days', '7'])
+        self.assertEqual(p.to_dict()['argv'], ['calendar-cli', '--days', '7'])